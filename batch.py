@@ -0,0 +1,236 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" GUIを使わずにSDカードデータのtripごとのC/N統計値をCSV/JSONで出力する
+
+usage: python batch.py [options] SDROOT [SDROOT ...]
+"""
+
+import sys
+import argparse
+import contextlib
+import csv
+import datetime
+import json
+import logging
+import logging.config
+import multiprocessing
+import numpy as np
+import nmea_parse  # my module
+import nmea_cache  # my module
+import nmea_data   # my module
+import nmea_stats  # my module
+import nmea_profile  # my module
+from nmea_profile import PROFILE
+
+
+def _str_sec(sec, tdiff):
+    return "" if np.isnan(sec) else str(nmea_data.sec_datetime(sec, tdiff))
+
+
+def _round(v):
+    return None if v is None or np.isnan(v) else round(float(v), 2)
+
+
+def _round_dict(d):
+    return {k: _round_dict(v) if isinstance(v, dict) else _round(v) for k, v in d.items()}
+
+
+def analyze_root(root, thr, show, timewidth, tdiff, workers=None, cache=None, percentiles=()):
+    u""" SDカードデータ1枚分のtripごとの統計値を算出する
+
+    Returns:
+        tripごとの統計値dictのlist (先頭ファイル名順)
+    """
+    nmea = nmea_parse.NMEAParser()
+    with PROFILE.stage("concat_trip"):
+        filetotal, tids = nmea.concat_trip(root)
+
+    order = [(tid, f) for tid, files in tids.items() for f in files]
+    files = nmea.parse_files([f for tid, f in order], workers, cache=cache, columnar=True)
+    trip = dict()
+    with PROFILE.stage("parse"):
+        for (tid, _), (f, store) in zip(order, files):
+            if tid not in trip:
+                trip[tid] = {"fname": [], "store": nmea_data.EpochStore()}
+            trip[tid]["store"].merge(store)
+            trip[tid]["fname"].append(f)
+    PROFILE.update(nmea.counters)
+
+    result = list()
+    for tid, parsed in sorted(trip.items(), key=lambda x: x[1]["fname"][0]):
+        with PROFILE.stage("create_gpsdata"):
+            gsv, gsa = parsed["store"].gsv(), parsed["store"].gsa()
+        gsamode = True if show["gsamode"] and len(gsa.prn) else False
+        with PROFILE.stage("check_thr"):
+            gps = nmea_data.check_thr(gsa if gsamode else gsv, thr, show, timewidth, tdiff)
+        with PROFILE.stage("summarize"):
+            summary = nmea_stats.summarize(gps, thr["sn"], percentiles)
+
+        result.append({
+            "root": root,
+            "tid": tid,
+            "first_file": parsed["fname"][0],
+            "last_file": parsed["fname"][-1],
+            "gsamode": gsamode,
+            "epochs": len(gps),
+            "start": _str_sec(gps.time[0], tdiff) if len(gps) else "",
+            "end": _str_sec(gps.time[-1], tdiff) if len(gps) else "",
+            "sv_num": summary["sv_num"],
+            "top3": _round(summary["top3"]),
+            "top3_epoch": _round(summary["top3_epoch"]),
+            "hdop_mean": _round(summary["hdop_mean"]),
+            "hdop_min": _round(summary["hdop_min"]),
+            "hdop_max": _round(summary["hdop_max"]),
+            "cn": _round_dict(summary["cn"]),
+            "cn_median": _round_dict(summary["cn_median"]),
+            "cn_pct": _round_dict(summary["cn_pct"]),
+            "cn_above": _round_dict(summary["cn_above"]),
+        })
+
+    return result
+
+
+def analyze_root_stream(root, thr, show, timewidth, tdiff):
+    u""" analyze_rootと同じ統計値を, エポックを保持せずに1秒分ずつ算出する
+
+    中央値, パーセンタイル, 閾値以上の割合, エポックごとの上位平均は算出しない
+    """
+    nmea = nmea_parse.NMEAParser()
+    with PROFILE.stage("concat_trip"):
+        filetotal, tids = nmea.concat_trip(root)
+
+    result = list()
+    for tid, files in sorted(tids.items(), key=lambda x: x[1][0]):
+        stats = nmea_data.StreamStats(timewidth, tdiff)
+        with PROFILE.stage("parse"):
+            stats.extend(nmea.iter_trip(files))
+        summary = stats.summary(thr, show)
+
+        result.append({
+            "root": root,
+            "tid": tid,
+            "first_file": files[0],
+            "last_file": files[-1],
+            "gsamode": summary["gsamode"],
+            "epochs": summary["epochs"],
+            "start": _str_sec(summary["start"], tdiff),
+            "end": _str_sec(summary["end"], tdiff),
+            "sv_num": summary["sv_num"],
+            "top3": _round(summary["top3"]),
+            "top3_epoch": None,
+            "hdop_mean": _round(summary["hdop_mean"]),
+            "hdop_min": _round(summary["hdop_min"]),
+            "hdop_max": _round(summary["hdop_max"]),
+            "cn": _round_dict(summary["cn"]),
+            "cn_median": {},
+            "cn_pct": {},
+            "cn_above": {},
+        })
+    PROFILE.update(nmea.counters)
+
+    return result
+
+
+def write_csv(result, out):
+    prnlist = list()
+    for r in result:
+        prnlist += [k for k in r["cn"] if k not in prnlist]
+    prnlist.sort(key=nmea_data.prn_key)
+
+    writer = csv.writer(out, lineterminator="\n")
+    label = ["root", "tid", "first_file", "last_file", "gsamode", "epochs", "start", "end",
+             "sv_num", "top3", "top3_epoch", "hdop_mean", "hdop_min", "hdop_max"]
+    writer.writerow(label + ["cn_" + k for k in prnlist])
+    for r in result:
+        writer.writerow([r[k] for k in label] + [r["cn"].get(k, "") for k in prnlist])
+
+
+def write_json(result, out):
+    json.dump(result, out, indent=2)
+    out.write("\n")
+
+
+def _parse_datetime(s):
+    for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d %H:%M:%S"]:
+        try:
+            return datetime.datetime.strptime(s, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError("invalid datetime: {}".format(s))
+
+
+def _parse_percentiles(s):
+    try:
+        pcts = [float(p) for p in s.split(",") if p]
+    except ValueError:
+        pcts = None
+    if pcts is None or not all(0 <= p <= 100 for p in pcts):
+        raise argparse.ArgumentTypeError("invalid percentiles: {}".format(s))
+    return [int(p) if p.is_integer() else p for p in pcts]
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="GSV C/N summary per trip (no GUI)")
+    parser.add_argument("root", nargs="+", help="SD card root directory")
+    parser.add_argument("-f", "--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--sn", type=int, default=1, help="C/N thresh (dB)")
+    parser.add_argument("--el", type=int, default=0, help="elevation thresh (deg, GSA mode only)")
+    parser.add_argument("--start", type=_parse_datetime, help="start time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--end", type=_parse_datetime, help="end time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--tz", type=float, default=9, help="time zone offset (hour, default: 9)")
+    parser.add_argument("--no-gsa", action="store_true", help="use all GSV satellites instead of GSA")
+    parser.add_argument("--percentiles", type=_parse_percentiles, default=[10, 90],
+                        help="C/N percentiles per satellite in JSON output (comma separated, default: 10,90)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use parse cache")
+    parser.add_argument("--stream", action="store_true",
+                        help="process epochs one by one with constant memory (no parallel parse, no cache)")
+    parser.add_argument("--timings", action="store_true", help="print per-stage timings and counters to stderr")
+    parser.add_argument("--profile", metavar="FILE", help="dump profile of the whole run to FILE")
+    parser.add_argument("--profile-mode", choices=nmea_profile.MODES, default="cprofile",
+                        help="cprofile: pstats file, sampling: collapsed stacks (default: cprofile)")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    # コンソールへのログ(標準出力)が結果に混ざらないように, 標準エラー出力に出す
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
+        except Exception as e:
+            logging.error(e)
+
+    thr = {"sn": args.sn, "el": args.el}
+    show = {"gsamode": not args.no_gsa}
+    timewidth = (args.start, args.end)
+    tdiff = int(args.tz * 3600)
+    cache = None if args.no_cache else nmea_cache.ParseCache()
+
+    result = list()
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(nmea_profile.session(args.profile, args.profile_mode))
+        for root in args.root:
+            if args.stream:
+                result += analyze_root_stream(root, thr, show, timewidth, tdiff)
+            else:
+                result += analyze_root(root, thr, show, timewidth, tdiff, args.workers, cache, args.percentiles)
+    if args.timings:
+        print("profile: " + PROFILE.summary(), file=sys.stderr)
+
+    write = write_json if args.format == "json" else write_csv
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write(result, f)
+    else:
+        write(result, sys.stdout)
+
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" 疑似データ(または指定したSDカードデータ)でパース, 集計, 描画の処理時間を計測する
+
+計測結果はJSON lines形式で追記し, 同じ条件の前回の結果と比較して表示する
+
+usage: python bench.py [options]
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+import multiprocessing
+import numpy as np
+import nmea_parse  # my module
+import nmea_data   # my module
+import nmea_stats  # my module
+import nmea_synth  # my module
+
+
+def _git_commit():
+    try:
+        out = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL)
+        return out.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench(object):
+    u""" 処理ごとの計測を行うクラス
+
+    Args:
+        repeat: 計測回数 (最短時間を結果とする)
+        memory: Trueの場合はtracemallocで最大メモリ使用量も計測する (時間計測とは別に1回実行する)
+    """
+
+    def __init__(self, repeat=3, memory=True):
+        self._repeat = repeat
+        self._memory = memory
+        self.stages = dict()
+
+    def run(self, name, func, epochs=None, size=None):
+        u""" funcを計測する
+
+        Args:
+            name: 処理名
+            func: 計測する関数 (引数なし)
+            epochs, size: 処理したエポック数, byte数 (スループット算出用)
+
+        Returns:
+            funcの戻り値 (最後の実行分)
+        """
+        result = {}
+        try:
+            times = list()
+            for i in range(self._repeat):
+                start = time.perf_counter()
+                ret = func()
+                times.append(time.perf_counter() - start)
+            result["time"] = min(times)
+            if epochs:
+                result["epochs_s"] = epochs / result["time"]
+            if size:
+                result["mb_s"] = size / 1024 / 1024 / result["time"]
+
+            if self._memory:
+                tracemalloc.start()
+                func()
+                result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+        except Exception as e:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            result = {"error": "{}: {}".format(type(e).__name__, e)}
+            ret = None
+
+        self.stages[name] = result
+        print(_format_stage(name, result), file=sys.stderr)
+        return ret
+
+
+def _format_stage(name, r, prev=None):
+    if "error" in r:
+        return "{:<16} {}".format(name, r["error"])
+    text = "{:<16} {:9.4f} s".format(name, r["time"])
+    text += " {:12.0f} epochs/s".format(r["epochs_s"]) if "epochs_s" in r else " " * 21
+    text += " {:8.2f} MB/s".format(r["mb_s"]) if "mb_s" in r else " " * 13
+    text += " {:8.1f} MB peak".format(r["peak_mb"]) if "peak_mb" in r else ""
+    if prev and "time" in prev:
+        text += "  ({:+.1f}% vs prev)".format((r["time"] / prev["time"] - 1) * 100)
+    return text
+
+
+def run_bench(root, bench, workers=None, pynmea2=False, plot=True, table=True):
+    u""" SDカードデータ1枚分に対して各処理を計測する """
+    nmea = nmea_parse.NMEAParser()
+    filetotal, tids = bench.run("scan", lambda: nmea.concat_trip(root))
+    files = [f for tid, fs in sorted(tids.items(), key=lambda x: x[1][0]) for f in fs]
+    size = sum(os.path.getsize(nmea_parse.split_member(f)[0]) for f in files)
+
+    parsed = bench.run("parse", lambda: [nmea.parse(f) for f in files], size=size)
+    if parsed is None:
+        return 0, size
+    epochs = sum(len(p) for p in parsed)
+    bench.stages["parse"]["epochs_s"] = epochs / bench.stages["parse"]["time"]
+    if pynmea2:
+        slow = nmea_parse.NMEAParser(fastpath=False)
+        bench.run("parse_pynmea2", lambda: [slow.parse(f) for f in files], epochs, size)
+    bench.run("parse_store", lambda: [nmea.parse_store(f) for f in files], epochs, size)
+    bench.run("parse_parallel", lambda: list(nmea.parse_files(files, workers, minfiles=1, columnar=True)),
+              epochs, size)
+
+    trips = dict()
+    for (tid, fs) in tids.items():
+        trips[tid] = [e for f in fs for e in parsed[files.index(f)]]
+
+    data = bench.run("create_gpsdata",
+                     lambda: {tid: nmea_data.create_gpsdata(gps) for tid, gps in trips.items()}, epochs)
+
+    thr = {"sn": 30, "el": 15}
+    show = {"gsamode": True}
+
+    def window(gsv):
+        # 中央の半分の時間幅
+        t = gsv.time[~np.isnan(gsv.time)]
+        if len(t) == 0:
+            return None, None
+        q = (t[-1] - t[0]) / 4
+        return nmea_data.sec_datetime(t[0] + q), nmea_data.sec_datetime(t[-1] - q)
+
+    windows = {tid: window(gsv) for tid, (gsv, gsa) in data.items()}
+    checked = bench.run("check_thr", lambda: {
+        tid: nmea_data.check_thr(gsa if len(gsa.prn) else gsv, thr, show, windows[tid], 0)
+        for tid, (gsv, gsa) in data.items()}, epochs)
+    bench.run("summarize", lambda: [nmea_stats.summarize(gps, thr["sn"], (10, 90)) for gps in checked.values()],
+              epochs)
+
+    def stream():
+        for tid, fs in tids.items():
+            stats = nmea_data.StreamStats(windows[tid], 0)
+            stats.extend(nmea.iter_trip(fs))
+            stats.summary(thr, show)
+    bench.run("stream_stats", stream, epochs, size)
+
+    if table:
+        bench.run("table", lambda: _bench_table(trips), epochs)
+    if plot:
+        bench.run("plot", lambda: _bench_plot(trips), epochs)
+
+    return epochs, size
+
+
+def _bench_table(trips):
+    u""" テーブルモデル作成と, 全tripを展開した先頭1画面分のセル取得 """
+    from PyQt4 import QtCore, QtGui
+    import main
+    app = QtGui.QApplication.instance() or QtGui.QApplication([])
+    items = sorted(((tid, {"fname": [tid], "gps": gps}) for tid, gps in trips.items()), key=lambda x: x[0])
+    model = main.EpochTableModel(items)
+    for t in range(model.trip_num()):
+        model.setData(model.index(model.trip_row(t), 0), QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    for row in range(min(50, model.rowCount())):
+        for col in range(model.columnCount()):
+            model.data(model.index(row, col))
+            model.data(model.index(row, col), QtCore.Qt.BackgroundRole)
+
+
+def _bench_plot(trips):
+    u""" 全tripのグラフ描画 (画面には表示しない) """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import nmea_graph
+    thr = {"sn": 1, "el": 0}
+    show = {"avrg": True, "pos": True, "gsamode": True, "hdop": True, "sn": True}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for tid, gps in trips.items():
+            nmea_graph.NMEAGraph(tid, gps, 0).draw(thr, show, (None, None))
+            plt.gcf().canvas.draw()
+            plt.close("all")
+
+
+# GUIの起動時間を計測するスクリプト. 起動時にimportしないモジュールが読み込まれていないかも確認する
+_STARTUP = """
+import sys, time, json
+start = time.perf_counter()
+from PyQt4 import QtGui
+import main
+app = QtGui.QApplication(sys.argv[:1])
+gui = main.MyGui()
+app.processEvents()
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("numpy", "matplotlib", "seaborn", "asyncio") if m in sys.modules]
+sys.__stdout__.write(json.dumps({"time": elapsed, "heavy": heavy}) + "\\n")
+"""
+
+
+def bench_startup(bench):
+    u""" 別プロセスでメインウィンドウ表示までの時間を計測する
+
+    Returns:
+        起動時にimportされた重いモジュールのlist
+    """
+    heavy = list()
+
+    def startup():
+        start = time.perf_counter()
+        out = subprocess.check_output([sys.executable, "-c", _STARTUP],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)))
+        total = time.perf_counter() - start
+        r = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+        heavy[:] = r["heavy"]
+        return r["time"], total
+
+    ret = bench.run("startup", startup)
+    if ret is not None:
+        bench.stages["startup"].update(window=ret[0], process=ret[1])
+    return heavy
+
+
+def load_prev(path, config):
+    u""" 同じ条件の直前の計測結果を取得する """
+    prev = None
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                if r.get("config") == config:
+                    prev = r
+    except OSError:
+        pass
+    return prev
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="benchmark parse / aggregation / plotting")
+    parser.add_argument("--data", help="SD card root to benchmark instead of generated data")
+    parser.add_argument("--keep", help="generate data into this directory and keep it")
+    parser.add_argument("--trips", type=int, default=2, help="generated trips (default: 2)")
+    parser.add_argument("--files", type=int, default=2, help="generated files per trip (default: 2)")
+    parser.add_argument("--duration", type=int, default=1800, help="generated epochs per file (default: 1800)")
+    parser.add_argument("--sats", default="GPS:12,QZSS:2,GLONASS:8",
+                        help="satellites per constellation (default: GPS:12,QZSS:2,GLONASS:8)")
+    parser.add_argument("--no-gsa", action="store_true", help="generate data without GSA")
+    parser.add_argument("--badrate", type=float, default=0.0, help="rate of sentences with bad checksum")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="runs per stage, best is reported")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument("--no-mem", action="store_true", help="do not measure peak memory")
+    parser.add_argument("--pynmea2", action="store_true", help="also benchmark pynmea2 parse path")
+    parser.add_argument("--no-plot", action="store_true", help="skip plotting benchmark")
+    parser.add_argument("--no-table", action="store_true", help="skip table model benchmark")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure GUI startup (main window shown) instead of parse/plot stages")
+    parser.add_argument("--budget", type=float, default=0.5,
+                        help="startup time budget (sec) for --startup, exits with 1 when exceeded (default: 0.5)")
+    parser.add_argument("-o", "--output", default="bench_results.jsonl",
+                        help="results file (JSON lines, appended) (default: bench_results.jsonl)")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    sats = {k: int(v) for k, v in (s.split(":") for s in args.sats.split(",") if s)}
+    config = {"data": args.data} if args.data else {
+        "trips": args.trips, "files": args.files, "duration": args.duration, "sats": sats,
+        "gsa": not args.no_gsa, "badrate": args.badrate, "seed": args.seed}
+    config["workers"] = args.workers
+    if args.startup:
+        return main_startup(args)
+
+    bench = Bench(args.repeat, not args.no_mem)
+    with contextlib.ExitStack() as stack:
+        if args.data:
+            root = args.data
+        else:
+            root = args.keep if args.keep else stack.enter_context(tempfile.TemporaryDirectory())
+            start = time.perf_counter()
+            paths, epochs, size = nmea_synth.generate_sd(
+                root, args.trips, args.files, args.duration, sats, not args.no_gsa, args.badrate, args.seed)
+            bench.stages["generate"] = {"time": time.perf_counter() - start}
+            print(_format_stage("generate", bench.stages["generate"]), file=sys.stderr)
+
+        epochs, size = run_bench(root, bench, args.workers, args.pynmea2, not args.no_plot, not args.no_table)
+
+    result = _result(config, bench.stages, epochs=epochs, bytes=size)
+
+    prev = load_prev(args.output, config)
+    print("\nepochs: {}  size: {:.1f} MB  commit: {}".format(epochs, size/1024/1024, result["commit"]))
+    if prev:
+        print("prev: {} (commit: {})".format(prev["date"], prev["commit"]))
+    for name, r in bench.stages.items():
+        print(_format_stage(name, r, prev["stages"].get(name) if prev else None))
+
+    _save(args.output, result)
+
+    return 0
+
+
+def _result(config, stages, **kw):
+    result = {
+        "date": datetime.datetime.now().replace(microsecond=0).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "stages": stages,
+    }
+    result.update(kw)
+    return result
+
+
+def _save(path, result):
+    with open(path, "a") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+def main_startup(args):
+    u""" GUIの起動時間を計測し, 予算(--budget)内か, 描画用モジュールを起動時にimportしていないかを確認する
+
+    Returns:
+        終了コード (0: OK, 1: 予算超過または起動時に描画用モジュールをimportしている)
+    """
+    bench = Bench(args.repeat, memory=False)
+    heavy = bench_startup(bench)
+    r = bench.stages["startup"]
+    if "error" in r:
+        return 1
+
+    config = {"startup": True}
+    prev = load_prev(args.output, config)
+    _save(args.output, _result(config, bench.stages, budget=args.budget, heavy=heavy))
+
+    print(_format_stage("startup", r, prev["stages"].get("startup") if prev else None))
+    print("main window: {:.3f} s (budget {:.3f} s)  process: {:.3f} s".format(r["window"], args.budget, r["process"]))
+    ok = r["window"] <= args.budget and not heavy
+    if heavy:
+        print("NG: imported at startup: {}".format(", ".join(heavy)))
+    print("OK" if ok else "NG")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
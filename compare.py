@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" 2台の受信機のSDカードを同時刻のエポックで対応付け, 衛星ごとのC/N差を比較する
+
+usage: python compare.py [options] SDROOT_A SDROOT_B
+"""
+
+import sys
+import argparse
+import contextlib
+import logging
+import logging.config
+import multiprocessing
+import nmea_cache  # my module
+import nmea_compare  # my module
+from batch import _parse_datetime
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="compare C/N of two receivers logged side by side (A - B)")
+    parser.add_argument("root_a", help="SD card root directory or zip of receiver A")
+    parser.add_argument("root_b", help="SD card root directory or zip of receiver B")
+    parser.add_argument("--trip-a", metavar="TID", help="trip id of A (default: all trips)")
+    parser.add_argument("--trip-b", metavar="TID", help="trip id of B (default: all trips)")
+    parser.add_argument("-o", "--output", help="per-epoch CSV file (default: stdout)")
+    parser.add_argument("--chart", metavar="FILE", help="save comparison chart to FILE (png/svg/pdf)")
+    parser.add_argument("--show", action="store_true", help="show comparison chart in a window")
+    parser.add_argument("--sn", type=int, default=1, help="C/N thresh (dB)")
+    parser.add_argument("--el", type=int, default=0, help="elevation thresh (deg, GSA mode only)")
+    parser.add_argument("--start", type=_parse_datetime, help="start time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--end", type=_parse_datetime, help="end time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--tz", type=float, default=9, help="time zone offset (hour, default: 9)")
+    parser.add_argument("--no-gsa", action="store_true", help="use all GSV satellites instead of GSA")
+    parser.add_argument("--step", type=float, default=1.0, help="epochs within the same STEP seconds match (default: 1)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use parse cache")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    # コンソールへのログ(標準出力)が結果に混ざらないように, 標準エラー出力に出す
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
+        except Exception as e:
+            logging.error(e)
+
+    thr = {"sn": args.sn, "el": args.el}
+    show = {"gsamode": not args.no_gsa}
+    timewidth = (args.start, args.end)
+    tdiff = int(args.tz * 3600)
+    cache = None if args.no_cache else nmea_cache.ParseCache()
+
+    try:
+        gps_a, gsamode_a = nmea_compare.load_card(args.root_a, thr, show, timewidth, tdiff, args.trip_a,
+                                                  args.workers, cache)
+        gps_b, gsamode_b = nmea_compare.load_card(args.root_b, thr, show, timewidth, tdiff, args.trip_b,
+                                                  args.workers, cache)
+    except KeyError as e:
+        print("error: {}".format(e.args[0]), file=sys.stderr)
+        return 1
+    cmp = nmea_compare.compare(gps_a, gps_b, args.step)
+
+    summary = cmp.summary()
+    print("matched epochs: {}  only A: {}  only B: {}  common sv: {}  top3 diff: {:.2f}".format(
+        summary["epochs"], summary["only_a"], summary["only_b"], summary["sv_num"], summary["top3_delta"]),
+        file=sys.stderr)
+    for no, d in summary["delta"].items():
+        print("  {:>4}: {:+.2f}".format(no, d), file=sys.stderr)
+
+    labels = (args.trip_a or "A", args.trip_b or "B")
+    if args.chart:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(12, 10))
+        FigureCanvasAgg(fig)
+        nmea_compare.render(fig, cmp, labels, tdiff)
+        fig.savefig(args.chart)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            nmea_compare.write_csv(cmp, f, tdiff)
+    elif not args.chart and not args.show:
+        nmea_compare.write_csv(cmp, sys.stdout, tdiff)
+
+    if args.show:
+        nmea_compare.draw(cmp, labels, tdiff)
+
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
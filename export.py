@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" GUIを使わずにSDカードデータのtripごとのグラフを画像/PDFファイルに出力する
+
+usage: python export.py [options] SDROOT [SDROOT ...]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import logging.config
+import multiprocessing
+import nmea_parse  # my module
+import nmea_export  # my module
+from batch import _parse_datetime
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="export GSV graphs per trip to image/PDF files (no GUI)")
+    parser.add_argument("root", nargs="+", help="SD card root directory")
+    parser.add_argument("-o", "--output", default="export",
+                        help="output directory, or PDF file with --multipage (default: ./export)")
+    parser.add_argument("-f", "--format", choices=nmea_export.FORMATS, default="png")
+    parser.add_argument("--multipage", action="store_true", help="write all trips to one PDF file (one page per trip)")
+    parser.add_argument("-t", "--trip", action="append", metavar="TID", help="export only this trip id (repeatable)")
+    parser.add_argument("--sn", type=int, default=1, help="C/N thresh (dB)")
+    parser.add_argument("--el", type=int, default=0, help="elevation thresh (deg, GSA mode only)")
+    parser.add_argument("--start", type=_parse_datetime, help="start time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--end", type=_parse_datetime, help="end time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--tz", type=float, default=9, help="time zone offset (hour, default: 9)")
+    parser.add_argument("--no-gsa", action="store_true", help="use all GSV satellites instead of GSA")
+    parser.add_argument("--size", type=float, nargs=2, default=[12, 8], metavar=("W", "H"),
+                        help="figure size (inch, default: 12 8)")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of png (default: 100)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use parse cache")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    try:
+        logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
+    except Exception as e:
+        logging.error(e)
+
+    thr = {"sn": args.sn, "el": args.el}
+    show = {"avrg": True, "pos": True, "gsamode": not args.no_gsa, "hdop": True, "sn": True}
+    output = args.output
+    if args.multipage and not output.lower().endswith(".pdf"):
+        output += ".pdf"
+
+    trips = list()
+    nmea = nmea_parse.NMEAParser()
+    for root in args.root:
+        filetotal, tids = nmea.concat_trip(root)
+        trips += [(tid, files) for tid, files in sorted(tids.items(), key=lambda x: x[1][0])
+                  if not args.trip or tid in args.trip]
+    if not trips:
+        print("no trip to export", file=sys.stderr)
+        return 1
+
+    for tid, path in nmea_export.export_trips(
+            trips, output, args.format, thr, show, (args.start, args.end), int(args.tz * 3600),
+            args.multipage, args.workers, tuple(args.size), args.dpi, not args.no_cache):
+        print("{}: {}".format(tid, path), file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
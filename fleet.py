@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" 複数のSDカードのC/N統計値をSDカード(受信機)ごとに比較する
+
+usage: python fleet.py [options] PATH [PATH ...]
+"""
+
+import sys
+import argparse
+import contextlib
+import json
+import logging
+import logging.config
+import multiprocessing
+import numpy as np
+import nmea_fleet  # my module
+from batch import _parse_datetime, _parse_percentiles
+
+
+def _jsonable(v):
+    if isinstance(v, dict):
+        return {str(k): _jsonable(x) for k, x in v.items()}
+    if isinstance(v, (float, np.floating)):
+        return None if np.isnan(v) else round(float(v), 2)
+    if isinstance(v, np.integer):
+        return int(v)
+    return v
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="compare GSV C/N summary of many SD cards (no GUI)")
+    parser.add_argument("path", nargs="+",
+                        help="SD card root directory or zip, or directory containing them (one per device)")
+    parser.add_argument("-f", "--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--chart", metavar="FILE", help="save comparison chart to FILE (png/svg/pdf)")
+    parser.add_argument("--sn", type=int, default=1, help="C/N thresh (dB)")
+    parser.add_argument("--el", type=int, default=0, help="elevation thresh (deg, GSA mode only)")
+    parser.add_argument("--start", type=_parse_datetime, help="start time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--end", type=_parse_datetime, help="end time (local, 'YYYY-mm-dd HH:MM:SS')")
+    parser.add_argument("--tz", type=float, default=9, help="time zone offset (hour, default: 9)")
+    parser.add_argument("--no-gsa", action="store_true", help="use all GSV satellites instead of GSA")
+    parser.add_argument("--percentiles", type=_parse_percentiles, default=[10, 90],
+                        help="C/N percentiles per satellite in JSON output (comma separated, default: 10,90)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes, one card each (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use parse cache")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    # コンソールへのログ(標準出力)が結果に混ざらないように, 標準エラー出力に出す
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
+        except Exception as e:
+            logging.error(e)
+
+    thr = {"sn": args.sn, "el": args.el}
+    show = {"gsamode": not args.no_gsa}
+    tdiff = int(args.tz * 3600)
+    roots = [root for path in args.path for root in nmea_fleet.find_roots(path)]
+
+    results = list()
+    for r in nmea_fleet.analyze_fleet(roots, thr, show, (args.start, args.end), tdiff, args.workers,
+                                      not args.no_cache, args.percentiles):
+        print("{}: {}".format(r["device"], r.get("error", "{} epochs".format(r.get("epochs")))), file=sys.stderr)
+        results.append(r)
+
+    if args.chart:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(12, 8))
+        FigureCanvasAgg(fig)
+        nmea_fleet.render(fig, results, thr)
+        fig.savefig(args.chart)
+
+    with contextlib.ExitStack() as stack:
+        out = stack.enter_context(open(args.output, "w", newline="")) if args.output else sys.stdout
+        if args.format == "json":
+            json.dump([_jsonable(r) for r in results], out, indent=2)
+            out.write("\n")
+        else:
+            nmea_fleet.write_csv(results, out, tdiff)
+
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
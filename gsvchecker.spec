@@ -9,7 +9,8 @@ a = Analysis(['main.py'],
              datas=[
                  ('C:\\Anaconda3\\envs\\gsvchecker\\Library\\bin\\mkl_avx.dll','.'),
                  ('C:\\Anaconda3\\envs\\gsvchecker\\Library\\bin\\mkl_def.dll','.')],
-             hiddenimports=[],
+             # main.pyで使用時にimportするモジュール (_LazyModule)
+             hiddenimports=['asyncio', 'nmea_index', 'nmea_data', 'nmea_graph', 'nmea_net', 'nmea_export', 'nmea_fleet', 'nmea_compare'],
              hookspath=[],
              runtime_hooks=[],
              excludes=[],
@@ -6,34 +6,446 @@ import os
 import time
 import datetime
 import re
+import bisect
+import collections
 import logging
 import logging.config
+import multiprocessing
+import threading
+import importlib
 from PyQt4 import QtCore
 from PyQt4 import QtGui
 import nmea_parse  # my module
-import nmea_graph  # my module
+import nmea_cache  # my module
+import nmea_profile  # my module
+from nmea_profile import PROFILE
 import myinfo      # my module
 
 
+class _LazyModule(object):
+    u""" 初回の属性参照時にimportするモジュール
+
+    numpy, matplotlib, seaborn等を使用するモジュールは, 起動時間短縮のため使用時にimportする.
+    (pyinstallerで検出されないため, gsvchecker.specのhiddenimportsにも追加すること)
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+asyncio = _LazyModule("asyncio")
+nmea_index = _LazyModule("nmea_index")  # my module
+nmea_data = _LazyModule("nmea_data")    # my module
+nmea_graph = _LazyModule("nmea_graph")  # my module
+nmea_net = _LazyModule("nmea_net")      # my module
+nmea_export = _LazyModule("nmea_export")    # my module
+nmea_fleet = _LazyModule("nmea_fleet")      # my module
+nmea_compare = _LazyModule("nmea_compare")  # my module
+
+
+class LogView(QtCore.QObject):
+    u""" ログエリア表示クラス
+
+    複数のGuiLoggerからの書き込みをbufferに溜め, GUI threadのtimerで一定間隔ごとにまとめて表示する.
+    append()は任意のthreadから呼び出してよい.
+    表示する行数はmaxlinesまでとし, 超えた分は古い行から削除する
+
+    Args:
+        editor: 表示先のQTextEdit
+        interval: 表示間隔 (ms)
+        maxlines: 保持する最大行数
+    """
+
+    def __init__(self, editor, interval=100, maxlines=5000):
+        super(LogView, self).__init__(editor)
+        self._editor = editor
+        self._maxlines = maxlines
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._lines = 0
+        editor.document().setMaximumBlockCount(maxlines)
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._flush)
+        self._timer.start(interval)
+
+    def append(self, message, color):
+        with self._lock:
+            self._pending.append((message, color))
+            self._lines += message.count("\n")
+            # 表示前に削除される分は溜めない
+            while self._lines > self._maxlines and len(self._pending) > 1:
+                self._lines -= self._pending.popleft()[0].count("\n")
+
+    def clear(self):
+        u""" 表示中のログと未表示のログを消去する """
+        with self._lock:
+            self._pending.clear()
+            self._lines = 0
+        self._editor.clear()
+
+    @QtCore.pyqtSlot()
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = collections.deque()
+            self._lines = 0
+
+        # 同じ色の連続した書き込みは1回で挿入する
+        chunks = list()
+        for message, color in pending:
+            if chunks and chunks[-1][1] == color:
+                chunks[-1][0].append(message)
+            else:
+                chunks.append(([message], color))
+
+        cursor = self._editor.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        for messages, color in chunks:
+            fmt = QtGui.QTextCharFormat()
+            fmt.setForeground(QtGui.QBrush(color))
+            cursor.insertText("".join(messages), fmt)
+        cursor.endEditBlock()
+        self._editor.setTextCursor(cursor)
+        self._editor.ensureCursorVisible()
+
+
 class GuiLogger(object):
     u""" GUIへのログ表示用クラス
 
-    GUIへ標準出力、エラー出力をパイプする
+    GUIへ標準出力、エラー出力をパイプする.
+    書き込みはLogViewでまとめて表示するため, worker threadから書き込んでよい
     """
 
-    def __init__(self, editor, out=None, color=None):
-        self.editor = editor
+    def __init__(self, view, out=None, color=None):
+        self.view = view
         self.out = out
-        self.color = editor.textColor() if not color else color
+        self.color = QtGui.QColor("black") if not color else color
 
     def write(self, message):
-        self.editor.moveCursor(QtGui.QTextCursor.End)
-        self.editor.setTextColor(self.color)
-        self.editor.insertPlainText(message)
+        self.view.append(message, self.color)
 
         # 出力オブジェクトが指定されている場合、そのオブジェクトにmessageを書き出す
         self.out.write(message) if self.out else ""
 
+    def flush(self):
+        self.out.flush() if self.out else ""
+
+
+class LoadWorker(QtCore.QObject):
+    u""" ファイル読み込み, パースを行うworkerクラス
+
+    QThread上で実行し, 進捗をsignalで通知する.
+    cancel()後は次のファイルの区切りで処理を中断する.
+    グラフ描画用データは描画時に作成するため, ここでは作成しない
+    """
+
+    scanned = QtCore.pyqtSignal(int)            # 総ファイル数
+    fileLoaded = QtCore.pyqtSignal(int, str)    # 読み込み済みファイル数, ファイル名
+    tripLoaded = QtCore.pyqtSignal(int, int, str)   # 読み込み済みtrip数, 総trip数, tripID
+    finished = QtCore.pyqtSignal(object)        # trip (中断時はNone)
+
+    def __init__(self, path, cache, tz, timewidth=(None, None), profile=None):
+        super(LoadWorker, self).__init__()
+        self._path = path
+        self._cache = cache
+        self._tz = tz
+        self._timewidth = timewidth
+        self._profile = profile
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        PROFILE.reset()
+        if self._profile:
+            with nmea_profile.session(nmea_profile.default_path(self._profile), self._profile):
+                self._run()
+        else:
+            self._run()
+
+    def _run(self):
+        try:
+            trip = self._parse()
+        except Exception as e:
+            logging.error(e)
+            trip = None
+        self.finished.emit(trip)
+
+    def _parse(self):
+        index = nmea_index.TripIndex()
+        try:
+            return self._parse_trips(index)
+        finally:
+            index.close()
+
+    def _parse_trips(self, index):
+        nmea = nmea_parse.NMEAParser()
+        trip = dict()
+
+        # 時間幅指定時は, 範囲外のファイルをパース前に除外する
+        start, end = [nmea_data.datetime_sec(t) - self._tz if t else None for t in self._timewidth]
+        with PROFILE.stage("concat_trip"):
+            filetotal, tids = nmea.concat_trip(self._path, index, start, end)
+        self.scanned.emit(filetotal)
+
+        # 表の表示にdictのlistを使用するため, 全tripのファイルを逐次パースする
+        order = [(tid, f) for tid, files in tids.items() for f in files]
+        parser = nmea.parse_files([f for tid, f in order], cache=self._cache)
+        loaded = list()
+        with PROFILE.stage("parse"):
+            for readfile, ((tid, _), (f, parsed)) in enumerate(zip(order, parser)):
+                if self._cancel.is_set():
+                    parser.close()
+                    return None
+
+                if tid not in trip:
+                    trip[tid] = {"fname": [], "gps": []}
+                trip[tid]["gps"] += parsed
+                trip[tid]["fname"].append(f)
+                loaded.append((f, parsed))
+                self.fileLoaded.emit(readfile+1, f)
+                if len(trip[tid]["fname"]) == len(tids[tid]):
+                    self.tripLoaded.emit(len(trip), len(tids), tid)
+        index.update_parsed(loaded)
+        PROFILE.update(nmea.counters)
+
+        return trip
+
+
+class FollowWorker(QtCore.QObject):
+    u""" NORMALディレクトリへの追記を一定間隔で読み込むworkerクラス
+
+    QThread上で実行し, 新たに確定したエポックをsignalで通知する.
+    set_interval(), stop()は他のthreadから呼び出してよい
+    """
+
+    appended = QtCore.pyqtSignal(object)    # NMEAFollower.poll()の結果
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, path, interval):
+        super(FollowWorker, self).__init__()
+        self._path = path
+        self._interval = interval
+        self._follower = None
+        self._timer = None
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        self._follower = nmea_parse.NMEAFollower(self._path)
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._poll)
+        self._poll()
+        self._timer.start(self._interval)
+
+    @QtCore.pyqtSlot()
+    def _poll(self):
+        try:
+            new = self._follower.poll()
+        except Exception as e:
+            logging.error(e)
+            return
+        if new:
+            self.appended.emit(new)
+
+    def set_interval(self, interval):
+        u""" 更新間隔(ms)を変更する """
+        QtCore.QMetaObject.invokeMethod(self, "_set_interval", QtCore.Qt.QueuedConnection,
+                                        QtCore.Q_ARG(int, interval))
+
+    def stop(self):
+        u""" 監視を終了する. 組み立て中のエポックを確定して通知する """
+        QtCore.QMetaObject.invokeMethod(self, "_stop", QtCore.Qt.QueuedConnection)
+
+    @QtCore.pyqtSlot(int)
+    def _set_interval(self, interval):
+        self._interval = interval
+        if self._timer:
+            self._timer.setInterval(interval)
+
+    @QtCore.pyqtSlot()
+    def _stop(self):
+        if self._timer:
+            self._timer.stop()
+        if self._follower:
+            new = self._follower.flush()
+            if new:
+                self.appended.emit(new)
+        self.finished.emit()
+
+
+class NetWorker(QtCore.QObject):
+    u""" TCP/UDPで受信したNMEAを一定間隔でまとめて通知するworkerクラス
+
+    QThread上でasyncioのイベントループを実行する.
+    通知の形式はFollowWorkerと同じ. set_interval(), stop()は他のthreadから呼び出してよい
+    """
+
+    appended = QtCore.pyqtSignal(object)    # NMEAIngest.poll()の結果
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, host, tcp, udp, interval, connect=()):
+        super(NetWorker, self).__init__()
+        self._host = host
+        self._tcp = tcp
+        self._udp = udp
+        self._connect = connect
+        self._interval = interval
+        self._loop = asyncio.new_event_loop()
+        self._done = self._loop.create_future()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            logging.error(e)
+        finally:
+            self._loop.close()
+            self.finished.emit()
+
+    async def _serve(self):
+        ingest = nmea_net.NMEAIngest()
+        await ingest.start(self._host, self._tcp, self._udp)
+        print("listen: tcp{} udp{}".format(self._tcp, self._udp))
+        for host, port in self._connect:
+            await ingest.connect(host, port)
+            print("connect: {}:{}".format(host, port))
+        try:
+            while not self._done.done():
+                await asyncio.wait([self._done], timeout=self._interval/1000)
+                new = ingest.poll()
+                if new:
+                    self.appended.emit(new)
+        finally:
+            await ingest.close()
+        new = ingest.flush()
+        if new:
+            self.appended.emit(new)
+
+    def set_interval(self, interval):
+        u""" 通知間隔(ms)を変更する (次回の通知から反映される) """
+        self._interval = interval
+
+    def stop(self):
+        u""" 受信を終了する. 組み立て中のエポックを確定して通知する """
+        def done():
+            if not self._done.done():
+                self._done.set_result(None)
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(done)
+
+
+class ExportWorker(QtCore.QObject):
+    u""" tripごとのグラフをファイルに出力するworkerクラス
+
+    QThread上で実行し, 描画はnmea_exportのプロセスプールで行う.
+    cancel()後は次のtripの区切りで処理を中断する
+    """
+
+    exported = QtCore.pyqtSignal(int, str)  # 出力済みtrip数, 出力ファイル名
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, trips, outdir, fmt, thr, show, timewidth, tz, multipage, workers):
+        super(ExportWorker, self).__init__()
+        self._args = (trips, outdir, fmt, thr, show, timewidth, tz, multipage, workers)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        try:
+            exporter = nmea_export.export_trips(*self._args)
+            for num, (tid, path) in enumerate(exporter):
+                if self._cancel.is_set():
+                    exporter.close()
+                    break
+                print("export [{}] {}".format(tid, path))
+                self.exported.emit(num+1, path)
+        except Exception as e:
+            logging.error(e)
+        self.finished.emit()
+
+
+class FleetWorker(QtCore.QObject):
+    u""" 複数のSDカードの統計値を算出するworkerクラス
+
+    QThread上で実行し, 集計はnmea_fleetのプロセスプールでSDカードごとに行う.
+    cancel()後は次のSDカードの区切りで処理を中断する
+    """
+
+    cardDone = QtCore.pyqtSignal(int, str)  # 集計済みSDカード数, 表示名
+    finished = QtCore.pyqtSignal(object)    # 統計値dictのlist (中断時はNone)
+
+    def __init__(self, roots, thr, show, timewidth, tz, workers):
+        super(FleetWorker, self).__init__()
+        self._args = (roots, thr, show, timewidth, tz, workers)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        results = list()
+        try:
+            analyzer = nmea_fleet.analyze_fleet(*self._args)
+            for r in analyzer:
+                if self._cancel.is_set():
+                    analyzer.close()
+                    results = None
+                    break
+                results.append(r)
+                self.cardDone.emit(len(results), r["device"])
+        except Exception as e:
+            logging.error(e)
+            results = None
+        self.finished.emit(results)
+
+
+class CompareWorker(QtCore.QObject):
+    u""" 2台の受信機のSDカードを読み込み, 同時刻のエポックを対応付けるworkerクラス
+
+    QThread上で実行する. 途中で中断はできない
+    """
+
+    loaded = QtCore.pyqtSignal(int, str)    # 読み込み済みSDカード数, パス
+    finished = QtCore.pyqtSignal(object)    # nmea_compare.Comparison (失敗時はNone)
+
+    def __init__(self, paths, thr, show, timewidth, tz, workers, cache):
+        super(CompareWorker, self).__init__()
+        self._paths = paths
+        self._args = (thr, show, timewidth, tz)
+        self._workers = workers
+        self._cache = cache
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        try:
+            data = list()
+            for path in self._paths:
+                gps, gsamode = nmea_compare.load_card(path, *self._args, workers=self._workers, cache=self._cache)
+                data.append(gps)
+                self.loaded.emit(len(data), path)
+            cmp = nmea_compare.compare(*data)
+        except Exception as e:
+            logging.error(e)
+            cmp = None
+        self.finished.emit(cmp)
+
 
 class TimeSet(QtGui.QHBoxLayout):
     u""" 日時情報設定用クラス
@@ -132,6 +544,212 @@ class TimeSelect:
         self._dialog.exec_()
 
 
+class EpochTableModel(QtCore.QAbstractTableModel):
+    u""" エポック情報表示用テーブルモデル
+
+    tripごとの見出し行と, 展開されたtripのエポック行を表示する.
+    セルの値は表示時にparse結果から作成するため, 非表示のエポック行は作成しない
+
+    Args:
+        trips: (tid, parse結果dict)のlist
+        strtime: RMCから時刻表示文字列を作成する関数
+    """
+
+    LABEL = ["time", "sv num", "hdop"]
+
+    def __init__(self, trips=(), strtime=str, parent=None):
+        super(EpochTableModel, self).__init__(parent)
+        self._trips = list(trips)
+        self._strtime = strtime
+        self._tindex = {tid: t for t, (tid, parsed) in enumerate(self._trips)}
+        self._expand = [False] * len(self._trips)
+        self._offset = list()
+        self._svseen = set()
+        self._svlist = list()
+        for tid, parsed in self._trips:
+            self._svlist += self._find_sv(parsed["gps"])
+        self._svinfo_cache = collections.OrderedDict()
+        self._update_offset()
+
+    def _find_sv(self, gpsinput):
+        u""" svlistにない衛星番号を出現順に取得する """
+        new = list()
+        for gps in gpsinput:
+            if "GSV" in gps:
+                for sv in gps["GSV"]["sv"]:
+                    if sv["no"] and sv["no"] not in self._svseen:
+                        self._svseen.add(sv["no"])
+                        new.append(sv["no"])
+        return new
+
+    def _add_svlist(self, gpsinput):
+        u""" 新たな衛星の列を末尾に追加する. Returns: 列を追加したか """
+        new = self._find_sv(gpsinput)
+        if new:
+            col = self.columnCount()
+            self.beginInsertColumns(QtCore.QModelIndex(), col, col+len(new)-1)
+            self._svlist += new
+            self.endInsertColumns()
+        return bool(new)
+
+    def _update_offset(self):
+        u""" 各tripの見出し行の行番号を算出する """
+        self._offset = list()
+        row = 0
+        for (tid, parsed), expand in zip(self._trips, self._expand):
+            self._offset.append(row)
+            row += 1 + (len(parsed["gps"]) if expand else 0)
+        self._rows = row
+
+    def _locate(self, row):
+        u""" 行番号から(trip番号, エポック番号)を求める. 見出し行のエポック番号は-1 """
+        t = bisect.bisect_right(self._offset, row) - 1
+        return t, row - self._offset[t] - 1
+
+    def _svinfo(self, t, e):
+        u""" エポックの衛星ごとのC/Nと使用衛星を取得する (表示中の行分のみキャッシュする) """
+        key = (t, e)
+        info = self._svinfo_cache.get(key)
+        if info is None:
+            gps = self._trips[t][1]["gps"][e]
+            sn = {sv["no"]: sv["sn"] for sv in gps["GSV"]["sv"]} if "GSV" in gps else {}
+            used = set(gps["GSA"]["sv"]) if "GSA" in gps else set()
+            info = self._svinfo_cache[key] = (sn, used)
+            if len(self._svinfo_cache) > 1024:
+                self._svinfo_cache.popitem(last=False)
+        return info
+
+    def svlist(self):
+        return self._svlist
+
+    def trip_num(self):
+        return len(self._trips)
+
+    def trip_id(self, t):
+        return self._trips[t][0]
+
+    def find_trip(self, tid):
+        u""" tripIDのtrip番号. ない場合はNone """
+        return self._tindex.get(tid)
+
+    def add_trip(self, tid, parsed):
+        u""" tripを末尾に追加する (フォローモード用)
+
+        Returns:
+            (追加したtrip番号, 列を追加したか)
+        """
+        added = self._add_svlist(parsed["gps"])
+        t = len(self._trips)
+        self.beginInsertRows(QtCore.QModelIndex(), self._rows, self._rows)
+        self._trips.append((tid, {"fname": list(parsed["fname"]), "gps": list(parsed["gps"])}))
+        self._tindex[tid] = t
+        self._expand.append(False)
+        self._update_offset()
+        self.endInsertRows()
+        return t, added
+
+    def append_epochs(self, t, parsed):
+        u""" t番目のtripにエポックを追加する (フォローモード用)
+
+        Args:
+            parsed: 追加分のparse結果dict ("fname"は追記があったファイル)
+
+        Returns:
+            列を追加したか
+        """
+        added = self._add_svlist(parsed["gps"])
+        trip = self._trips[t][1]
+        trip["fname"] += [f for f in parsed["fname"] if f not in trip["fname"]]
+        num = len(parsed["gps"])
+        if self._expand[t] and num:
+            first = self._offset[t] + 1 + len(trip["gps"])
+            self.beginInsertRows(QtCore.QModelIndex(), first, first+num-1)
+            trip["gps"] += parsed["gps"]
+            self._update_offset()
+            self.endInsertRows()
+        else:
+            trip["gps"] += parsed["gps"]
+            self._update_offset()
+        return added
+
+    def trip(self, t):
+        u""" t番目のtripのparse結果dict """
+        return self._trips[t][1]
+
+    def trip_row(self, t):
+        u""" t番目のtripの見出し行の行番号 """
+        return self._offset[t]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.LABEL) + len(self._svlist)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return (self.LABEL + self._svlist)[section]
+        return None
+
+    def flags(self, index):
+        t, e = self._locate(index.row())
+        if e < 0 and index.column() == 0:
+            return QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        t, e = self._locate(index.row())
+        col = index.column()
+
+        if e < 0:
+            if col == 0 and role == QtCore.Qt.CheckStateRole:
+                return QtCore.Qt.Checked if self._expand[t] else QtCore.Qt.Unchecked
+            return None
+
+        gps = self._trips[t][1]["gps"][e]
+        if role == QtCore.Qt.DisplayRole:
+            if col == 0:
+                return self._strtime(gps["RMC"])
+            elif col == 1:
+                return "{}{}".format(len(gps["GSV"]["sv"]), gps["RMC"].status) if "GSV" in gps else None
+            elif col == 2:
+                return gps["GGA"]["hdop"] if "GGA" in gps else "99"
+            sn, used = self._svinfo(t, e)
+            no = self._svlist[col-len(self.LABEL)]
+            if no in sn:
+                return sn[no] if sn[no] else "-"
+        elif role == QtCore.Qt.BackgroundRole and col >= len(self.LABEL):
+            sn, used = self._svinfo(t, e)
+            no = self._svlist[col-len(self.LABEL)]
+            if no in sn and no in used:
+                return QtGui.QColor("cyan")
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        t, e = self._locate(index.row())
+        if e >= 0 or index.column() != 0 or role != QtCore.Qt.CheckStateRole:
+            return False
+
+        expand = value == QtCore.Qt.Checked
+        num = len(self._trips[t][1]["gps"])
+        if expand != self._expand[t] and num:
+            first = self._offset[t] + 1
+            if expand:
+                self.beginInsertRows(QtCore.QModelIndex(), first, first+num-1)
+            else:
+                self.beginRemoveRows(QtCore.QModelIndex(), first, first+num-1)
+            self._expand[t] = expand
+            self._svinfo_cache.clear()
+            self._update_offset()
+            self.endInsertRows() if expand else self.endRemoveRows()
+        else:
+            self._expand[t] = expand
+        self.dataChanged.emit(index, index)
+        return True
+
+
 class MyGui(QtGui.QMainWindow):
     u""" GUI用クラス
 
@@ -142,11 +760,24 @@ class MyGui(QtGui.QMainWindow):
         super(MyGui, self).__init__()
 
         self._text = QtGui.QTextEdit()
-        self._table = QtGui.QTableWidget()
+        self._table = QtGui.QTableView()
         self._tableBtn = list()
         self._thr = {"sn": 1, "el": 0}
         self._show = {"avrg": True, "pos": True, "gsamode": True, "hdop": True, "sn": True}
         self._tz = 9*3600   # UTC+9:00 (JPN)
+        self._workers = os.cpu_count() or 1
+        self._cache = nmea_cache.ParseCache()
+        self._loader = None
+        self._loaders = list()
+        self._follower = None
+        self._exporter = None  # 実行中のグラフ出力, 複数SDカード比較, A/B比較のworker
+        self._interval = 5  # フォローモード, ネットワーク受信の更新間隔 (秒)
+        self._netports = "tcp:10110 udp:10110"
+        self._profile = None    # 読み込み時のプロファイル (None, nmea_profile.MODES)
+        self._graphs = dict()
+        self._graphcache = nmea_cache.LRUCache(16)    # tripごとの描画用データ
+        self._pbar = None
+        self._expbar = None
         self._dirpath = "."
         self._timeselect = TimeSelect(self)
         self._menuobj = {}
@@ -169,12 +800,26 @@ class MyGui(QtGui.QMainWindow):
         menubar = self.menuBar()
         fileMenu = menubar.addMenu('&File')
         fileMenu.addAction(self._create_fileopenmenu())
+        fileMenu.addAction(self._create_archiveopenmenu())
+        fileMenu.addAction(self._create_triplistmenu())
+        fileMenu.addAction(self._create_clearcachemenu())
+        fileMenu.addAction(self._create_followmenu())
+        fileMenu.addAction(self._create_netmenu())
+        fileMenu.addAction(self._create_exportmenu())
+        fileMenu.addAction(self._create_fleetmenu())
+        fileMenu.addAction(self._create_comparemenu())
 
         editMenu = menubar.addMenu('&Edit')
         threshMenu = editMenu.addMenu('Set Thresh')
         threshMenu.addAction(self._create_timewidthmenu())
         threshMenu.addAction(self._create_threshmenu("sn"))
         threshMenu.addAction(self._create_threshmenu("el"))
+        editMenu.addAction(self._create_workermenu())
+        editMenu.addAction(self._create_intervalmenu())
+        profileMenu = editMenu.addMenu('Profile load')
+        group = QtGui.QActionGroup(self)
+        for mode in [None] + nmea_profile.MODES:
+            profileMenu.addAction(self._create_profilemenu(mode, group))
         tzMenu = editMenu.addMenu('Time zone')
         tzMenu.addAction(self._create_tzmenu())
         showMenu = editMenu.addMenu('Show graph')
@@ -197,6 +842,64 @@ class MyGui(QtGui.QMainWindow):
 
         return menu
 
+    def _create_archiveopenmenu(self):
+        menu = QtGui.QAction("Open archive", self)
+        menu.setStatusTip("Open zip archive of SD card")
+        menu.triggered.connect(self._open_archive)
+
+        return menu
+
+    def _create_triplistmenu(self):
+        menu = QtGui.QAction("Trip list", self)
+        menu.setStatusTip("List trips in time width without parsing")
+        menu.triggered.connect(self._list_trips)
+
+        return menu
+
+    def _create_clearcachemenu(self):
+        menu = QtGui.QAction("Clear cache", self)
+        menu.setStatusTip("Clear parse cache")
+        menu.triggered.connect(self._cache.clear)
+
+        return menu
+
+    def _create_followmenu(self):
+        menu = QtGui.QAction("Follow dir", self, checkable=True)
+        menu.setStatusTip("Read appended data of growing NMEA files periodically")
+        menu.triggered.connect(self._set_follow)
+        self._menuobj["follow"] = menu
+
+        return menu
+
+    def _create_netmenu(self):
+        menu = QtGui.QAction("Network ingest", self, checkable=True)
+        menu.setStatusTip("Receive NMEA streams over TCP/UDP")
+        menu.triggered.connect(self._set_net)
+        self._menuobj["net"] = menu
+
+        return menu
+
+    def _create_exportmenu(self):
+        menu = QtGui.QAction("Export graphs", self)
+        menu.setStatusTip("Save graphs of trips to png/svg/pdf files")
+        menu.triggered.connect(self._export)
+
+        return menu
+
+    def _create_fleetmenu(self):
+        menu = QtGui.QAction("Fleet compare", self)
+        menu.setStatusTip("Compare C/N of SD cards in subdirectories (one card per device)")
+        menu.triggered.connect(self._fleet)
+
+        return menu
+
+    def _create_comparemenu(self):
+        menu = QtGui.QAction("Compare A/B", self)
+        menu.setStatusTip("Compare C/N of two receivers logged side by side")
+        menu.triggered.connect(self._compare)
+
+        return menu
+
     def _create_threshmenu(self, key):
         a = {"sn": {"menu": "C/N Thresh", "tip": "Set C/N Thresh"},
              "el": {"menu": "Elevation Thresh", "tip": "Set elevation Thresh"}}
@@ -219,6 +922,26 @@ class MyGui(QtGui.QMainWindow):
         menu.triggered.connect(self._set_timezone)
         return menu
 
+    def _create_workermenu(self):
+        menu = QtGui.QAction("Parse workers", self)
+        menu.setStatusTip("set number of parse processes")
+        menu.triggered.connect(self._set_workers)
+        return menu
+
+    def _create_intervalmenu(self):
+        menu = QtGui.QAction("Follow interval", self)
+        menu.setStatusTip("set refresh interval of follow mode and network ingest")
+        menu.triggered.connect(self._set_interval)
+        return menu
+
+    def _create_profilemenu(self, mode, group):
+        menu = QtGui.QAction(mode if mode else "off", self, checkable=True)
+        menu.setStatusTip("dump profile of loading to ~/.gsvchecker/profile")
+        menu.setActionGroup(group)
+        menu.setChecked(mode == self._profile)
+        menu.triggered.connect(lambda: setattr(self, "_profile", mode))
+        return menu
+
     def _create_showmenu(self, key):
         a = {"avrg": {"menu": "Show average", "tip": "Show avereage"},
              "pos": {"menu": "Show position", "tip": "Show position"},
@@ -248,37 +971,328 @@ class MyGui(QtGui.QMainWindow):
 
     def _open(self):
         self._dirpath = QtGui.QFileDialog.getExistingDirectory(self, 'Open Dir', self._dirpath)
-        self._text.clear()
-        print(self._dirpath)
+        self._load(self._dirpath)
+
+    def _open_archive(self):
+        path = QtGui.QFileDialog.getOpenFileName(self, 'Open archive', self._dirpath, "zip (*.zip)")
+        if path:
+            self._dirpath = os.path.dirname(path)
+            self._load(path)
+
+    def _load(self, path):
+        self._logview.clear()
+        print(path)
+        self._cancel_load()
+        self._stop_follow()
+
+        self._pbar = QtGui.QProgressDialog("Read files", "Cancel", 0, 0, self)
+        self._pbar.setWindowTitle("Read files")
+        self._pbar.setLabelText("loading...")
+        self._pbar.setAutoReset(False)
+        self._pbar.setAutoClose(False)
+        self._pbar.canceled.connect(self._cancel_load)
+        self._pbar.show()
+
+        thread = QtCore.QThread(self)
+        worker = LoadWorker(path, self._cache, self._tz, self._timeselect.get(), self._profile)
+        worker.moveToThread(thread)
+        worker.scanned.connect(self._pbar.setMaximum)
+        worker.fileLoaded.connect(self._file_loaded)
+        worker.tripLoaded.connect(self._trip_loaded)
+        worker.finished.connect(self._loaded)
+        worker.finished.connect(thread.quit)
+        thread.started.connect(worker.run)
+
+        # 中断したworkerも終了するまで参照を保持する
+        self._loaders = [l for l in self._loaders if not l[0].isFinished()] + [(thread, worker)]
+        self._loader = worker
+        thread.start()
+
+    def _list_trips(self):
+        u""" パースせずにindexからtrip一覧を表示する (時間幅指定時は範囲内のtripのみ) """
+        self._dirpath = QtGui.QFileDialog.getExistingDirectory(self, 'Open Dir', self._dirpath)
+        if not self._dirpath:
+            return
         nmea = nmea_parse.NMEAParser()
-        trip = dict()
-
-        filetotal, tids = nmea.concat_trip(self._dirpath)
-
-        readfile = 0;
-        pbar = QtGui.QProgressDialog("Read files", "Cancel", 0, filetotal)
-        pbar.setWindowTitle("Read files")
-        pbar.setLabelText("loading...")
-        pbar.show()
-
-        for tid, files in tids.items():
-            trip[tid] = {"fname": [], "gps": []}
-            for f in files:
-                readfile += 1
-                pbar.setValue(readfile)
-                QtCore.QCoreApplication.processEvents()
-                if pbar.wasCanceled():
-                    break
-
-                parsed = nmea.parse(f)
-                trip[tid]["gps"] += parsed
-                trip[tid]["fname"].append(f)
-
-            if pbar.wasCanceled():
-                break
-
-        pbar.close()
-        self._show_table(trip)
+        index = nmea_index.TripIndex()
+        root, files = nmea.list_files(self._dirpath)
+        index.scan(files, root)
+        start, end = [nmea_data.datetime_sec(t) - self._tz if t else None for t in self._timeselect.get()]
+        strtime = lambda t: "----" if t is None else nmea_data.make_timestr(t, self._tz)
+        for tid, (files, first, last, epochs) in sorted(index.trips(root, start, end).items(),
+                                                        key=lambda x: x[1][0][0]):
+            print("[{}] {} - {}  files:{}  epochs:{}".format(
+                tid, strtime(first), strtime(last), len(files), "----" if epochs is None else epochs))
+        index.close()
+
+    def _cancel_load(self):
+        u""" 読み込みを中断する. worker終了を待たずに結果を破棄する """
+        if self._loader:
+            self._loader.cancel()
+            self._loader = None
+        if self._pbar:
+            self._pbar.close()
+            self._pbar = None
+
+    def _file_loaded(self, readfile, fname):
+        if self._pbar and self.sender() is self._loader:
+            self._pbar.setValue(readfile)
+
+    def _trip_loaded(self, readtrip, triptotal, tid):
+        if self._pbar and self.sender() is self._loader:
+            self._pbar.setLabelText("loading... trip {}/{} ({} loaded)".format(readtrip, triptotal, tid))
+
+    def _loaded(self, trip):
+        if self.sender() is not self._loader:
+            return
+        self._loader = None
+        if self._pbar:
+            self._pbar.close()
+            self._pbar = None
+        if trip is not None:
+            with PROFILE.stage("show_table"):
+                self._show_table(trip)
+            PROFILE.report()
+
+    def _export(self):
+        u""" 表示中のtripのグラフをファイルに出力する """
+        model = self._table.model()
+        tids = [model.trip_id(t) for t in range(model.trip_num())]
+        if not tids or self._exporter:
+            return
+
+        formats = nmea_export.FORMATS + ["pdf (multipage)"]
+        fmt, ok = QtGui.QInputDialog.getItem(self, "Export graphs", "select format", formats, editable=False)
+        if not ok:
+            return
+        selected, ok = QtGui.QInputDialog.getText(self, "Export graphs", "trip id (separated by space)",
+                                                  text=" ".join(tids))
+        selected = [tid for tid in selected.split() if tid in tids] if ok else []
+        if not selected:
+            return
+        multipage = fmt not in nmea_export.FORMATS
+        if multipage:
+            out = QtGui.QFileDialog.getSaveFileName(self, 'Export PDF', self._dirpath, "pdf (*.pdf)")
+        else:
+            out = QtGui.QFileDialog.getExistingDirectory(self, 'Export Dir', self._dirpath)
+        if not out:
+            return
+
+        # 読み込んだファイルが存在する場合はworkerでパースし, ネットワーク受信分は受信済みエポックを渡す
+        trips = list()
+        for tid in selected:
+            parsed = model.trip(model.find_trip(tid))
+            exist = all(os.path.isfile(nmea_parse.split_member(f)[0]) for f in parsed["fname"])
+            trips.append((tid, list(parsed["fname"]) if exist else list(parsed["gps"])))
+
+        self._expbar = QtGui.QProgressDialog("Export graphs", "Cancel", 0, len(trips), self)
+        self._expbar.setWindowTitle("Export graphs")
+        self._expbar.setAutoClose(False)
+        self._expbar.show()
+
+        thread = QtCore.QThread(self)
+        worker = ExportWorker(trips, out, "pdf" if multipage else fmt, self._thr, self._show,
+                              self._timeselect.get(), self._tz, multipage, self._workers)
+        worker.moveToThread(thread)
+        worker.exported.connect(self._expbar.setValue)
+        worker.finished.connect(self._exported)
+        worker.finished.connect(thread.quit)
+        self._expbar.canceled.connect(worker.cancel)
+        thread.started.connect(worker.run)
+
+        self._loaders = [l for l in self._loaders if not l[0].isFinished()] + [(thread, worker)]
+        self._exporter = worker
+        thread.start()
+
+    def _exported(self):
+        self._exporter = None
+        self._expbar.close()
+
+    def _fleet(self):
+        u""" 指定ディレクトリ以下の複数のSDカードのC/N統計値を比較する """
+        path = QtGui.QFileDialog.getExistingDirectory(self, 'Fleet Dir', self._dirpath)
+        if not path or self._exporter:
+            return
+        self._dirpath = path
+        roots = nmea_fleet.find_roots(path)
+        print("fleet: {} cards".format(len(roots)))
+
+        self._expbar = QtGui.QProgressDialog("Fleet compare", "Cancel", 0, len(roots), self)
+        self._expbar.setWindowTitle("Fleet compare")
+        self._expbar.setAutoClose(False)
+        self._expbar.show()
+
+        thread = QtCore.QThread(self)
+        worker = FleetWorker(roots, dict(self._thr), dict(self._show), self._timeselect.get(), self._tz,
+                             self._workers)
+        worker.moveToThread(thread)
+        worker.cardDone.connect(self._expbar.setValue)
+        worker.finished.connect(self._fleet_done)
+        worker.finished.connect(thread.quit)
+        self._expbar.canceled.connect(worker.cancel)
+        thread.started.connect(worker.run)
+
+        self._loaders = [l for l in self._loaders if not l[0].isFinished()] + [(thread, worker)]
+        self._exporter = worker
+        thread.start()
+
+    def _fleet_done(self, results):
+        self._exporter = None
+        self._expbar.close()
+        if not results:
+            return
+        for r in results:
+            if "error" in r:
+                print("[{}] error: {}".format(r["device"], r["error"]))
+            else:
+                print("[{}] epochs:{}  sv:{}  top3:{:.1f}  top3/epoch:{:.1f}".format(
+                    r["device"], r["epochs"], r["sv_num"], r["top3"], r["top3_epoch"]))
+        nmea_fleet.draw(results, self._thr)
+
+    def _compare(self):
+        u""" 2台の受信機のSDカードのC/Nを同時刻のエポックで比較する (A - B) """
+        if self._exporter:
+            return
+        paths = list()
+        for label in ["A", "B"]:
+            path = QtGui.QFileDialog.getExistingDirectory(self, 'Open Dir ({})'.format(label), self._dirpath)
+            if not path:
+                return
+            paths.append(path)
+            self._dirpath = path
+        print("compare: A={} B={}".format(*paths))
+
+        self._expbar = QtGui.QProgressDialog("Compare A/B", None, 0, len(paths), self)
+        self._expbar.setWindowTitle("Compare A/B")
+        self._expbar.setAutoClose(False)
+        self._expbar.show()
+
+        thread = QtCore.QThread(self)
+        worker = CompareWorker(paths, dict(self._thr), dict(self._show), self._timeselect.get(), self._tz,
+                               self._workers, self._cache)
+        worker.moveToThread(thread)
+        worker.loaded.connect(self._expbar.setValue)
+        worker.finished.connect(self._compared)
+        worker.finished.connect(thread.quit)
+        thread.started.connect(worker.run)
+
+        self._loaders = [l for l in self._loaders if not l[0].isFinished()] + [(thread, worker)]
+        self._exporter = worker
+        thread.start()
+
+    def _compared(self, cmp):
+        self._exporter = None
+        self._expbar.close()
+        if cmp is None:
+            return
+        summary = cmp.summary()
+        print("matched epochs:{}  only A:{}  only B:{}  top3 diff:{:.2f}".format(
+            summary["epochs"], summary["only_a"], summary["only_b"], summary["top3_delta"]))
+        nmea_compare.draw(cmp, ("A", "B"), self._tz)
+
+    def _set_follow(self):
+        if not self._menuobj["follow"].isChecked():
+            self._stop_follow(discard=False)
+            return
+
+        path = QtGui.QFileDialog.getExistingDirectory(self, 'Follow Dir', self._dirpath)
+        if not path:
+            self._menuobj["follow"].setChecked(False)
+            return
+        self._dirpath = path
+        self._start_live("follow: {}".format(path), FollowWorker(path, self._interval*1000), "follow")
+
+    def _set_net(self):
+        if not self._menuobj["net"].isChecked():
+            self._stop_follow(discard=False)
+            return
+
+        ports, ok = QtGui.QInputDialog.getText(
+            self, "Input", "Listen ports / connect to (e.g. tcp:10110 udp:10110 connect:192.168.0.10:10110)",
+            text=self._netports)
+        tcp = [int(p) for p in re.findall(r"(?<!\S)tcp:([0-9]+)", ports)] if ok else []
+        udp = [int(p) for p in re.findall(r"(?<!\S)udp:([0-9]+)", ports)] if ok else []
+        connect = [(h, int(p)) for h, p in re.findall(r"connect:(\S+):([0-9]+)", ports)] if ok else []
+        if not tcp and not udp and not connect:
+            self._menuobj["net"].setChecked(False)
+            return
+        self._netports = ports
+        worker = NetWorker("0.0.0.0", tcp, udp, self._interval*1000, connect)
+        self._start_live("network ingest", worker, "net")
+
+    def _start_live(self, title, worker, menu):
+        u""" 追記, 受信したエポックを随時テーブルに追加するworkerを開始する (フォローモード, ネットワーク受信) """
+        self._logview.clear()
+        print(title)
+        self._cancel_load()
+        self._stop_follow()
+        self._menuobj[menu].setChecked(True)
+        self._create_table_area()
+        self._tableBtn = dict()
+        self._graphs = dict()
+        self._graphcache.clear()
+
+        thread = QtCore.QThread(self)
+        worker.moveToThread(thread)
+        worker.appended.connect(self._appended)
+        worker.finished.connect(thread.quit)
+        thread.started.connect(worker.run)
+
+        self._loaders = [l for l in self._loaders if not l[0].isFinished()] + [(thread, worker)]
+        self._follower = worker
+        thread.start()
+
+    def _stop_follow(self, discard=True):
+        u""" フォローモードを終了する
+
+        Args:
+            discard: Trueの場合は終了時に確定したエポックを表示しない (テーブルを作り直す場合)
+        """
+        if self._follower:
+            self._follower.stop()
+            if discard:
+                self._follower = None
+            else:
+                self._follower.thread().finished.connect(self._follow_stopped)
+        self._menuobj["follow"].setChecked(False)
+        self._menuobj["net"].setChecked(False)
+
+    def _follow_stopped(self):
+        if self._follower and self.sender() is self._follower.thread():
+            self._follower = None
+
+    def _appended(self, new):
+        u""" フォローモード, ネットワーク受信で追加されたエポックをテーブル, グラフデータに追加する """
+        if self.sender() is not self._follower:
+            return
+        model = self._table.model()
+        resize = False
+        for tid, parsed in new.items():
+            t = model.find_trip(tid)
+            if t is None:
+                t, added = model.add_trip(tid, parsed)
+                # グラフはテーブルと同じlistを参照し, エポックを二重に保持しない
+                self._graphs[tid] = nmea_graph.NMEAGraph(tid, model.trip(t)["gps"], self._tz, self._graphcache)
+                self._table.setIndexWidget(model.index(model.trip_row(t), 1),
+                                           self._create_graphbtn(tid, parsed, self._graphs[tid]))
+            else:
+                added = model.append_epochs(t, parsed)     # NMEAGraphと共有するlistに追加する
+                self._graphs[tid].append(parsed["gps"])
+                self._tableBtn[tid][0].setText(self._graphbtn_text(tid, model.trip(t)))
+            resize = resize or added
+
+        if resize:
+            for i in range(len(model.LABEL), model.columnCount()):
+                self._table.setColumnWidth(i, 40)
+        self._set_spans(model)
+
+    def _set_interval(self):
+        interval, ok = QtGui.QInputDialog.getInt(self, "Input", "Set follow refresh interval (sec)",
+                                                 value=self._interval, min=1, max=3600, step=1)
+        if ok:
+            self._interval = interval
+            if self._follower:
+                self._follower.set_interval(interval*1000)
 
     def _set_thresh(self, key):
         a = {"sn": {"title": "Input", "str": "Set SN thresh (dB)",
@@ -290,6 +1304,12 @@ class MyGui(QtGui.QMainWindow):
         if ok:
             self._thr[key] = thr
 
+    def _set_workers(self):
+        workers, ok = QtGui.QInputDialog.getInt(self, "Input", "Set number of parse processes",
+                                                value=self._workers, min=1, max=64, step=1)
+        if ok:
+            self._workers = workers
+
     def _set_timezone(self):
         f_t = lambda h=0,m=0: h*3600+m*60
         tzlist = [
@@ -332,8 +1352,15 @@ class MyGui(QtGui.QMainWindow):
         self.addDockWidget(QtCore.Qt.TopDockWidgetArea, self.top_dock)
 
         self._text.setReadOnly(True)
-        sys.stdout = GuiLogger(self._text, sys.stdout)
-        sys.stderr = GuiLogger(self._text, sys.stderr, QtGui.QColor("red"))
+        self._logview = LogView(self._text)
+        sys.stdout = GuiLogger(self._logview, sys.stdout, self._text.textColor())
+        sys.stderr = GuiLogger(self._logview, sys.stderr, QtGui.QColor("red"))
+
+        # 処理時間の集計結果はログエリアにも表示する
+        handler = logging.StreamHandler(GuiLogger(self._logview, color=QtGui.QColor("darkGreen")))
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logging.getLogger(nmea_profile.__name__).addHandler(handler)
 
         self._text.setTextColor(QtGui.QColor("blue"))
         readme = \
@@ -343,14 +1370,13 @@ class MyGui(QtGui.QMainWindow):
         self._text.setText(readme)
 
     def _create_table_area(self):
-        self._label = ["time", "sv num", "hdop"]
         self._labelwidth = [170, 60]
-        self._table.setRowCount(0)
-        self._table.setColumnCount(len(self._label))
-        self._table.setHorizontalHeaderLabels(self._label)
+        self._table.clearSpans()
+        self._table.setModel(EpochTableModel(parent=self))
         for i, w in enumerate(self._labelwidth):
             self._table.setColumnWidth(i, w)
         self._table.verticalHeader().setVisible(False)
+        self._table.verticalHeader().setResizeMode(QtGui.QHeaderView.Fixed)
         self.setCentralWidget(self._table)
 
     def _str_datetime(self, rmc):
@@ -364,79 +1390,45 @@ class MyGui(QtGui.QMainWindow):
 
     def _show_table(self, trip):
         self._create_table_area()
-        self._table.setRowCount(0)
-        row = 0
-        svlist = list()
-        btnrow = list()
+        self._tableBtn = dict()
+        self._graphcache.clear()
+        # 描画用データは初回の描画時に作成する
+        self._graphs = {tid: nmea_graph.NMEAGraph(tid, parsed["gps"], self._tz, self._graphcache)
+                        for tid, parsed in trip.items()}
 
         QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
-        pbar = QtGui.QProgressDialog("Create data", "Cancel", 0, len(trip.keys()))
-        pbar.setWindowTitle("graph data create")
-        pbar.setLabelText("creating graph data..")
-        pbar.show()
-
-        for created, (tid, parsed) in enumerate(sorted(trip.items(), key=lambda x: x[1]["fname"][0])):
-            pbar.setValue(created+1)
-
-            gps = parsed["gps"]
-            self._table.insertRow(row)
-
-            chkbox = QtGui.QTableWidgetItem()
-            chkbox.setFlags(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)
-            chkbox.setCheckState(QtCore.Qt.Unchecked)
-            self._table.setItem(row, 0, chkbox)
-            self._table.itemClicked.connect(self._item_clicked)
-
-            self._table.setItem(row, 1, QtGui.QTableWidgetItem())
-            self._table.setCellWidget(row, 1, self._create_graphbtn(tid, parsed))
-            self._table.setSpan(row, 1, 1, 2)
-            btnrow.append(row)
-            row += 1
-
-            for gpsone in gps:
-                self._table.insertRow(row)
-                self._table.setItem(row, 0,
-                                    QtGui.QTableWidgetItem(self._str_datetime(gpsone["RMC"])))
-                self._table.setItem(row, 2, QtGui.QTableWidgetItem(gpsone["GGA"]["hdop"] if "GGA" in gpsone else 99))
-                if "GSV" in gpsone:
-                    self._table.setItem(row, 1,
-                                        QtGui.QTableWidgetItem(
-                                            "{}{}".format(str(len(gpsone["GSV"]["sv"])), gpsone["RMC"].status)))
-
-                    for sv in gpsone["GSV"]["sv"]:
-                        if not sv["no"]:
-                            continue
-
-                        if sv["no"] not in svlist:
-                            svlist.append(sv["no"])
-                            self._table.insertColumn(self._table.columnCount())
-                            self._table.setColumnWidth(self._table.columnCount()-1, 40)
-
-                        self._table.setItem(row, svlist.index(sv["no"])+len(self._label),
-                                            QtGui.QTableWidgetItem("{}".format(sv["sn"] if sv["sn"] else "-")))
-
-                if "GSA" in gpsone:
-                    for used in gpsone["GSA"]["sv"]:
-                        item = self._table.item(row, svlist.index(used)+len(self._label))
-                        if item:
-                            item.setBackgroundColor(QtGui.QColor("cyan"))
-
-                self._table.hideRow(row)
-                row += 1
-
-        self._table.setHorizontalHeaderLabels(self._label+svlist)
-
-        for row in btnrow:
-            self._table.setSpan(row, 1, 1, self._table.columnCount()-1)
-
-        pbar.close()
+        trips = sorted(trip.items(), key=lambda x: x[1]["fname"][0])
+        model = EpochTableModel(trips, self._str_datetime, self)
+        self._table.setModel(model)
+        for i, w in enumerate(self._labelwidth):
+            self._table.setColumnWidth(i, w)
+        for i in range(len(model.LABEL), model.columnCount()):
+            self._table.setColumnWidth(i, 40)
+
+        for t, (tid, parsed) in enumerate(trips):
+            row = model.trip_row(t)
+            self._table.setIndexWidget(model.index(row, 1), self._create_graphbtn(tid, parsed, self._graphs[tid]))
+        self._set_spans(model)
+
         QtGui.QApplication.restoreOverrideCursor()
 
-    def _create_graphbtn(self, tid, parsed):
+    def _set_spans(self, model):
+        u""" tripの見出し行のボタンを全列に広げる (行, 列の追加後は再設定する) """
+        self._table.clearSpans()
+        for t in range(model.trip_num()):
+            self._table.setSpan(model.trip_row(t), 1, 1, model.columnCount()-1)
+
+    @staticmethod
+    def _graphbtn_text(tid, parsed):
         fname = lambda s: os.path.splitext(os.path.basename(s))[0]
         text = "[{}] {}".format(tid, fname(parsed["fname"][0]))
         if len(parsed["fname"]) > 1:
             text += " - " + fname(parsed["fname"][-1])
+        return text
+
+    def _create_graphbtn(self, tid, parsed, graph):
+        fname = lambda s: os.path.splitext(os.path.basename(s))[0]
+        text = self._graphbtn_text(tid, parsed)
 
         for f in parsed["fname"]:
             print(fname(f))
@@ -445,24 +1437,14 @@ class MyGui(QtGui.QMainWindow):
         btn = QtGui.QPushButton(text)
         btn.setStyleSheet("Text-align:left")
 
-        graph = nmea_graph.NMEAGraph(tid, parsed["gps"], self._tz)
         btn.clicked.connect(lambda: graph.draw(self._thr, self._show, self._timeselect.get()))
-        self._tableBtn.append([btn, graph])
+        self._tableBtn[tid] = [btn, graph]
 
         return btn
 
 
-    def _item_clicked(self, item):
-        row = item.row() + 1
-        while row < self._table.rowCount() and self._table.item(row, 0).text():
-            if item.checkState() == QtCore.Qt.Checked:
-                self._table.showRow(row)
-            else:
-                self._table.hideRow(row)
-            row += 1
-
-
 def main():
+    multiprocessing.freeze_support()
     app = QtGui.QApplication(sys.argv)
     try:
         logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
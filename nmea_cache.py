@@ -0,0 +1,168 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import hashlib
+import pickle
+import zlib
+import collections
+import logging
+import nmea_parse  # my module
+
+
+# parse結果の形式を変更した場合はインクリメントし, 古いキャッシュを無効にする
+CACHE_VERSION = 2
+
+
+class ParseCache(object):
+    u""" NMEAParser.parseの結果をディスクにキャッシュするクラス
+
+    キャッシュはファイルパス, サイズ, mtimeから求めたkeyごとに
+    pickle+zlibで圧縮して保存する. ファイルが更新されるとkeyが変わるため,
+    古いキャッシュは参照されずにLRUで削除される.
+    keyにパーサーの設定を含まないため, fastpath有効時のparse結果のみ保存する (NMEAParser.parse_filesが判定する).
+    parse()の結果(dictのlist)とparse_store()の結果(EpochStore)はkindで区別して別々に保存する
+
+    Args:
+        cachedir: キャッシュ保存ディレクトリ (None: ~/.gsvchecker/cache)
+        maxsize: キャッシュの合計サイズ上限 (byte)
+    """
+
+    def __init__(self, cachedir=None, maxsize=512*1024*1024):
+        self._log = logging.getLogger(__name__)
+        if not cachedir:
+            cachedir = os.path.join(os.path.expanduser("~"), ".gsvchecker", "cache")
+        self._dir = cachedir
+        self._maxsize = maxsize
+        self._total = None
+
+    def _path(self, file, kind):
+        st = os.stat(nmea_parse.split_member(file)[0])  # zip内ファイルはzipファイルのサイズ, mtimeを使用する
+        key = "{}|{}|{}|{}|{}".format(CACHE_VERSION, kind, os.path.abspath(file), st.st_size, st.st_mtime_ns)
+        return os.path.join(self._dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _entries(self):
+        try:
+            return [e for e in os.scandir(self._dir) if e.is_file()]
+        except OSError:
+            return []
+
+    def contains(self, file, kind="list"):
+        u""" 有効なキャッシュが存在するか """
+        try:
+            return os.path.isfile(self._path(file, kind))
+        except OSError:
+            return False
+
+    def get(self, file, kind="list"):
+        u""" キャッシュ済みのparse結果を取得する
+
+        Args:
+            kind: "list": parse()の結果, "store": parse_store()の結果
+
+        Returns:
+            parse結果. キャッシュがない場合はNone
+        """
+        try:
+            path = self._path(file, kind)
+            with open(path, "rb") as f:
+                parsed = pickle.loads(zlib.decompress(f.read()))
+            os.utime(path)  # LRU用にアクセス日時を更新する
+            return parsed
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            return None
+
+    def put(self, file, parsed, kind="list"):
+        u""" parse結果をキャッシュに保存し, 上限を超えた分を古い順に削除する """
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            path = self._path(file, kind)
+            data = zlib.compress(pickle.dumps(parsed, pickle.HIGHEST_PROTOCOL), 1)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            self._log.warning("cache write failed: {}".format(e))
+            return
+
+        if self._total is None:
+            self._total = sum(e.stat().st_size for e in self._entries())
+        else:
+            self._total += len(data)
+        if self._total > self._maxsize:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        self._total = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if self._total <= self._maxsize:
+                break
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                self._total -= size
+            except OSError:
+                pass
+
+    def discard(self, file):
+        u""" 指定ファイルのキャッシュを削除する """
+        for kind in ["list", "store"]:
+            try:
+                os.remove(self._path(file, kind))
+            except OSError:
+                pass
+        self._total = None
+
+    def clear(self):
+        u""" 全キャッシュを削除する """
+        for e in self._entries():
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+        self._total = 0
+
+
+class LRUCache(object):
+    u""" メモリ上に件数を上限として保持するLRUキャッシュ
+
+    Args:
+        maxsize: 保持する最大件数
+    """
+
+    def __init__(self, maxsize=16):
+        self._maxsize = maxsize
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        u""" 値を取得する. 取得した値は削除される順番が最後になる """
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key, value):
+        u""" 値を保存し, 上限を超えた分を最後に使用した日時が古い順に削除する """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def discard(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import csv
+import matplotlib.pyplot as plt
+import seaborn as sns
+import numpy as np
+import nmea_parse  # my module
+import nmea_data   # my module
+import nmea_stats  # my module
+from nmea_graph import DecimatedLines
+
+
+def load_card(path, thr, show, timewidth=(None, None), tdiff=0, tid=None, workers=None, cache=None):
+    u""" SDカード1枚分(またはそのうち1trip)のGPSDataを作成し, 閾値と時間幅で絞り込む
+
+    パース結果はファイルごとのEpochStoreとして受け取り, 連結する
+
+    Args:
+        path: sd root path
+        thr, show, timewidth, tdiff: nmea_data.check_thrと同じ絞り込み設定
+        tid: 対象のtripID (None: 全trip)
+        workers, cache: NMEAParser.parse_filesの引数
+
+    Returns:
+        (GPSData, gsamode)
+    """
+    nmea = nmea_parse.NMEAParser()
+    filetotal, tids = nmea.concat_trip(path)
+    if tid is not None and tid not in tids:
+        raise KeyError("trip {} not found in {}".format(tid, path))
+    files = [f for t, fs in sorted(tids.items(), key=lambda x: x[1][0]) if tid is None or t == tid for f in fs]
+
+    store = nmea_data.EpochStore()
+    for f, parsed in nmea.parse_files(files, workers, cache=cache, columnar=True):
+        store.merge(parsed)
+    gsv, gsa = store.gsv(), store.gsa()
+    gsamode = True if show["gsamode"] and len(gsa.prn) else False
+    gps = nmea_data.check_thr(gsa if gsamode else gsv, thr, show, timewidth, tdiff)
+    return gps, gsamode
+
+
+def _sorted_keys(time, step):
+    u""" 時刻をstep秒単位の整数keyにして昇順に並べる (時刻なしのエポックは除き, 同じkeyは先頭のみ残す)
+
+    Returns:
+        (key, エポック番号)
+    """
+    rows = np.nonzero(~np.isnan(time))[0]
+    keys = np.round(time[rows] / step).astype(np.int64)
+    order = np.argsort(keys, kind="mergesort")    # 通常は時刻順のため, ほぼ並べ替え不要
+    keys, rows = keys[order], rows[order]
+    first = np.concatenate([[True], keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=bool)
+    return keys[first], rows[first]
+
+
+def merge_join(a, b):
+    u""" 昇順で重複のない2つのkey配列から, 一致するkeyの位置を求める
+
+    a, bの先頭から小さい方のkeyを進める1回の走査(マージ)で照合する.
+    計算量は O(len(a) + len(b)) で, 総当たりでの照合は行わない
+
+    Returns:
+        (aの位置の配列, bの位置の配列)
+    """
+    a, b = a.tolist(), b.tolist()
+    ia, ib = list(), list()
+    i, j = 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            ia.append(i)
+            ib.append(j)
+            i += 1
+            j += 1
+    return np.array(ia, dtype=np.intp), np.array(ib, dtype=np.intp)
+
+
+class Comparison(object):
+    u""" 2台の受信機(A, B)の同時刻のエポックを対応付けた比較結果 (compare()で作成する)
+
+    Attributes:
+        time: 対応付けたエポックの時刻 (Aの時刻, epoch_secの秒数)
+        prn: A, B両方にある衛星番号のlist
+        sn_a, sn_b: 衛星ごとのC/N [epoch, prn] (衛星が存在しないエポックはnan)
+        delta: 衛星ごとのC/N差 (A - B) [epoch, prn]
+        top_a, top_b: エポックごとのC/N上位topn衛星の平均 (各受信機の全衛星から算出)
+        top_delta: top_a - top_b
+        only_a, only_b: 対応するエポックがなかったエポック数
+    """
+
+    def __init__(self, time, prn, sn_a, sn_b, top_a, top_b, only_a, only_b, topn):
+        self.time = time
+        self.prn = prn
+        self.sn_a = sn_a
+        self.sn_b = sn_b
+        self.delta = sn_a - sn_b
+        self.top_a = top_a
+        self.top_b = top_b
+        self.top_delta = top_a - top_b
+        self.only_a = only_a
+        self.only_b = only_b
+        self.topn = topn
+
+    def __len__(self):
+        return len(self.time)
+
+    def count(self):
+        u""" 衛星ごとのA, B両方で受信したエポック数 """
+        return (~np.isnan(self.delta)).sum(axis=0)
+
+    def mean_delta(self):
+        u""" 衛星ごとのC/N差の平均 (両方で受信したエポックのみ. なしはnan) """
+        valid = ~np.isnan(self.delta)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(valid, self.delta, 0).sum(axis=0) / valid.sum(axis=0)
+
+    def summary(self):
+        u""" 比較結果の統計値dict """
+        top = self.top_delta[~np.isnan(self.top_delta)]
+        return {
+            "epochs": len(self),
+            "only_a": self.only_a,
+            "only_b": self.only_b,
+            "sv_num": len(self.prn),
+            "delta": dict(zip(self.prn, self.mean_delta())),
+            "top3_delta": np.mean(top) if len(top) else np.nan,
+        }
+
+
+def _sn(gps, rows, prn):
+    u""" 指定エポック, 衛星のC/N (存在しない衛星, エポックはnan) """
+    col = {no: i for i, no in enumerate(gps.prn)}
+    cols = np.array([col[no] for no in prn], dtype=np.intp)
+    sn = gps.sn[rows][:, cols]
+    return np.where(sn != nmea_data.FILL, sn, np.nan)
+
+
+def compare(gps_a, gps_b, step=1.0, topn=3):
+    u""" 2台の受信機のGPSDataをRMCの日時で対応付け, 衛星ごとのC/N差を算出する
+
+    各受信機のエポックを時刻順に並べ, merge_join()で同じ時刻(step秒単位)のエポックを対応付ける
+
+    Args:
+        gps_a, gps_b: nmea_data.GPSData
+        step: 同じ時刻とみなす時間単位 (秒)
+        topn: エポックごとの上位平均の衛星数
+
+    Returns:
+        Comparison
+    """
+    keys_a, rows_a = _sorted_keys(gps_a.time, step)
+    keys_b, rows_b = _sorted_keys(gps_b.time, step)
+    ia, ib = merge_join(keys_a, keys_b)
+    rows_a, rows_b = rows_a[ia], rows_b[ib]
+
+    prn_b = set(gps_b.prn)
+    prn = [no for no in gps_a.prn if no in prn_b]
+    top_a = nmea_stats.compute(gps_a.select(rows_a), topn=topn).top
+    top_b = nmea_stats.compute(gps_b.select(rows_b), topn=topn).top
+    return Comparison(gps_a.time[rows_a], prn, _sn(gps_a, rows_a, prn), _sn(gps_b, rows_b, prn),
+                      top_a, top_b, len(gps_a) - len(rows_a), len(gps_b) - len(rows_b), topn)
+
+
+def write_csv(cmp, out, tdiff=0):
+    u""" エポックごとに1行, 上位平均とその差, 衛星ごとのC/N差を列とした表を出力する """
+    fmt = lambda v: "" if np.isnan(v) else round(float(v), 2)
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["time", "top3_a", "top3_b", "top3_delta"] + ["d_" + no for no in cmp.prn])
+    for i in range(len(cmp)):
+        writer.writerow([str(nmea_data.sec_datetime(cmp.time[i], tdiff)), fmt(cmp.top_a[i]), fmt(cmp.top_b[i]),
+                         fmt(cmp.top_delta[i])] + [fmt(v) for v in cmp.delta[i]])
+
+
+def _set_timeticks(ax, time, tdiff):
+    ticks = sorted(set(np.linspace(0, len(time)-1, 6).astype(int)))
+    ax.set_xticks(ticks)
+    ax.set_xticklabels([nmea_data.make_timestr(time[i], tdiff) for i in ticks], rotation=15, fontsize="small")
+
+
+def render(fig, cmp, labels=("A", "B"), tdiff=0):
+    u""" figに比較グラフを作成する
+
+    上段: 衛星ごとのC/N差の平均, 中段: 上位平均とその差の推移, 下段: 衛星ごとのC/N差の推移
+
+    Returns:
+        時系列の線(nmea_graph.DecimatedLines)のlist. 拡大時に間引き直す場合はconnect()する
+    """
+    fig.suptitle("{} - {}  (matched epochs:{}  only {}:{}  only {}:{})".format(
+        labels[0], labels[1], len(cmp), labels[0], cmp.only_a, labels[1], cmp.only_b))
+    if len(cmp) < 3:
+        return []
+
+    fig.subplots_adjust(hspace=0.45)
+    ax = fig.add_subplot(3, 1, 1)
+    delta = cmp.mean_delta()
+    ax.bar(np.arange(len(cmp.prn)), delta, align="center", tick_label=cmp.prn)
+    ax.axhline(0, color="gray", linewidth=0.8)
+    ax.set_xlim(-0.5, max(len(cmp.prn), 1) - 0.5)
+    ax.set_ylabel("CN diff")
+    ax.set_title("mean CN diff per satellite")
+
+    ax = fig.add_subplot(3, 1, 2)
+    series = [DecimatedLines(ax, np.stack([cmp.top_a, cmp.top_b, cmp.top_delta], axis=1),
+                             ["top{} {}".format(cmp.topn, labels[0]), "top{} {}".format(cmp.topn, labels[1]),
+                              "diff"])]
+    ax.set_ylabel("CN")
+    _set_timeticks(ax, cmp.time, tdiff)
+    ax.legend(bbox_to_anchor=(1, 1), loc=2, frameon=True)
+
+    ax = fig.add_subplot(3, 1, 3)
+    series.append(DecimatedLines(ax, cmp.delta, cmp.prn))
+    ax.axhline(0, color="gray", linewidth=0.8)
+    ax.set_ylabel("CN diff")
+    _set_timeticks(ax, cmp.time, tdiff)
+    if cmp.prn:
+        ax.legend(bbox_to_anchor=(1, 1), loc=2, frameon=True, fontsize="x-small", ncol=2)
+    return series
+
+
+def draw(cmp, labels=("A", "B"), tdiff=0):
+    u""" 比較グラフ描画 """
+    sns.set_style("white")
+    fig = plt.figure()
+    for lines in render(fig, cmp, labels, tdiff):
+        lines.connect()
+    plt.show()
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,402 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import datetime
+import numpy as np
+
+
+# 衛星が存在しないエポックの値
+FILL = np.iinfo(np.int16).min
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def epoch_sec(rmc):
+    u""" RMCの日時を1970/1/1からの秒数(タイムゾーン補正なし)に変換する
+
+    Returns:
+        秒数(float). 日時が取れていない場合はnan
+    """
+    d, t = rmc.datestamp, rmc.timestamp
+    if not (d and t):
+        return np.nan
+    return (d.toordinal() - _EPOCH_ORDINAL) * 86400 + \
+        t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1000000
+
+
+def sec_datetime(sec, tdiff=0):
+    u""" epoch_secの秒数をdatetimeに変換する """
+    return _EPOCH + datetime.timedelta(seconds=sec + tdiff)
+
+
+def datetime_sec(dt):
+    u""" datetimeをepoch_secと同じ基準の秒数に変換する """
+    return (dt - _EPOCH).total_seconds()
+
+
+def make_timestr(t, tdiff):
+    if not np.isnan(t):
+        t_mod = sec_datetime(t, tdiff)
+        return "{}/{} {}".format(t_mod.date().month, t_mod.date().day, t_mod.time())
+    return "----"
+
+
+def prn_key(prn):
+    return (0, int(prn), "") if prn.isdigit() else (1, 0, prn)
+
+
+class GPSData(object):
+    u""" エポック×衛星の2次元配列でGSV情報を保持するクラス
+
+    Attributes:
+        time: 各エポックの時刻 (epoch_secの秒数, 時刻なしはnan)
+        hdop: 各エポックのhdop (GGAなしは99)
+        prn : 各列の衛星番号のlist
+        sn  : C/N [epoch, prn] (GSVで空欄は0)
+        el  : 仰角 [epoch, prn] (GSVで空欄は-1)
+        az  : 方位角 [epoch, prn] (GSVで空欄は-1)
+
+        sn, el, azはint16で, 衛星が存在しないエポックはFILL.
+        配列は作成後に変更しない(select結果とviewを共有するため)
+    """
+
+    def __init__(self, time, hdop, prn, sn, el, az, index=None):
+        self.time = time
+        self.hdop = hdop
+        self.prn = prn
+        self.sn = sn
+        self.el = el
+        self.az = az
+        self._index = index
+        self._mean = dict()
+
+    @property
+    def index(self):
+        u""" 時刻検索用の単調増加な秒数配列
+
+        各エポックまでの時刻の最大値(時刻なしは-inf)で, 時刻が前後するデータでも
+        二分探索できるようにする
+        """
+        if self._index is None:
+            self._index = np.fmax.accumulate(np.where(np.isnan(self.time), -np.inf, self.time))
+        return self._index
+
+    def window(self, start=None, end=None):
+        u""" 指定時刻範囲(epoch_secの秒数)のエポックのsliceを二分探索で求める
+
+        Returns:
+            start以上となる最初のエポックから, end以下となる最後のエポックまでのslice
+        """
+        i = np.searchsorted(self.index, start, "left") if start is not None else 0
+        j = np.searchsorted(self.index, end, "right") if end is not None else len(self)
+        return slice(int(i), int(max(i, j)))
+
+    def __len__(self):
+        return len(self.time)
+
+    def select(self, rows=slice(None), cols=None):
+        u""" 指定したエポック(rows), 衛星列(cols)のみのGPSDataを作成する
+
+        rowsがsliceでcolsがNoneの場合, 配列はコピーせずviewとなる
+        """
+        index = self._index[rows] if isinstance(rows, slice) and self._index is not None else None
+        if cols is None:
+            return GPSData(self.time[rows], self.hdop[rows], list(self.prn),
+                           self.sn[rows], self.el[rows], self.az[rows], index)
+        cols = np.asarray(cols, dtype=np.intp)
+        prn = [self.prn[c] for c in cols]
+        return GPSData(self.time[rows], self.hdop[rows], prn,
+                       self.sn[rows][:, cols], self.el[rows][:, cols], self.az[rows][:, cols], index)
+
+    def valid(self):
+        u""" 衛星が存在するエポックをTrueとしたbool配列 [epoch, prn] """
+        return self.sn != FILL
+
+    def mean(self, key):
+        u""" 衛星ごとに存在するエポックのみで平均した値の配列 (初回算出時にキャッシュする) """
+        if key not in self._mean:
+            v = getattr(self, key)
+            valid = self.valid()
+            cnt = valid.sum(axis=0)
+            total = np.where(valid, v, 0).sum(axis=0, dtype=np.float64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self._mean[key] = total / cnt
+        return self._mean[key]
+
+
+class EpochStore(object):
+    u""" パース結果をエポック順に1度だけ走査してGPSDataを作成するクラス
+
+    行(エポック), 列(衛星)とも事前確保した配列に格納し, 不足した場合は倍に拡張する
+
+    Args:
+        capacity: 事前確保するエポック数
+    """
+
+    def __init__(self, capacity=0):
+        rows = max(capacity, 16)
+        cols = 16
+        self._n = 0
+        self._time = np.full(rows, np.nan)
+        self._hdop = np.full(rows, 99, dtype=np.float32)
+        self._hasgsa = np.zeros(rows, dtype=bool)
+        self._sn = np.full((rows, cols), FILL, dtype=np.int16)
+        self._el = np.full((rows, cols), FILL, dtype=np.int16)
+        self._az = np.full((rows, cols), FILL, dtype=np.int16)
+        self._col = dict()
+        self._prn = list()
+        self._used = set()
+
+    def __len__(self):
+        return self._n
+
+    def _grow_rows(self):
+        n = max(len(self._time), 16)    # pickleから復元した場合は空の場合がある
+        self._time = np.concatenate([self._time, np.full(n, np.nan)])
+        self._hdop = np.concatenate([self._hdop, np.full(n, 99, dtype=np.float32)])
+        self._hasgsa = np.concatenate([self._hasgsa, np.zeros(n, dtype=bool)])
+        for k in ["_sn", "_el", "_az"]:
+            v = getattr(self, k)
+            setattr(self, k, np.concatenate([v, np.full((n, v.shape[1]), FILL, dtype=np.int16)]))
+
+    def _grow_cols(self):
+        for k in ["_sn", "_el", "_az"]:
+            v = getattr(self, k)
+            cols = max(v.shape[1], 16)
+            setattr(self, k, np.concatenate([v, np.full((v.shape[0], cols), FILL, dtype=np.int16)], axis=1))
+
+    def _column(self, no):
+        col = self._col.get(no)
+        if col is None:
+            col = len(self._prn)
+            if col == self._sn.shape[1]:
+                self._grow_cols()
+            self._col[no] = col
+            self._prn.append(no)
+        return col
+
+    def append(self, gps):
+        u""" parse結果の1エポック分を追加する """
+        n = self._n
+        if n == len(self._time):
+            self._grow_rows()
+
+        self._time[n] = epoch_sec(gps["RMC"])
+        if "GGA" in gps:
+            try:
+                self._hdop[n] = float(gps["GGA"]["hdop"])
+            except (TypeError, ValueError):
+                pass
+        if "GSA" in gps:
+            self._hasgsa[n] = True
+            self._used.update(gps["GSA"]["sv"])
+        if "GSV" in gps:
+            cols, sn, el, az = [], [], [], []
+            for sv in gps["GSV"]["sv"]:
+                cols.append(self._column(sv["no"]))
+                sn.append(int(sv["sn"]) if sv["sn"] else 0)
+                el.append(int(sv["el"]) if sv["el"] else -1)
+                az.append(int(sv["az"]) if sv["az"] else -1)
+            if cols:
+                self._sn[n, cols] = sn
+                self._el[n, cols] = el
+                self._az[n, cols] = az
+
+        self._n += 1
+
+    def extend(self, gpsinput):
+        for gps in gpsinput:
+            self.append(gps)
+
+    def merge(self, other):
+        u""" 別のEpochStoreの全エポックを末尾に追加する (ファイルごとに作成したEpochStoreの連結用) """
+        n, m = self._n, other._n
+        while n + m > len(self._time):
+            self._grow_rows()
+        self._time[n:n+m] = other._time[:m]
+        self._hdop[n:n+m] = other._hdop[:m]
+        self._hasgsa[n:n+m] = other._hasgsa[:m]
+        cols = [self._column(no) for no in other._prn]
+        if cols:
+            for k in ["_sn", "_el", "_az"]:
+                getattr(self, k)[n:n+m, cols] = getattr(other, k)[:m, :len(cols)]
+        self._used |= other._used
+        self._n += m
+
+    def __getstate__(self):
+        # pickle時(プロセス間の受け渡し, キャッシュ)は未使用の確保領域を除く
+        state = dict(self.__dict__)
+        n, m = self._n, len(self._prn)
+        for k in ["_time", "_hdop", "_hasgsa"]:
+            state[k] = state[k][:n].copy()
+        for k in ["_sn", "_el", "_az"]:
+            state[k] = state[k][:n, :m].copy()
+        return state
+
+    def _data(self, rows):
+        n, m = self._n, len(self._prn)
+        return GPSData(self._time[:n][rows], self._hdop[:n][rows], list(self._prn),
+                       self._sn[:n, :m][rows], self._el[:n, :m][rows], self._az[:n, :m][rows])
+
+    def gsv(self):
+        u""" 全エポック, 全衛星のGPSData (衛星番号順) """
+        cols = sorted(range(len(self._prn)), key=lambda c: prn_key(self._prn[c]))
+        gps = self._data(slice(None)).select(cols=cols)
+        gps.index  # 時刻検索用indexを作成しておく
+        return gps
+
+    def gsa(self):
+        u""" GSAがあるエポック, GSAで使用された衛星のみのGPSData (衛星番号順) """
+        cols = sorted([c for c, no in enumerate(self._prn) if no in self._used],
+                      key=lambda c: prn_key(self._prn[c]))
+        gps = self._data(self._hasgsa[:self._n]).select(cols=cols)
+        gps.index
+        return gps
+
+
+def create_gpsdata(gpsinput):
+    u""" parse結果からGSV, GSA用のGPSDataを作成する
+
+    Returns:
+        (gsv, gsa)
+    """
+    store = EpochStore(len(gpsinput) if hasattr(gpsinput, "__len__") else 0)
+    store.extend(gpsinput)
+    return store.gsv(), store.gsa()
+
+
+class _StreamAcc(object):
+    u""" StreamStats用の衛星ごとの積算値 """
+
+    def __init__(self):
+        self.sv = dict()    # 衛星番号: [全体のエポック数, C/N合計, 仰角合計, 時間幅内のエポック数, 時間幅内のC/N合計]
+        self.hdop = list()  # [個数, 合計, 最小, 最大]
+        self.epochs = 0
+        self.time = [np.nan, np.nan]
+
+    def add(self, t, hdop, svs, inwin):
+        for no, sn, el in svs:
+            v = self.sv.get(no)
+            if v is None:
+                v = self.sv[no] = [0, 0, 0, 0, 0]
+            v[0] += 1
+            v[1] += sn
+            v[2] += el
+            if inwin:
+                v[3] += 1
+                v[4] += sn
+        if not inwin:
+            return
+        self.epochs += 1
+        self.time = [t if self.epochs == 1 else self.time[0], t]
+        if hdop != 99:
+            h = self.hdop
+            self.hdop = [h[0]+1, h[1]+hdop, min(h[2], hdop), max(h[3], hdop)] if h else [1, hdop, hdop, hdop]
+
+
+class StreamStats(object):
+    u""" parse結果を1秒分ずつ受け取り, check_thr+nmea_stats.summarize相当の統計値を算出するクラス
+
+    全エポックを保持せず衛星ごとの積算値のみ保持するため, 長時間のログでも一定メモリで処理できる
+
+    Args:
+        timewidth: (開始日時, 終了日時) 指定なしはNone
+        tdiff: タイムゾーン(sec)
+    """
+
+    def __init__(self, timewidth=(None, None), tdiff=0):
+        self._start = datetime_sec(timewidth[0]) - tdiff if timewidth[0] else None
+        self._end = datetime_sec(timewidth[1]) - tdiff if timewidth[1] else None
+        self._acc = {"gsv": _StreamAcc(), "gsa": _StreamAcc()}
+        self._used = set()
+
+    def append(self, gps):
+        u""" parse結果の1秒分を追加する """
+        t = epoch_sec(gps["RMC"])
+        inwin = not ((self._start is not None and not t >= self._start) or
+                     (self._end is not None and t > self._end))
+        hdop = 99
+        if "GGA" in gps:
+            try:
+                hdop = float(gps["GGA"]["hdop"])
+            except (TypeError, ValueError):
+                pass
+        svs = [(sv["no"], int(sv["sn"]) if sv["sn"] else 0, int(sv["el"]) if sv["el"] else -1)
+               for sv in gps["GSV"]["sv"]] if "GSV" in gps else []
+
+        self._acc["gsv"].add(t, hdop, svs, inwin)
+        if "GSA" in gps:
+            self._used.update(gps["GSA"]["sv"])
+            self._acc["gsa"].add(t, hdop, svs, inwin)
+
+    def extend(self, gpsinput):
+        for gps in gpsinput:
+            self.append(gps)
+
+    def summary(self, thr, show):
+        u""" 統計値を算出する
+
+        Returns:
+            nmea_stats.summarize()の戻り値(中央値, パーセンタイル等のエポックを保持しないと算出できない値を除く)に
+            下記を追加したdict
+                * "gsamode": GSAの衛星を使用したか
+                * "epochs" : 時間幅内のエポック数
+                * "start", "end": 時間幅内の最初, 最後のエポックの時刻 (epoch_secの秒数)
+        """
+        gsamode = True if show["gsamode"] and len(self._used) else False
+        acc = self._acc["gsa" if gsamode else "gsv"]
+
+        cn = dict()
+        for no in sorted(acc.sv, key=prn_key):
+            v = acc.sv[no]
+            if gsamode and no not in self._used:
+                continue
+            if v[1] / v[0] < thr["sn"] or (show["gsamode"] and v[2] / v[0] < thr["el"]):
+                continue
+            if not v[3]:    # 時間幅内に存在するエポックがない
+                continue
+            cn[no] = v[4] / v[3]
+
+        top3 = sorted([v for v in cn.values() if not np.isnan(v)], reverse=True)[:3]
+        h = acc.hdop
+        return {
+            "gsamode": gsamode,
+            "epochs": acc.epochs,
+            "start": acc.time[0],
+            "end": acc.time[1],
+            "sv_num": len(cn),
+            "cn": cn,
+            "top3": np.average(top3) if len(top3) >= 3 else 0,
+            "hdop_mean": h[1] / h[0] if h else np.nan,
+            "hdop_min": h[2] if h else np.nan,
+            "hdop_max": h[3] if h else np.nan,
+        }
+
+
+def check_thr(gps, thr, show, timewidth, tdiff):
+    u""" 閾値と時間幅で絞り込んだGPSDataを作成する
+
+    gpsは変更しない. 時間幅はviewとなり, 閾値で除外する衛星がある場合のみ
+    表示範囲分の配列をコピーする
+
+    Args:
+        gps: GPSData
+        thr: 閾値 {"sn": C/N平均, "el": 仰角平均}
+        show: 表示設定 (gsamodeの場合のみ仰角閾値を適用する)
+        timewidth: (開始日時, 終了日時) 指定なしはNone
+        tdiff: タイムゾーン(sec)
+    """
+    cols = gps.mean("sn") >= thr["sn"]
+    if show["gsamode"]:
+        cols &= gps.mean("el") >= thr["el"]
+
+    rows = gps.window(datetime_sec(timewidth[0]) - tdiff if timewidth[0] else None,
+                      datetime_sec(timewidth[1]) - tdiff if timewidth[1] else None)
+
+    return gps.select(rows, None if cols.all() else np.nonzero(cols)[0])
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
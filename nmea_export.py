@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import re
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+import seaborn as sns
+import nmea_parse  # my module
+import nmea_cache  # my module
+import nmea_graph  # my module
+
+
+FORMATS = ["png", "svg", "pdf"]
+
+
+def _filename(tid, source):
+    u""" 出力ファイル名 (拡張子なし). tripIDと先頭ファイル名から作成する """
+    name = "{}".format(tid)
+    if source and isinstance(source[0], str):
+        name += "_" + os.path.splitext(os.path.basename(nmea_parse.split_member(source[0])[-1] or source[0]))[0]
+    return re.sub(r"[^0-9A-Za-z_.\-]", "_", name)
+
+
+def _load(source, cache):
+    u""" ファイルパスのlistの場合はパースし, parse結果のlistの場合はそのまま返す """
+    if not source or not isinstance(source[0], str):
+        return source
+    nmea = nmea_parse.NMEAParser()
+    cache = nmea_cache.ParseCache() if cache else None
+    return [gps for f, parsed in nmea.parse_files(source, 1, cache=cache) for gps in parsed]
+
+
+def _render(task):
+    u""" プロセスプールのworkerで1trip分のFigureを作成する
+
+    Returns:
+        保存したファイルパス (path=Noneの場合はpickleしたFigure)
+    """
+    tid, source, tz, thr, show, timewidth, path, figsize, dpi, cache = task
+    sns.set_style("white")
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    nmea_graph.NMEAGraph(tid, _load(source, cache), tz).render(fig, thr, show, timewidth)
+    if path is None:
+        return pickle.dumps(fig, pickle.HIGHEST_PROTOCOL)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def export_trips(trips, outdir, fmt="png", thr=None, show=None, timewidth=(None, None), tz=0,
+                 multipage=False, workers=None, figsize=(12, 8), dpi=100, cache=True):
+    u""" tripごとのグラフ(棒, 衛星位置, hdop, C/N推移)を画面に表示せずにファイルに出力する
+
+    tripごとにプロセスプールのworkerでFigureを作成する(workerごとに独立したFigureを使用する).
+    multipage指定時はworkerでFigureを作成し, 1つのPDFにtrip順に保存する
+
+    Args:
+        trips: (tripID, ファイルパスのlist または parse結果のlist) のlist.
+               ファイルパスの場合はworkerでパースする
+        outdir: 出力ディレクトリ (multipage指定時は出力PDFファイルパス)
+        fmt: 出力形式 (FORMATS)
+        thr, show, timewidth, tz: NMEAGraph.drawと同じ描画設定
+        multipage: Trueの場合は1つのPDFファイルに出力する
+        workers: プロセス数 (None: CPU数)
+        figsize, dpi: 出力サイズ
+        cache: ファイルをパースする場合にnmea_cache.ParseCacheを使用するか
+
+    Yields:
+        (tripID, 出力ファイルパス) trip順
+    """
+    thr = thr if thr else {"sn": 1, "el": 0}
+    show = show if show else {"avrg": True, "pos": True, "gsamode": True, "hdop": True, "sn": True}
+    if multipage:
+        fmt = "pdf"
+        if os.path.dirname(outdir):
+            os.makedirs(os.path.dirname(outdir), exist_ok=True)
+    else:
+        os.makedirs(outdir, exist_ok=True)
+
+    tasks = list()
+    for tid, source in trips:
+        path = None if multipage else os.path.join(outdir, "{}.{}".format(_filename(tid, source), fmt))
+        tasks.append((tid, source, tz, thr, show, tuple(timewidth), path, figsize, dpi, cache))
+
+    workers = min(workers if workers else os.cpu_count() or 1, max(len(tasks), 1))
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(_render, task) for task in tasks]
+        try:
+            if multipage:
+                with PdfPages(outdir) as pdf:
+                    for task, future in zip(tasks, futures):
+                        pdf.savefig(pickle.loads(future.result()))
+                        yield task[0], outdir
+            else:
+                for task, future in zip(tasks, futures):
+                    yield task[0], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
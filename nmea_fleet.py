@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import csv
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.pyplot as plt
+import seaborn as sns
+import numpy as np
+import nmea_parse  # my module
+import nmea_cache  # my module
+import nmea_data   # my module
+import nmea_stats  # my module
+
+
+def find_roots(path):
+    u""" 指定パス以下のsd root pathを列挙する
+
+    pathがsd root(SYSTEMを含むディレクトリ, zipファイル)の場合はpathのみ,
+    そうでない場合はsd rootであるサブディレクトリ, zipファイルを返す (ない場合はpathをNORMALディレクトリとみなす)
+    """
+    if not os.path.isdir(path) or "SYSTEM" in os.listdir(path):
+        return [path]
+    roots = list()
+    for name in sorted(os.listdir(path)):
+        child = os.path.join(path, name)
+        if os.path.isdir(child) and "SYSTEM" in os.listdir(child):
+            roots.append(child)
+        elif os.path.isfile(child) and nmea_parse.compression(child) == "zip":
+            roots.append(child)
+    return roots if roots else [path]
+
+
+def device_names(roots):
+    u""" sd rootごとの表示名 (ディレクトリ名, zipファイル名. 重複する場合は番号を付ける) """
+    names = list()
+    for root in roots:
+        name = os.path.splitext(os.path.basename(os.path.normpath(root)))[0] or root
+        names.append(name if name not in names else "{}#{}".format(name, len(names)+1))
+    return names
+
+
+def analyze_card(task):
+    u""" プロセスプールのworkerでSDカード1枚分の統計値を算出する
+
+    パース結果はファイルごとのEpochStoreとして受け取って連結し, 親プロセスには統計値のみ返す
+
+    Returns:
+        統計値dict (nmea_stats.summarize()の戻り値に"device", "root", "trips", "files", "epochs", "gsamode",
+        "start", "end", "counters"を追加したもの). 失敗時は"device", "root", "error"のみ
+    """
+    device, root, thr, show, timewidth, tdiff, usecache, percentiles = task
+    try:
+        nmea = nmea_parse.NMEAParser()
+        cache = nmea_cache.ParseCache() if usecache else None
+        filetotal, tids = nmea.concat_trip(root)
+        files = [f for tid, fs in sorted(tids.items(), key=lambda x: x[1][0]) for f in fs]
+
+        store = nmea_data.EpochStore()
+        for f, parsed in nmea.parse_files(files, 1, cache=cache, columnar=True):
+            store.merge(parsed)
+        gsv, gsa = store.gsv(), store.gsa()
+        gsamode = True if show["gsamode"] and len(gsa.prn) else False
+        gps = nmea_data.check_thr(gsa if gsamode else gsv, thr, show, timewidth, tdiff)
+    except Exception as e:
+        return {"device": device, "root": root, "error": str(e)}
+
+    result = nmea_stats.summarize(gps, thr["sn"], percentiles)
+    result.update({
+        "device": device,
+        "root": root,
+        "trips": len(tids),
+        "files": len(files),
+        "epochs": len(gps),
+        "gsamode": gsamode,
+        "start": gps.time[0] if len(gps) else np.nan,
+        "end": gps.time[-1] if len(gps) else np.nan,
+        "counters": dict(nmea.counters),
+    })
+    return result
+
+
+def analyze_fleet(roots, thr, show, timewidth=(None, None), tdiff=0, workers=None, cache=True, percentiles=()):
+    u""" 複数のSDカードの統計値をSDカードごとに1プロセスで並列に算出する
+
+    Args:
+        roots: sd root pathのlist
+        thr, show, timewidth, tdiff: nmea_data.check_thrと同じ絞り込み設定
+        workers: プロセス数 (None: CPU数)
+        cache: nmea_cache.ParseCacheを使用するか
+        percentiles: nmea_stats.compute()と同じ
+
+    Yields:
+        analyze_card()の統計値dict (rootsの順)
+    """
+    tasks = [(device, root, thr, show, tuple(timewidth), tdiff, cache, tuple(percentiles))
+             for device, root in zip(device_names(roots), roots)]
+    workers = min(workers if workers else os.cpu_count() or 1, max(len(tasks), 1))
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(analyze_card, task) for task in tasks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _round(v):
+    return "" if v is None or np.isnan(v) else round(float(v), 2)
+
+
+def _prnlist(results):
+    prnlist = list()
+    for r in results:
+        prnlist += [k for k in r.get("cn", {}) if k not in prnlist]
+    return sorted(prnlist, key=nmea_data.prn_key)
+
+
+def write_csv(results, out, tdiff=0):
+    u""" SDカードごとに1行, 衛星ごとのC/N平均値とC/N閾値以上の割合を列とした比較表を出力する """
+    prnlist = _prnlist(results)
+    writer = csv.writer(out, lineterminator="\n")
+    label = ["device", "root", "trips", "files", "epochs", "gsamode", "start", "end",
+             "sv_num", "top3", "top3_epoch", "hdop_mean", "hdop_min", "hdop_max"]
+    writer.writerow(label + ["cn_" + k for k in prnlist] + ["above_" + k for k in prnlist] + ["error"])
+    for r in results:
+        if "error" in r:
+            writer.writerow([r["device"], r["root"]] + [""] * (len(label) - 2 + len(prnlist) * 2) + [r["error"]])
+            continue
+        row = list()
+        for k in label:
+            if k in ["start", "end"]:
+                row.append("" if np.isnan(r[k]) else str(nmea_data.sec_datetime(r[k], tdiff)))
+            elif k in ["top3", "top3_epoch", "hdop_mean", "hdop_min", "hdop_max"]:
+                row.append(_round(r[k]))
+            else:
+                row.append(r[k])
+        row += [_round(r["cn"][k]) if k in r["cn"] else "" for k in prnlist]
+        row += [_round(r["cn_above"][k]) if k in r["cn_above"] else "" for k in prnlist]
+        writer.writerow(row + [""])
+
+
+def render(fig, results, thr):
+    u""" figにSDカードごとの比較グラフを作成する
+
+    上段: SDカードごとのC/N上位3衛星平均, 下段: SDカード×衛星のC/N平均値
+    """
+    results = [r for r in results if "error" not in r]
+    fig.suptitle("fleet ({} cards)".format(len(results)))
+    if not results:
+        return
+    devices = [r["device"] for r in results]
+    prnlist = _prnlist(results)
+    x = np.arange(len(devices))
+
+    ax = fig.add_subplot(2, 1, 1)
+    ax.bar(x - 0.2, [r["top3"] for r in results], 0.4, align="center", label="top3 avrg.")
+    ax.bar(x + 0.2, [r["top3_epoch"] for r in results], 0.4, align="center", label="top3 avrg. per epoch")
+    ax.set_xticks(x)
+    ax.set_xticklabels(devices, rotation=15, fontsize="small")
+    ax.set_xlim(-0.6, len(devices) - 0.4)
+    ax.set_ylim(thr["sn"], 50)
+    ax.set_ylabel("CN")
+    ax.legend(bbox_to_anchor=(1, 1), loc=2, frameon=True)
+
+    ax = fig.add_subplot(2, 1, 2)
+    cn = np.array([[r["cn"].get(k, np.nan) for k in prnlist] for r in results], dtype=np.float64)
+    image = ax.imshow(np.ma.masked_invalid(cn), aspect="auto", interpolation="nearest",
+                      vmin=thr["sn"], vmax=50, cmap="viridis")
+    ax.set_yticks(x)
+    ax.set_yticklabels(devices, fontsize="small")
+    ax.set_xticks(np.arange(len(prnlist)))
+    ax.set_xticklabels(prnlist, rotation=90, fontsize="x-small")
+    ax.set_xlabel("PRN")
+    fig.colorbar(image, ax=ax).set_label("CN")
+
+
+def draw(results, thr):
+    u""" 比較グラフ描画 """
+    sns.set_style("white")
+    fig = plt.figure()
+    render(fig, results, thr)
+    plt.show()
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
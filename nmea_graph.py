@@ -4,147 +4,168 @@
 import sys
 import time
 import logging
-import copy
-import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-import pdb
-
-
-def add_timediff(dt, tdiff):
-    return datetime.datetime.fromtimestamp(int(time.mktime(dt.timetuple())) + tdiff)
-
-
-def check_thr(gps, thr, show, timewidth, tdiff):
-    poplist = list()
-    for k, v in gps["sv"].items():
-        if (np.average(v["sn"]) < thr["sn"]) or \
-           (show["gsamode"] and np.average(v["el"]) < thr["el"]):
-            poplist.append(k)
-    for k in poplist:
-        gps["sv"].pop(k)
-
-    print(timewidth)
-    if timewidth[0]:    # start time
-        start = add_timediff(timewidth[0], -1*tdiff)
-        for i, t in enumerate(gps["time"]):
-            try:
-                dt = datetime.datetime.combine(t[0], t[1])
-                if start <= dt:
-                    gps["time"] = gps["time"][i:]
-                    for v in gps["sv"].values():
-                        for k in ["sn", "el", "az"]:
-                            v[k] = v[k][i:]
-                    break
-            except TypeError:
-                pass
-
-    if timewidth[1]:    # end time
-        end = add_timediff(timewidth[1], -1*tdiff)
-        for i, t in enumerate(reversed(gps["time"])):
-            dt = datetime.datetime.combine(t[0], t[1])
-            if end >= dt:
-                end = len(gps["time"])-i
-                gps["time"] = gps["time"][:end]
-                for v in gps["sv"].values():
-                    for k in ["sn", "el", "az"]:
-                        v[k] = v[k][:end]
-                break
-
-    return gps
-
-
-def make_timestr(t, tdiff):
-    if t:
-        t_mod = add_timediff(datetime.datetime.combine(t[0], t[1]), tdiff)
-        return "{}/{} {}".format(t_mod.date().month, t_mod.date().day, t_mod.time())
-    return "----"
-
-
-def add_gsadata(gsasv, sv, gsa):
-    # check SV No.
-    for used in gsasv:
-        if used not in gsa["sv"]:
-            gsa["sv"][used] = copy.deepcopy(gsa["sv"]["dummy"])
-
-    # add gsv data
-    if sv["no"] in gsa["sv"]:
-        gsa["sv"][sv["no"]]["sn"].append(int(sv["sn"] if sv["sn"] else 0))
-        gsa["sv"][sv["no"]]["el"].append(int(sv["el"] if sv["el"] else -1))
-        gsa["sv"][sv["no"]]["az"].append(int(sv["az"] if sv["az"] else -1))
-
-
-def add_gsvdata(gps, gsv, gsa):
-    if "GSV" in gps:
-        for sv in gps["GSV"]["sv"]:
-            # check SV No.
-            if sv["no"] not in gsv["sv"]:
-                gsv["sv"][sv["no"]] = copy.deepcopy(gsv["sv"]["dummy"])
-
-            gsv["sv"][sv["no"]]["sn"].append(int(sv["sn"] if sv["sn"] else 0))
-            gsv["sv"][sv["no"]]["el"].append(int(sv["el"] if sv["el"] else -1))
-            gsv["sv"][sv["no"]]["az"].append(int(sv["az"] if sv["az"] else -1))
-
-            if "GSA" in gps:
-                add_gsadata(gps["GSA"]["sv"], sv, gsa)
-
-    gsv["sv"]["dummy"]["sn"].append(0)
-    gsv["sv"]["dummy"]["el"].append(0)
-    if "GSA" in gps:
-        gsa["sv"]["dummy"]["sn"].append(0)
-        gsa["sv"]["dummy"]["el"].append(0)
-
-
-def create_gpsdata(gpsinput):
-    base = {"sv": {"dummy": {"sn": [], "el": [], "az": []}}, "time": [], "hdop": []}
-    gsa = copy.deepcopy(base)
-    gsv = copy.deepcopy(base)
-
-    for gps in gpsinput:
-        rmc = gps["RMC"]
-        now = (rmc.datestamp, rmc.timestamp) if rmc.datestamp and rmc.timestamp else None
-        gsv["time"].append(now)
-        gsv["hdop"].append(float(gps["GGA"]["hdop"]) if "GGA" in gps else 99)
-        if "GSA" in gps:
-            gsa["time"].append(now)
-            gsa["hdop"].append(float(gps["GGA"]["hdop"]) if "GGA" in gps else 99)
-
-        add_gsvdata(gps, gsv, gsa)
-
-    gsa["sv"].pop("dummy")
-    gsv["sv"].pop("dummy")
-
-    return gsv, gsa
+from nmea_data import make_timestr, check_thr, EpochStore
+from nmea_profile import Profiler
+from nmea_cache import LRUCache
+import nmea_stats  # my module
+
+
+def minmax_decimate(y, bins, start=0, stop=None):
+    u""" 時系列を区間ごとの最小値, 最大値に間引く
+
+    [start, stop)をbins個程度の区間に分け, 区間ごとに最小値と最大値のエポックを出現順に残す.
+    全てnanの区間はnanを残すため, 衛星が存在しない期間の線の途切れは保たれる.
+    点数が2*bins以下の場合は間引かない
+
+    Args:
+        y: 時系列 (エポック数 x 系列数 の2次元配列, または1次元配列)
+        bins: 区間数 (描画先の横方向のピクセル数程度)
+        start, stop: 対象とするエポック番号の範囲 (stop=None: 末尾まで)
+
+    Returns:
+        (x, y): エポック番号と値. 引数のyと同じ次元数で, 2次元の場合は系列ごとにエポック番号が異なる
+    """
+    stop = len(y) if stop is None else min(stop, len(y))
+    start = min(max(start, 0), stop)
+    part = np.asarray(y[start:stop], dtype=np.float64)
+    flat = part.ndim == 1
+    if flat:
+        part = part[:, np.newaxis]
+
+    num = len(part)
+    if num <= 2 * max(bins, 1):
+        x = np.repeat(np.arange(num)[:, np.newaxis], part.shape[1], axis=1)
+        values = part
+    else:
+        width = -(-num // bins)
+        blocknum = -(-num // width)
+        padded = np.concatenate([part, np.full((blocknum*width - num, part.shape[1]), np.nan)])
+        blocks = padded.reshape(blocknum, width, part.shape[1])
+        nan = np.isnan(blocks)
+        # 全てnanの区間は区間先頭(nan)を選ぶ
+        low = np.where(nan, np.inf, blocks).argmin(axis=1)
+        high = np.where(nan, -np.inf, blocks).argmax(axis=1)
+        x = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1).reshape(blocknum*2, part.shape[1])
+        x += np.repeat(np.arange(blocknum) * width, 2)[:, np.newaxis]
+        values = part[x, np.arange(part.shape[1])]
+
+    x = x + start
+    return (x[:, 0], values[:, 0]) if flat else (x, values)
+
+
+class DecimatedLines(object):
+    u""" 間引いて描画した時系列の線
+
+    表示範囲(xlim)の変更時に, 範囲内のデータをaxesの幅に合わせて間引き直す
+    (拡大するほど元の解像度に近づく)
+
+    Args:
+        ax: 描画先のAxes
+        y: 時系列 (エポック数 x 系列数 の2次元配列)
+        labels: 系列ごとの凡例
+    """
+
+    def __init__(self, ax, y, labels):
+        self._ax = ax
+        self._y = y
+        x, values = minmax_decimate(y, self._bins())
+        self._lines = [ax.plot(x[:, i], values[:, i], label=k)[0] for i, k in enumerate(labels)]
+        ax.set_xlim(0, max(len(y)-1, 1))
+
+    def _bins(self):
+        return max(int(self._ax.bbox.width), 100)
+
+    def update(self):
+        u""" 表示範囲内のデータを間引き直す """
+        low, high = self._ax.get_xlim()
+        x, values = minmax_decimate(self._y, self._bins(), int(np.floor(low)), int(np.ceil(high)) + 1)
+        for i, line in enumerate(self._lines):
+            line.set_data(x[:, i], values[:, i])
+
+    def connect(self):
+        u""" 表示範囲の変更(拡大, 移動)時に間引き直す """
+        self._ax.callbacks.connect("xlim_changed", lambda ax: self.update())
 
 
 class NMEAGraph(object):
     u""" NMEAパース結果描画クラス
 
-    パースされたデータを元にグラフを描画する
+    パースされたデータを元にグラフを描画する.
+    描画用データは初回の描画時に作成し, tripID, 閾値, 時間幅ごとにcacheに保持する.
+    複数のNMEAGraphで同じcacheを共有することで, 保持するデータ量を抑える
+
+    Args:
+        tid: tripID (cacheのkeyに使用するため, cacheを共有するNMEAGraph間で重複しないこと)
+        gpsinput: parse結果のlist (参照のみ保持する. 追記は呼び出し元がこのlistに行う)
+        tz: タイムゾーン(sec)
+        cache: 描画用データを保持するLRUCache (None: NMEAGraphごとに作成する)
     """
 
-    def __init__(self, tid, gpsinput, tz):
+    def __init__(self, tid, gpsinput, tz, cache=None):
         self._log = logging.getLogger(__name__)
         self._tid = tid
         self._tz = tz
-        self._gsv, self._gsa = create_gpsdata(gpsinput)
+        self._gpsinput = gpsinput
+        self._cache = cache if cache is not None else LRUCache(4)
+
+    def append(self, gpsinput):
+        u""" 追記されたエポックを描画用データに追加する (フォローモード用). 次回の描画から反映される
+
+        コンストラクタで渡したlistには呼び出し元が追加済みであること (listは共有し, ここでは変更しない)
+
+        Args:
+            gpsinput: 追記されたエポックのparse結果のlist
+        """
+        store = self._cache.get(("store", self._tid))
+        if store is not None:
+            store.extend(gpsinput)
+
+    def _data(self):
+        u""" 全エポックのGSV, GSAのGPSDataを作成する (作成済みのEpochStoreがあれば追記分のみ追加する) """
+        store = self._cache.get(("store", self._tid))
+        if store is None:
+            store = EpochStore(len(self._gpsinput))
+            store.extend(self._gpsinput)
+            self._cache.put(("store", self._tid), store)
+        return store.gsv(), store.gsa()
+
+    def prepare(self, thr, show, timewidth, prof=None):
+        u""" 閾値と時間幅で絞り込んだ描画用データを取得する
+
+        Returns:
+            (GPSData, gsamode)
+        """
+        key = ("gps", self._tid, len(self._gpsinput), thr["sn"], thr["el"], show["gsamode"], tuple(timewidth))
+        prepared = self._cache.get(key)
+        if prepared is None:
+            prof = prof if prof else Profiler()
+            with prof.stage("create_gpsdata"):
+                gsv, gsa = self._data()
+            gsamode = True if show["gsamode"] and len(gsa.prn) else False
+            with prof.stage("check_thr"):
+                gps = check_thr(gsa if gsamode else gsv, thr, show, timewidth, self._tz)
+            prepared = (gps, gsamode)
+            self._cache.put(key, prepared)
+        return prepared
 
     @staticmethod
-    def _create_bargraph(gps, thr, ax):
+    def _create_bargraph(gps, stats, thr, ax):
         ax.set_ylim(thr["sn"], 50)
-        x = list()
-        y = list()
         if len(gps) < 1:
             return
-        for k, v in sorted(gps["sv"].items(), key=lambda x: int(x[0])):
-            x.append(k)
-            y.append(np.average(v["sn"]))
-        rects = ax.bar(left=[x for x in range(len(x))], height=y, tick_label=x)
+        # 時間幅内に存在するエポックがない衛星(平均値nan)は除く
+        seen = stats.count > 0
+        x = [no for no, ok in zip(stats.prn, seen) if ok]
+        y = stats.mean[seen]
+        rects = ax.bar([x for x in range(len(x))], y, tick_label=x)
 
         svnum = len(y)
-        avrg = np.average(sorted(y, reverse=True)[:3]) if svnum >= 3 else 0
-        print(["{:.2f}".format(top3) for top3 in sorted(y, reverse=True)[:3]])
+        top3 = stats.top_values()
+        avrg = stats.top_mean()
+        logging.getLogger(__name__).debug("top3: {}".format(["{:.2f}".format(v) for v in top3]))
         ax.set_title("num:{}   top3 avrg.{:.1f}".format(svnum, avrg))
         for rect in rects:
             h = rect.get_height()
@@ -152,24 +173,13 @@ class NMEAGraph(object):
                     ha='center', va='bottom')
 
     @staticmethod
-    def _create_polargraph(gps, gsamode, ax):
-        sv = list()
-        theta = list()
-        r = list()
-
-        for k, v_tmp in gps["sv"].items():
-            v = {"az":[], "el":[]}
-            for i in range(len(v_tmp["az"])):
-                if v_tmp["az"][i] > 0:
-                    v["az"].append(v_tmp["az"][i])
-                if v_tmp["el"][i] > 0:
-                    v["el"].append(v_tmp["el"][i])
-
-            if len(v["az"]) > 0 and np.min(v["az"]) > 0 and \
-               len(v["el"]) > 0 and np.min(v["el"]) > 0:
-                sv.append(k)
-                theta.append(np.radians(np.average(v["az"])))
-                r.append(90 - np.average(v["el"]))
+    def _create_polargraph(stats, gsamode, ax):
+        # 方位角, 仰角の平均は0以下(未取得, FILL)を除いて算出済み
+        avail = ~np.isnan(stats.az) & ~np.isnan(stats.el)
+
+        sv = [no for no, ok in zip(stats.prn, avail) if ok]
+        theta = np.radians(stats.az[avail])
+        r = 90 - stats.el[avail]
 
         ax.set_rlim(0, 90)
         ax.set_yticklabels([])
@@ -187,32 +197,35 @@ class NMEAGraph(object):
         ax.set_ylabel("CN")
         ax.set_ylim(thr["sn"], 50)
 
-        if len(gps) < 1 or len(gps["time"]) < 3:
-            return
+        if len(gps) < 3:
+            return None
 
-        for k, v in sorted(gps["sv"].items(), key=lambda x: int(x[0])):
-            ax.plot(v["sn"], label=k)
+        # 衛星が存在しないエポックは線を途切れさせる
+        sn = np.where(gps.valid(), gps.sn, np.nan)
+        lines = DecimatedLines(ax, sn, gps.prn)
 
-        timespan = self._get_linegraph_timesplit(gps["time"])
+        timespan = self._get_linegraph_timesplit(gps.time)
         ax.set_xticks(timespan)
-        ax.set_xticklabels(map(lambda i: make_timestr(gps["time"][i], tdiff), timespan),
+        ax.set_xticklabels(map(lambda i: make_timestr(gps.time[i], tdiff), timespan),
                            rotation=15, fontsize="small")
         ax.legend(bbox_to_anchor=(1, 1), loc=2, frameon=True)
+        return lines
 
     def _create_hdop(self, gps, thr, tdiff, ax):
         ax.set_title("dop")
         ax.set_ylabel("hdop")
         ax.set_ylim(0, 15)
 
-        if len(gps) < 1 or len(gps["time"]) < 3:
-            return
+        if len(gps) < 3:
+            return None
 
-        ax.plot(gps["hdop"], label="hdop")
-        timespan = self._get_linegraph_timesplit(gps["time"])
+        lines = DecimatedLines(ax, gps.hdop[:, np.newaxis], ["hdop"])
+        timespan = self._get_linegraph_timesplit(gps.time)
         ax.set_xticks(timespan)
-        ax.set_xticklabels(map(lambda i: make_timestr(gps["time"][i], tdiff), timespan),
+        ax.set_xticklabels(map(lambda i: make_timestr(gps.time[i], tdiff), timespan),
                            rotation=15, fontsize="small")
         # ax.legend(bbox_to_anchor=(1, 1), loc=2, frameon=True)
+        return lines
 
     @staticmethod
     def _get_linegraph_timesplit(time):
@@ -226,32 +239,52 @@ class NMEAGraph(object):
 
         return l + [timelen-1]
 
-    def draw(self, thr, show, timewidth):
-        u""" グラフ描画 """
+    def render(self, fig, thr, show, timewidth, prof=None):
+        u""" figにグラフを作成する
 
-        # sns.set(palette='colorblind')
-        sns.set_style("white")
-        fig = plt.figure()
-        fig.suptitle("tid [{}]".format(self._tid))
-        gsamode = True if show["gsamode"] and len(self._gsa["sv"]) else False
-        gps = copy.deepcopy(self._gsa if gsamode else self._gsv)
+        pyplotを使用しないため, 非対話backendのFigureへの描画(ファイル出力)にも使用できる.
+        時系列のグラフはaxesの幅に合わせて間引いて描画する
 
-        gps = check_thr(gps, thr, show, timewidth, self._tz)
+        Returns:
+            時系列の線(DecimatedLines)のlist. 拡大時に間引き直す場合はconnect()する
+        """
+        prof = prof if prof else Profiler()
+        fig.suptitle("tid [{}]".format(self._tid))
+        gps, gsamode = self.prepare(thr, show, timewidth, prof)
+        with prof.stage("stats"):
+            stats = nmea_stats.compute(gps, thr["sn"])
+        start = time.perf_counter()
+        series = list()
 
         # First row setting
         rownum = 2 if show["sn"] or show["hdop"] else 1
         clmnum = 2 if show["pos"] else 1
         if show["pos"]:
-            self._create_polargraph(gps, gsamode, fig.add_subplot(rownum, 2, 2, polar=True))
-        self._create_bargraph(gps, thr, fig.add_subplot(rownum, clmnum, 1))
+            self._create_polargraph(stats, gsamode, fig.add_subplot(rownum, 2, 2, polar=True))
+        self._create_bargraph(gps, stats, thr, fig.add_subplot(rownum, clmnum, 1))
 
         # second row setting
         if rownum == 2:
             clmnum = 2 if show["sn"] and show["hdop"] else 1
             if show["hdop"]:
-                self._create_hdop(gps, thr, self._tz, fig.add_subplot(rownum, clmnum, 3 if clmnum == 2 else 2))
+                series.append(self._create_hdop(gps, thr, self._tz,
+                                                fig.add_subplot(rownum, clmnum, 3 if clmnum == 2 else 2)))
             if show["sn"]:
-                self._create_linegraph(gps, thr, self._tz, fig.add_subplot(rownum, clmnum,  4 if clmnum == 2 else 2))
+                series.append(self._create_linegraph(gps, thr, self._tz,
+                                                     fig.add_subplot(rownum, clmnum,  4 if clmnum == 2 else 2)))
+        prof.add_time("draw", time.perf_counter() - start)
+        return [lines for lines in series if lines is not None]
+
+    def draw(self, thr, show, timewidth):
+        u""" グラフ描画 """
+
+        # sns.set(palette='colorblind')
+        sns.set_style("white")
+        fig = plt.figure()
+        prof = Profiler()
+        for lines in self.render(fig, thr, show, timewidth, prof):
+            lines.connect()
+        prof.report()
 
         plt.show()
 
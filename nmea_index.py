@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import sqlite3
+import logging
+import numpy as np
+import nmea_parse  # my module
+import nmea_data   # my module
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    tid TEXT,
+    first_time REAL,
+    last_time REAL,
+    epochs INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_root ON files (root);
+"""
+
+# 先頭, 末尾から時刻を探すbyte数
+_PEEK = 16 * 1024
+
+
+def _rmc_sec(data, last=False):
+    u""" byte列中の最初(last=True:最後)のRMCの時刻(epoch_secの秒数)を返す. ない場合はNone """
+    for rmc in nmea_parse.iter_rmc(data, reverse=last):
+        sec = nmea_data.epoch_sec(rmc)
+        if not np.isnan(sec):
+            return sec
+    return None
+
+
+class TripIndex(object):
+    u""" SDカードデータのファイル情報をSQLiteに保存するクラス
+
+    ファイルごとにサイズ, mtime, trip id, 最初と最後のエポック時刻, エポック数を保持し,
+    サイズ, mtimeが変わらないファイルは開かずにtripにまとめる.
+    sqlite3の接続はスレッド間で共有できないため, 使用するスレッドで作成すること
+
+    Args:
+        dbpath: DBファイルパス (None: ~/.gsvchecker/index.sqlite3)
+    """
+
+    def __init__(self, dbpath=None):
+        self._log = logging.getLogger(__name__)
+        if not dbpath:
+            dbpath = os.path.join(os.path.expanduser("~"), ".gsvchecker", "index.sqlite3")
+            os.makedirs(os.path.dirname(dbpath), exist_ok=True)
+        self._db = sqlite3.connect(dbpath)
+        self._db.executescript(_SCHEMA)
+        self._unparsed = set()  # scan()したファイルのうちエポック数が未登録のもの
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _stat(file):
+        st = os.stat(nmea_parse.split_member(file)[0])
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _peek(file):
+        u""" ファイルのtrip idと, 先頭付近, 末尾付近のRMCの時刻を読み込む
+
+        末尾は非圧縮ファイルのみ読み込む (圧縮ファイルはparse時に更新する)
+        """
+        kind = nmea_parse.compression(file)
+        with nmea_parse.open_nmea(file, kind) as f:
+            head = f.read(_PEEK)
+            if kind is None:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - _PEEK))
+                tail = f.read()
+            else:
+                tail = b""
+
+        line = head.split(b"\n", 1)[0].decode("latin-1").split(",")
+        tid = line[1].rstrip() if len(line) >= 2 and "GTRIP" in line[0] else None
+        return tid, _rmc_sec(head), _rmc_sec(tail, last=True)
+
+    def scan(self, files, root):
+        u""" ファイル情報を差分更新する
+
+        Args:
+            files: NMEAParser.list_files()のファイルパスのlist
+            root: NMEAParser.list_files()のNORMALディレクトリ (zipファイル) パス
+
+        Returns:
+            filesの順番どおりの(path, tid, first_time, last_time, epochs)のlist.
+            tid, 時刻, エポック数は不明な場合None
+        """
+        known = {r[0]: r[1:] for r in self._db.execute(
+            "SELECT path, size, mtime, tid, first_time, last_time, epochs FROM files WHERE root = ?", (root,))}
+
+        rows = list()
+        update = list()
+        for file in files:
+            size, mtime = self._stat(file)
+            k = known.pop(file, None)
+            if k and k[0] == size and k[1] == mtime:
+                rows.append((file,) + tuple(k[2:]))
+                if k[-1] is None:
+                    self._unparsed.add(file)
+                continue
+
+            self._log.debug("open: {}".format(file))
+            tid, first, last = self._peek(file)
+            rows.append((file, tid, first, last, None))
+            update.append((file, root, size, mtime, tid, first, last, None))
+            self._unparsed.add(file)
+
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", update)
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in known])
+        return rows
+
+    def update_parsed(self, parsed):
+        u""" parse結果からエポック数と最初, 最後のエポック時刻を更新する
+
+        scan()でエポック数が登録済みだったファイルは更新しない. 全ファイル分を1トランザクションで更新する
+
+        Args:
+            parsed: (ファイルパス, parse結果)のiterable
+        """
+        update = list()
+        for file, gpsinput in parsed:
+            if file not in self._unparsed:
+                continue
+            self._unparsed.discard(file)
+            times = [t for t in (nmea_data.epoch_sec(gps["RMC"]) for gps in gpsinput) if not np.isnan(t)]
+            update.append((times[0] if times else None, times[-1] if times else None, len(gpsinput), file))
+        with self._db:
+            self._db.executemany("UPDATE files SET first_time = ?, last_time = ?, epochs = ? WHERE path = ?",
+                                 update)
+
+    def trips(self, root, start=None, end=None):
+        u""" 登録済みのtripを一覧する
+
+        Args:
+            root: NMEAParser.list_files()のNORMALディレクトリ (zipファイル) パス
+            start, end: epoch_secの秒数. 指定時は時刻範囲が重なるファイルのみ対象とする
+                        (時刻が不明なファイルは常に対象)
+
+        Returns:
+            trip idごとの(ファイルのlist, 最初の時刻, 最後の時刻, エポック数)のdict
+        """
+        trips = dict()
+        dummy = 0
+        for path, tid, first, last, epochs in self._db.execute(
+                "SELECT path, tid, first_time, last_time, epochs FROM files WHERE root = ? ORDER BY path", (root,)):
+            if not tid:
+                tid = "dummy{}".format(dummy)
+                dummy += 1
+            if not nmea_parse.overlap(first, last, start, end):
+                continue
+            t = trips.setdefault(tid, [list(), None, None, 0])
+            t[0].append(path)
+            t[1] = first if t[1] is None or (first is not None and first < t[1]) else t[1]
+            t[2] = last if t[2] is None or (last is not None and last > t[2]) else t[2]
+            t[3] = t[3] + epochs if t[3] is not None and epochs is not None else None
+        return trips
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,285 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import asyncio
+import collections
+import logging
+import numpy as np
+import nmea_parse  # my module
+import nmea_data   # my module
+
+
+class _Receiver(object):
+    u""" 受信機1台分の受信途中の行とエポックの組み立て状態 """
+
+    def __init__(self, parser, fname):
+        self.fname = fname
+        self.builder = nmea_parse.EpochBuilder(parser)
+        self.buf = b""
+
+    def feed(self, data, complete=False):
+        u""" 受信データを追加し, 完成したエポックのlistを返す
+
+        Args:
+            complete: Trueの場合, dataは行単位で区切られている (UDPのdatagram)
+        """
+        data = self.buf + data
+        end = len(data) if complete else data.rfind(b"\n") + 1
+        self.buf = data[end:]
+        return self.builder.feed_bytes(data, end)
+
+
+def _receiver_id(addr, proto):
+    u""" 送信元のアドレス, ポート番号から受信機のIDを作成する """
+    return "{}:{}/{}".format(addr[0], addr[1], proto)
+
+
+class _TCPProtocol(asyncio.Protocol):
+
+    def __init__(self, ingest, port):
+        self._ingest = ingest
+        self._port = port
+        self._rid = None
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._rid = _receiver_id(transport.get_extra_info("peername"), "tcp")
+        self._ingest._transports.add(transport)
+        self._ingest._log.info("connected: {}".format(self._rid))
+
+    def data_received(self, data):
+        self._ingest._received(self._rid, "tcp-{}".format(self._port), data)
+
+    def connection_lost(self, exc):
+        self._ingest._log.info("disconnected: {}".format(self._rid))
+        self._ingest._transports.discard(self._transport)
+        self._ingest._closed(self._rid)
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, ingest, port):
+        self._ingest = ingest
+        self._port = port
+
+    def datagram_received(self, data, addr):
+        rid = _receiver_id(addr, "udp")
+        self._ingest._received(rid, "udp-{}".format(self._port), data, complete=True)
+
+
+class NMEAIngest(object):
+    u""" TCP/UDPで受信したNMEAを受信機ごとにエポックへまとめるクラス
+
+    asyncioのイベントループ上で複数の受信機からの接続を同時に受け付ける (start()).
+    受信機側が待ち受けている場合はconnect()で接続する.
+    受信機は送信元ホストとポート番号で区別し (TCPは接続ごとに別の受信機となる),
+    受信機ごとにparse()と同じRMC区切りでエポックを組み立てる.
+    TCPは改行までを1行とし, UDPは1 datagramを改行区切りの行の集まりとして扱う.
+    TCPの切断時は末尾の改行されていない行を破棄し, それまでの完全な行から組み立てたエポックを確定する
+
+    Args:
+        parser: センテンスのパースに使用するNMEAParser
+    """
+
+    def __init__(self, parser=None):
+        self._log = logging.getLogger(__name__)
+        self._parser = parser if parser else nmea_parse.NMEAParser()
+        self._receivers = dict()
+        self._new = collections.OrderedDict()
+        self._servers = list()
+        self._transports = set()    # 接続中のTCP(待ち受けで受け付けた接続, connect()の接続)
+
+    async def start(self, host="0.0.0.0", tcp=(), udp=()):
+        u""" 受信を開始する
+
+        Args:
+            host: 待ち受けアドレス
+            tcp, udp: 待ち受けポート番号のlist
+        """
+        loop = asyncio.get_running_loop()
+        for port in tcp:
+            server = await loop.create_server(lambda port=port: _TCPProtocol(self, port), host, port)
+            self._servers.append(server)
+        for port in udp:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda port=port: _UDPProtocol(self, port), local_addr=(host, port))
+            self._servers.append(transport)
+
+    async def connect(self, host, port):
+        u""" TCPで待ち受けている送信元(受信機, replay.py等)に接続して受信を開始する
+
+        Args:
+            host, port: 接続先のアドレス, ポート番号
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_connection(lambda: _TCPProtocol(self, port), host, port)
+
+    async def close(self):
+        u""" 受信を終了する
+
+        待ち受けを止めてから接続中のTCPを切断する (接続が残っているとwait_closed()が終わらないため)
+        """
+        for server in self._servers:
+            server.close()
+        for transport in list(self._transports):
+            transport.close()
+        for server in self._servers:
+            if isinstance(server, asyncio.AbstractServer):
+                await server.wait_closed()
+        await asyncio.sleep(0)  # 切断したTCPのconnection_lost()を処理する
+        self._servers = list()
+
+    def _received(self, rid, fname, data, complete=False):
+        rx = self._receivers.get(rid)
+        if rx is None:
+            rx = self._receivers[rid] = _Receiver(self._parser, fname)
+        for epoch in rx.feed(data, complete):
+            self._add(rid, rx.fname, epoch)
+
+    def _closed(self, rid):
+        rx = self._receivers.pop(rid, None)
+        if rx is not None:
+            self._add(rid, rx.fname, rx.builder.flush())
+
+    def _add(self, rid, fname, epoch):
+        if epoch is None:
+            return
+        trip = self._new.setdefault(rid, {"fname": [fname], "gps": []})
+        trip["gps"].append(epoch)
+
+    def poll(self):
+        u""" 前回のpoll()以降に確定したエポックを取得する
+
+        Returns:
+            受信機ごとのdict (NMEAFollower.poll()と同じ形式. tripIDは "送信元ホスト:送信元ポート/プロトコル")
+        """
+        new = self._new
+        self._new = collections.OrderedDict()
+        return new
+
+    def flush(self):
+        u""" 全受信機の組み立て中のエポックを確定し, poll()と同じ形式で返す """
+        for rid, rx in self._receivers.items():
+            self._add(rid, rx.fname, rx.builder.flush())
+        return self.poll()
+
+
+def _iter_lines(files):
+    for file in files:
+        with nmea_parse.open_nmea(file) as f:
+            for line in f:
+                yield line if line.endswith(b"\n") else line + b"\r\n"
+
+
+class ReplayServer(object):
+    u""" NMEAログファイルを受信機の代わりに送信するテスト用サーバー
+
+    RMCの時刻に合わせて実時間またはspeed倍速で送信する.
+    時刻が戻った場合や間隔がmaxgap秒を超えた場合(ファイルの切れ目等)は待たずに送信を続ける
+
+    Args:
+        files: 送信するファイルパスのlist (順に連結して送信する)
+        speed: 再生速度の倍率 (0: 待たずに送信する)
+        repeat: Trueの場合は最後まで送信したら先頭から繰り返す
+        maxgap: 待ち時間の上限 (秒)
+    """
+
+    def __init__(self, files, speed=1.0, repeat=False, maxgap=10):
+        self._log = logging.getLogger(__name__)
+        self._files = files
+        self._speed = speed
+        self._repeat = repeat
+        self._maxgap = maxgap
+
+    async def _play(self, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            base = None
+            prev = None
+            for line in _iter_lines(self._files):
+                if self._speed > 0 and line[3:6] == b"RMC":
+                    rmc = nmea_parse.tokenize_rmc(line)
+                    sec = nmea_data.epoch_sec(rmc) if rmc is not None else np.nan
+                    if not np.isnan(sec):
+                        if base is None or sec < prev or sec - prev > self._maxgap:
+                            base = (sec, loop.time())
+                        prev = sec
+                        delay = base[1] + (sec - base[0]) / self._speed - loop.time()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                await send(line)
+            if not self._repeat:
+                break
+
+    async def serve_tcp(self, host="127.0.0.1", port=10110):
+        u""" TCPで待ち受け, 接続したクライアントごとに先頭から送信する """
+
+        async def client(reader, writer):
+            peer = writer.get_extra_info("peername")
+            self._log.info("replay start: {}".format(peer))
+
+            async def send(line):
+                writer.write(line)
+                await writer.drain()
+
+            try:
+                await self._play(send)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+            self._log.info("replay end: {}".format(peer))
+
+        server = await asyncio.start_server(client, host, port)
+        try:
+            await server.wait_closed()
+        finally:
+            server.close()
+
+    async def send_tcp(self, host="127.0.0.1", port=10110):
+        u""" 指定先(Network ingestのTCP待ち受けポート等)にTCPで接続して送信する """
+        reader, writer = await asyncio.open_connection(host, port)
+
+        async def send(line):
+            writer.write(line)
+            await writer.drain()
+
+        try:
+            await self._play(send)
+        finally:
+            writer.close()
+
+    async def send_udp(self, host="127.0.0.1", port=10110):
+        u""" 指定先にUDPで1行ずつ送信する """
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, port))
+
+        async def send(line):
+            transport.sendto(line)
+            await asyncio.sleep(0)
+
+        try:
+            await self._play(send)
+        finally:
+            transport.close()
+
+
+def replay_files(paths):
+    u""" 送信するファイルのlistを作成する. ディレクトリ(SDカードroot, zip)はtripのファイル順に展開する """
+    nmea = nmea_parse.NMEAParser()
+    files = list()
+    for path in paths:
+        if os.path.isdir(path) or path.lower().endswith(".zip"):
+            trips = sorted(nmea.concat_trip(path)[1].values(), key=lambda fs: fs[0])
+            files += [f for fs in trips for f in fs]
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -4,58 +4,371 @@
 import sys
 import re
 import os
+import datetime
+import collections
+import itertools
+import mmap
+import gzip
+import bz2
+import lzma
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from time import sleep
 import pynmea2
 import logging
 
 
+# 高速パス用のRMCパース結果. pynmea2のRMCのうち使用する属性のみ保持する
+RMC = collections.namedtuple("RMC", ["timestamp", "status", "datestamp"])
+
+
+# zipファイル内のファイルは "zipファイルパス::zip内パス" で表す
+ZIP_SEP = "::"
+
+_MAGIC = [(b"PK\x03\x04", "zip"), (b"\x1f\x8b", "gz"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz")]
+_OPENER = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+def split_member(path):
+    u""" パスを(実ファイルパス, zip内パス)に分割する. zip内のファイルでない場合, zip内パスはNone """
+    archive, sep, member = path.partition(ZIP_SEP)
+    return archive, (member if sep else None)
+
+
+def compression(path):
+    u""" ファイル先頭のマジックナンバーから圧縮形式("zip", "gz", "bz2", "xz")を判定する. 非圧縮はNone """
+    archive, member = split_member(path)
+    if member is not None:
+        return "zip"
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    for m, kind in _MAGIC:
+        if magic.startswith(m):
+            return kind
+    return None
+
+
+def open_nmea(path, kind=None):
+    u""" ファイルを展開しながら読み込むバイナリストリームとして開く
+
+    Args:
+        path: ファイルパス (gzip/bz2/xz圧縮ファイル, zip内ファイルも可)
+        kind: compression()の結果. Noneの場合は判定する
+    """
+    archive, member = split_member(path)
+    if member is not None:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.open(member)
+    kind = kind if kind else compression(path)
+    return _OPENER[kind](path, "rb") if kind in _OPENER else open(path, "rb")
+
+
+def list_zip(archive):
+    u""" zipファイル内のNMEAファイルのパスを列挙する
+
+    zip内にSYSTEM/NMEA/NORMALがある場合(SDカードをそのまま圧縮した場合)はその中のファイルのみ対象とする
+    """
+    with zipfile.ZipFile(archive) as zf:
+        members = sorted(n for n in zf.namelist() if not n.endswith("/"))
+    normal = [n for n in members if "SYSTEM/NMEA/NORMAL/" in n]
+    return [archive + ZIP_SEP + n for n in (normal if normal else members)]
+
+
+def overlap(first, last, start, end):
+    u""" ファイルの時刻範囲[first, last]が[start, end]と重なるか (不明(None)な値は重なるとみなす) """
+    if start is not None and last is not None and last < start:
+        return False
+    if end is not None and first is not None and first > end:
+        return False
+    return True
+
+
+def _checksum(data):
+    u""" NMEAチェックサム(全byteのXOR)を算出する
+
+    1byteずつXORせず, 整数化したbyte列を半分ずつ畳み込んで算出する
+    """
+    x = int.from_bytes(data, "little")
+    n = len(data)
+    while n > 1:
+        n = (n + 1) // 2
+        x = (x >> (n * 8)) ^ (x & ((1 << (n * 8)) - 1))
+    return x
+
+
+def _timestamp(s):
+    if not s:
+        return None
+    ms = int(float(s[6:]) * 1000000) if s[6:] else 0
+    return datetime.time(int(s[0:2]), int(s[2:4]), int(s[4:6]), ms)
+
+
+def _datestamp(s):
+    if not s:
+        return None
+    yy = int(s[4:6])
+    return datetime.date((2000 if yy < 69 else 1900) + yy, int(s[2:4]), int(s[0:2]))
+
+
+def _tokenize_rmc(f):
+    return RMC(_timestamp(f[1]), f[2], _datestamp(f[9]))
+
+
+def _tokenize_gga(f):
+    return {"hdop": f[8]}
+
+
+def _tokenize_gsa(f):
+    svidlist = list()
+    for svid in f[3:15]:
+        if not svid:
+            break
+        svidlist.append(svid)
+    return {"mode": f[1], "fixtype": f[2], "pdop": f[15], "hdop": f[16], "vdop": f[17], "sv": svidlist}
+
+
+def _tokenize_gsv(f):
+    f += [""] * (20 - len(f))
+    svlist = list()
+    for i in range(4, 20, 4):
+        if f[i]:
+            svlist.append({"no": f[i], "el": f[i+1], "az": f[i+2], "sn": f[i+3]})
+    return {"in_view": f[3], "sv": svlist}
+
+
+# RMC/GGA/GSA/GSVの行をbyte列のまま検索する
+# (先頭の"$"を固定文字列として高速に検索し, 直前が改行またはファイル先頭であることを後読みで確認する)
+_SENTENCE = re.compile(rb"\$(?<![^\n]\$)..(RMC|GGA|GSA|GSV)[^\r\n]*")
+_TOKER = {b"RMC": "RMC", b"GGA": "GGA", b"GSA": "GSA", b"GSV": "GSV"}
+
+_TOKENIZER = {"RMC": _tokenize_rmc, "GGA": _tokenize_gga, "GSA": _tokenize_gsa, "GSV": _tokenize_gsv}
+
+
+def tokenize_rmc(line):
+    u""" RMCの1行を高速パスのtokenizerでパースする
+
+    Args:
+        line: 1行分のstrまたはbyte列 (末尾の改行は含んでよい)
+
+    Returns:
+        RMC(timestamp, status, datestamp). RMC以外の行, チェックサム不一致等の不正な行はNone
+    """
+    if isinstance(line, bytes):
+        line = line.decode("latin-1")
+    line = line.strip()
+    if line[3:6] != "RMC":
+        return None
+    return NMEAParser._tokenize(line, "RMC")
+
+
+def iter_rmc(data, reverse=False):
+    u""" byte列中のRMCの行を順にパースする (不正な行は除く)
+
+    Args:
+        data: 読み込んだbyte列
+        reverse: Trueの場合は末尾から順に返す
+
+    Yields:
+        tokenize_rmc()の戻り値
+    """
+    matches = [m for m in _SENTENCE.finditer(data) if m.group(1) == b"RMC"]
+    for m in (reversed(matches) if reverse else matches):
+        rmc = tokenize_rmc(m.group(0))
+        if rmc is not None:
+            yield rmc
+
+
+def _parse_file(file, fastpath):
+    u""" ProcessPoolExecutorのworkerから呼び出すためのparse関数
+
+    親プロセスへはdictのlistではなくEpochStore(配列)で返し, pickleの量を減らす
+
+    Returns:
+        (NMEAParser.parse_store()の結果, NMEAParser.counters)
+    """
+    parser = NMEAParser(fastpath)
+    return parser.parse_store(file), parser.counters
+
+
+def _file_size(file):
+    u""" ファイルサイズ (zip内ファイルは圧縮後のサイズ) """
+    archive, member = split_member(file)
+    if member is not None:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.getinfo(member).compress_size
+    return os.path.getsize(archive)
+
+
+class EpochBuilder(object):
+    u""" センテンスを順に受け取り, RMC区切りで1秒分のparse結果を組み立てるクラス
+
+    直前と同じ時刻のRMCの後のセンテンスは, 次のRMCまで無視する.
+    最初のRMCより前のセンテンスも無視する
+
+    Args:
+        parser: センテンスのパースに使用するNMEAParser
+    """
+
+    def __init__(self, parser):
+        self._parser = parser
+        self._epoch = None
+        self._newnmea = True
+
+    def feed(self, sentence, toker):
+        u""" 1センテンスを追加する
+
+        Returns:
+            新しい時刻のRMCにより完成したparse結果dict. それ以外はNone
+        """
+        done = None
+        if toker == "RMC":
+            rmc = self._parser._parse_sentence(sentence, toker)
+            if self._epoch is not None and rmc.timestamp == self._epoch["RMC"].timestamp:
+                self._newnmea = False
+            else:
+                self._newnmea = True
+                done = self._epoch
+                self._epoch = {toker: rmc}
+        elif self._newnmea and self._epoch is not None:
+            if toker == "GSV" and "GSV" in self._epoch:
+                self._epoch["GSV"]["sv"] += self._parser._parse_sentence(sentence, toker)["sv"]
+            else:
+                self._epoch[toker] = self._parser._parse_sentence(sentence, toker)
+        return done
+
+    def feed_bytes(self, data, end=None):
+        u""" byte列中のRMC/GGA/GSA/GSVの行を順に追加する
+
+        Args:
+            data: 受信, 読み込みしたbyte列
+            end: 対象とする終端位置 (末尾の改行されていない行を除く場合に指定する)
+
+        パースできない行(受信途中で欠けた行等)は数えて読み飛ばす
+
+        Returns:
+            完成したparse結果dictのlist
+        """
+        done = list()
+        for match in _SENTENCE.finditer(data, 0, len(data) if end is None else end):
+            try:
+                epoch = self.feed(match.group(0).decode("latin-1"), _TOKER[match.group(1)])
+            except pynmea2.ParseError as e:
+                self._parser.counters["parse_error"] += 1
+                self._parser._log.debug("parse error: {}".format(e))
+                continue
+            if epoch is not None:
+                done.append(epoch)
+        return done
+
+    def flush(self):
+        u""" 組み立て中のparse結果を返し, 状態を初期化する """
+        done = self._epoch
+        self._epoch = None
+        self._newnmea = True
+        return done
+
+
 class NMEAParser(object):
     u""" NMEAパーサークラス
 
     指定ｳれたNORMALディレクトリ内のNMEAデータからSN等を算出する
+
+    Args:
+        fastpath: Trueの場合, RMC/GGA/GSA/GSVは独自のtokenizerでパースし,
+                  チェックサム不一致等の不正な行のみpynmea2でパースする.
+                  Falseの場合は全ての行をpynmea2でパースする(比較検証用)
+
+    Attributes:
+        counters: パース件数のCounter
+            * "files"          : パースしたファイル数 (キャッシュから読み込んだファイルを含む)
+            * "bytes"          : パースしたファイルのbyte数 (圧縮ファイルは圧縮後のサイズ. キャッシュ分を含む)
+            * "epochs"         : パースしたエポック数
+            * "fallback"       : fastpathでパースできずpynmea2でパースした行数
+            * "checksum_repair": チェックサムを無視してパースした行数
+            * "parse_error"    : EpochBuilder.feed_bytesでパースできず読み飛ばした行数
+            * "cache_hit"      : parse_filesでキャッシュから読み込んだファイル数
     """
 
-    def __init__(self):
+    def __init__(self, fastpath=True):
         self._log = logging.getLogger(__name__)
+        self._fastpath = fastpath
+        self.counters = collections.Counter()
+
+    def list_files(self, path):
+        u""" sd root path内のNMEAファイルを列挙する
+
+        Args:
+            path: sd root path (gzip/bz2/xz圧縮ファイル, zipファイルを含むディレクトリ, zipファイルも可)
 
-    def concat_trip(self, path):
+        Returns:
+            root: NORMALディレクトリ (SDカードを圧縮したzipファイルの場合はzipファイル) のパス
+            entries: ファイルパスのlist (zipファイル(拡張子.zip)は中のファイルに展開する)
+        """
+
+        if os.path.isdir(path):
+            if "SYSTEM" in os.listdir(path):
+                path = os.path.join(path, "SYSTEM", "NMEA", "NORMAL")
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path))]
+        else:
+            files = [path]     # SDカードを圧縮したzipファイル
+
+        entries = list()
+        for file in files:
+            if not os.path.isfile(file):
+                sys.stderr.write("{} is not file path".format(file))
+            elif file.lower().endswith(".zip"):   # 全ファイルを開かないよう, 拡張子で判定する
+                entries += list_zip(file)
+            else:
+                entries.append(file)
+
+        return path, entries
+
+    def concat_trip(self, path, index=None, start=None, end=None):
         u""" 各ファイルをtrip idごとにまとめる
 
         Args:
-            path: sd root path
+            path: sd root path (gzip/bz2/xz圧縮ファイル, zipファイルを含むディレクトリ, zipファイルも可)
+            index: nmea_index.TripIndex. 指定時はサイズ, mtimeが変わらないファイルを開かない
+            start, end: 指定時は時刻範囲(epoch_secの秒数)が重なるファイルのみ対象とする (index指定時のみ)
 
         Returns:
-            i+1: total file 数
+            total file 数 (zip内のファイルを含む)
             dict_trip: tripIDごとにファイルをまとめたdict
                  * key1: tripID, value(list): 対応tripIDのファイルフルパス
         """
 
-        if "SYSTEM" in os.listdir(path):
-            path = os.path.join(path, "SYSTEM", "NMEA", "NORMAL")
-        files = os.listdir(path)
-        files.sort()
+        root, entries = self.list_files(path)
         dict_trip = {}
         dummy = 0
 
-        for i, file in enumerate(files):
-            file = os.path.join(path, file)
-            if os.path.isfile(file):
-                with open(file, "r") as f:
-                    print("open:", file)
-                    line = f.readline().split(",")
-                    if len(line) >= 2 and "GTRIP" in line[0]:
-                        key = line[1].rstrip()
-                    else:
-                        key = "dummy{}".format(dummy)
-                        dummy += 1
+        if index is not None:
+            rows = index.scan(entries, root)
+            entries = list()
+            for file, key, first, last, epochs in rows:
+                if not key:
+                    key = "dummy{}".format(dummy)
+                    dummy += 1
+                if overlap(first, last, start, end):
+                    dict_trip.setdefault(key, list()).append(file)
+                    entries.append(file)
+            return len(entries), dict_trip
 
-                    if key not in dict_trip:
-                        dict_trip[key] = list()
-                    dict_trip[key].append(file)
-            else:
-                sys.stderr.write("{} is not file path".format(file))
+        for file in entries:
+            # 先頭行のみ展開して読み込む
+            with open_nmea(file) as f:
+                self._log.debug("open: {}".format(file))
+                line = f.readline().decode("latin-1").split(",")
+                if len(line) >= 2 and "GTRIP" in line[0]:
+                    key = line[1].rstrip()
+                else:
+                    key = "dummy{}".format(dummy)
+                    dummy += 1
 
-        return i+1, dict_trip
+                if key not in dict_trip:
+                    dict_trip[key] = list()
+                dict_trip[key].append(file)
+
+        return len(entries), dict_trip
 
     def parse(self, file):
         u""" NMEAセンテンスをパースする
@@ -65,7 +378,8 @@ class NMEAParser(object):
 
         Returns:
             parsed: 各秒ごとにセンテンスparse結果をまとめたdictのlist
-                    * "RMC": pynmea2のparse結果そのまま
+                    * "RMC": RMC(timestamp, status, datestamp)
+                             (pynmea2でパースした場合も同じ形式とする)
                     * "GSA": parse結果のdict
                         * "mode"   : mode (A/M)
                         * "fixtype": fix type (1:no,2:2D,3:3D)
@@ -82,77 +396,358 @@ class NMEAParser(object):
                             * "sn": 受信強度
         """
 
-        parsed = list()
-        newnmea = True
-        with open(file, "r") as f:
-            r = re.compile("(^\$..)(RMC|GGA|GSA|GSV)(.*)")
-            for line in f:
-                match = r.match(line)
-                if match:
-                    toker = match.group(2)
-                    if toker == "RMC":
-                        rmc = self._parse_nmea(line)
-                        if len(parsed) and rmc.timestamp == parsed[-1]["RMC"].timestamp:
-                            newnmea = False
-                        else:
-                            newnmea = True
-                            parsed.append(dict())
-                            parsed[-1][toker] = rmc
-                    elif newnmea:
-                        if toker == "GSV" and "GSV" in parsed[-1]:
-                            parsed[-1]["GSV"]["sv"] += self._parse_nmea(line)["sv"]
-                        else:
-                            parsed[-1][toker] = self._parse_nmea(line)
+        return list(self.iter_file(file))
+
+    def iter_file(self, file):
+        u""" NMEAセンテンスをパースし, 1秒分(RMC区切り)ずつ返す
+
+        Yields:
+            parse()の戻り値のlistの各要素
+        """
+        self.counters["files"] += 1
+        self.counters["bytes"] += _file_size(file)
+        builder = EpochBuilder(self)
+        for line, toker in self._iter_sentences(file):
+            epoch = builder.feed(line, toker)
+            if epoch is not None:
+                self.counters["epochs"] += 1
+                yield epoch
+        epoch = builder.flush()
+        if epoch is not None:
+            self.counters["epochs"] += 1
+            yield epoch
+
+    def iter_trip(self, files):
+        u""" trip内の全ファイルを順にパースし, 1秒分ずつ返す
+
+        ファイルごとにparse()した結果を連結したものと同じ順序, 内容となる
+        """
+        for file in files:
+            yield from self.iter_file(file)
+
+    @staticmethod
+    def _iter_sentences(file):
+        u""" RMC/GGA/GSA/GSVの行のみ(行, センテンス種別)を返す
+
+        非圧縮ファイルはmmapしてbyte列のまま検索し, 対象の行のみdecodeする.
+        圧縮ファイルは展開しながら1行ずつ先頭のセンテンス種別で判定する
+        """
+        kind = compression(file)
+        if kind:
+            with open_nmea(file, kind) as f:
+                for line in f:
+                    toker = _TOKER.get(line[3:6])
+                    if toker and line[:1] == b"$":
+                        yield line.rstrip(b"\r\n").decode("latin-1"), toker
+            return
+
+        with open(file, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空ファイル
+                return
+            with mm:
+                for match in _SENTENCE.finditer(mm):
+                    yield match.group(0).decode("latin-1"), _TOKER[match.group(1)]
+
+    def parse_store(self, file):
+        u""" NMEAセンテンスをパースし, dictのlistを作らずにnmea_data.EpochStoreへ格納する
+
+        Returns:
+            全エポックを追加したEpochStore
+        """
+        import nmea_data  # numpyのimportを起動時に行わないよう, 使用時にimportする
+        store = nmea_data.EpochStore()
+        store.extend(self.iter_file(file))
+        return store
+
+    def parse_files(self, files, workers=None, minfiles=4, cache=None, columnar=False):
+        u""" 複数ファイルをパースする. columnar指定時はプロセスプールで並列にパースする
+
+        dictのlistはプロセス間の受け渡し(pickle)にパースと同程度の時間がかかるため,
+        columnar=Falseの場合はworkersによらず逐次パースする.
+        並列時もworkersの2倍を超えるファイルは先に投入せず, 結果を溜め込まない.
+        パースが必要なファイル数がminfiles未満, またはworkersが1以下の場合は逐次パースする.
+        途中でgeneratorを閉じた場合, 未着手のファイルのパースはキャンセルされる
+
+        Args:
+            files: パースするファイルのlist
+            workers: プロセス数 (None: CPU数)
+            minfiles: 並列化するファイル数の下限
+            cache: nmea_cache.ParseCache. 指定時はキャッシュ済みのファイルをパースしない
+                   (キャッシュはfastpathのparse結果のみ保持するため, fastpath=False時は使用しない)
+            columnar: Trueの場合, parse()の結果の代わりにparse_store()の結果(EpochStore)を返す
+
+        Yields:
+            (file, parsed): filesの順番どおりのファイル名とparse()またはparse_store()の結果
+        """
 
+        cache = cache if self._fastpath else None
+        kind = "store" if columnar else "list"
+        workers = workers if workers else os.cpu_count()
+        todo = [f for f in files if not (cache and cache.contains(f, kind))]
+        if not columnar or workers <= 1 or len(todo) < minfiles:
+            for f in files:
+                yield f, self._parse_cached(f, cache, columnar)
+            return
+
+        with ProcessPoolExecutor(min(workers, len(todo))) as executor:
+            todo = iter(todo)
+            pending = collections.deque()   # 投入済みの(ファイル, future). filesの順番どおり
+            try:
+                for f in files:
+                    for nf in itertools.islice(todo, workers * 2 - len(pending)):
+                        pending.append((nf, executor.submit(_parse_file, nf, self._fastpath)))
+                    if pending and pending[0][0] == f:
+                        parsed, counters = pending.popleft()[1].result()
+                        self.counters.update(counters)
+                        cache.put(f, parsed, kind) if cache else ""
+                    else:
+                        parsed = self._parse_cached(f, cache, columnar)
+                    yield f, parsed
+            finally:
+                for nf, future in pending:
+                    future.cancel()
+
+    def _parse_cached(self, file, cache, columnar):
+        u""" キャッシュがあれば読み込み, なければパースしてキャッシュに保存する """
+        kind = "store" if columnar else "list"
+        parsed = cache.get(file, kind) if cache else None
+        if parsed is not None:
+            self._cache_hit(file, parsed)
+            return parsed
+        parsed = self.parse_store(file) if columnar else self.parse(file)
+        cache.put(file, parsed, kind) if cache else ""
         return parsed
 
-    def _parse_nmea(self, sentence):
+    def _cache_hit(self, file, parsed):
+        # パースした場合と同じく, ファイル数, byte数も数える
+        self.counters["cache_hit"] += 1
+        self.counters["files"] += 1
+        self.counters["bytes"] += _file_size(file)
+        self.counters["epochs"] += len(parsed)
+
+    def _parse_sentence(self, sentence, toker):
+        u""" 1センテンスをパースする
+
+        fastpath有効時は独自tokenizerを使用し, 不正な行の場合のみpynmea2で再パースする
+        """
+        if self._fastpath:
+            nmea = self._tokenize(sentence, toker)
+            if nmea is not None:
+                return nmea
+            self.counters["fallback"] += 1
+        return self._parse_nmea(sentence)
+
+    @staticmethod
+    def _tokenize(sentence, toker):
+        u""" pynmea2を使わずにsplitでパースする
+
+        Returns:
+            _parse_nmeaと同じ形式のparse結果.
+            チェックサム不一致, 欠落, フィールド不正の場合はNone
+        """
+        sentence = sentence.strip()
+        star = sentence.find("*")
+        if star < 0 or len(sentence) != star + 3 or sentence[0] != "$":
+            return None
+        body = sentence[1:star]
         try:
-            nmea = msg = pynmea2.parse(sentence)
-
-            if msg.sentence_type == "GSA":
-                gsa = dict()
-                gsa["mode"] = msg.mode
-                gsa["fixtype"] = msg.mode_fix_type
-                gsa["pdop"] = msg.pdop
-                gsa["hdop"] = msg.hdop
-                gsa["vdop"] = msg.vdop
-                svidlist = list()
-                for i in range(1, 13):
-                    svid = eval("msg.sv_id{:02d}".format(i))
-                    if svid:
-                        svidlist.append(svid)
-                    else:
-                        break
-                gsa["sv"] = svidlist
-                nmea = gsa
-            elif msg.sentence_type == "GSV":
-                gsv = dict()
-                gsv["in_view"] = msg.num_sv_in_view
-                svlist = list()
-                for i in range(1, 5):
-                    sv = dict()
-                    sv["no"] = eval("msg.sv_prn_num_"+str(i))
-                    sv["el"] = eval("msg.elevation_deg_"+str(i))
-                    sv["az"] = eval("msg.azimuth_"+str(i))
-                    sv["sn"] = eval("msg.snr_"+str(i))
-                    if sv["no"]:
-                        svlist.append(sv)
-                gsv["sv"] = svlist
-                nmea = gsv
-            elif msg.sentence_type == "GGA":
-                gga = dict()
-                gga["hdop"] = msg.horizontal_dil
-                nmea = gga
+            if int(sentence[star+1:], 16) != _checksum(body.encode("ascii")):
+                return None
+            return _TOKENIZER[toker](body.split(","))
+        except (ValueError, IndexError, UnicodeEncodeError):
+            return None
 
+    def _parse_nmea(self, sentence):
+        try:
+            msg = pynmea2.parse(sentence)
         except pynmea2.nmea.ChecksumError:
-            tmp = sentence.split(",")
-            tmp[-1] = str(pynmea2.nmea.NMEASentence.checksum(sentence))
-            nmea = pynmea2.parse(",".join(tmp))
+            # チェックサムを無視してパースする
+            msg = pynmea2.parse(sentence.split("*")[0])
+            self.counters["checksum_repair"] += 1
+
+        nmea = msg
+        if msg.sentence_type == "GSA":
+            gsa = dict()
+            gsa["mode"] = msg.mode
+            gsa["fixtype"] = msg.mode_fix_type
+            gsa["pdop"] = msg.pdop
+            gsa["hdop"] = msg.hdop
+            gsa["vdop"] = msg.vdop
+            svidlist = list()
+            for i in range(1, 13):
+                svid = getattr(msg, "sv_id{:02d}".format(i))
+                if svid:
+                    svidlist.append(svid)
+                else:
+                    break
+            gsa["sv"] = svidlist
+            nmea = gsa
+        elif msg.sentence_type == "GSV":
+            gsv = dict()
+            gsv["in_view"] = msg.num_sv_in_view
+            svlist = list()
+            for i in range(1, 5):
+                sv = dict()
+                sv["no"] = getattr(msg, "sv_prn_num_"+str(i))
+                sv["el"] = getattr(msg, "elevation_deg_"+str(i))
+                sv["az"] = getattr(msg, "azimuth_"+str(i))
+                sv["sn"] = getattr(msg, "snr_"+str(i))
+                if sv["no"]:
+                    svlist.append(sv)
+            gsv["sv"] = svlist
+            nmea = gsv
+        elif msg.sentence_type == "GGA":
+            gga = dict()
+            gga["hdop"] = msg.horizontal_dil
+            nmea = gga
+        elif msg.sentence_type == "RMC":
+            # 高速パスと同じ形式にする. pynmea2は変換できない値を文字列のまま返すため, 日時でない値はNoneとする
+            # (pynmea2のバージョンによってはtimestampにtzinfoが付く)
+            timestamp, datestamp = msg.timestamp, msg.datestamp
+            timestamp = timestamp.replace(tzinfo=None) if isinstance(timestamp, datetime.time) else None
+            datestamp = datestamp if isinstance(datestamp, datetime.date) else None
+            nmea = RMC(timestamp, msg.status, datestamp)
 
         return nmea
 
 
+class NMEAFollower(object):
+    u""" 追記され続けるNORMALディレクトリ内のファイルを監視し, 追記分のみパースするクラス
+
+    ファイルごとに読み込み済みのbyte位置と末尾の改行前の行を保持し,
+    poll()ごとに追記された完全な行のみパースする.
+    エポックは次の時刻のRMCを受信した時点で確定するため, 末尾の受信途中のGSV等は次回以降に返す.
+    同じtripの新しいファイルが作成された場合, 以前のファイルの最後のエポックを確定し, 以降は監視しない.
+    圧縮ファイル, zip内のファイルは追記されないものとして対象外とする.
+    poll()ごとのディレクトリの一覧取得は1回のみで, ファイルを開いて判定するのは新しいファイルのみ,
+    サイズを確認するのは監視中(tripごとの最新)のファイルのみとする
+
+    Args:
+        path: sd root path
+        parser: センテンスのパースに使用するNMEAParser
+    """
+
+    def __init__(self, path, parser=None):
+        self._path = path
+        self._parser = parser if parser else NMEAParser()
+        self._files = collections.OrderedDict()     # 監視中のファイル
+        self._known = set()     # 監視中, 監視を終えたファイル
+        self._ignored = set()   # 対象外のファイル
+        self._pending = dict()  # 先頭行が書き込み途中のファイルと確認時のサイズ
+        self._dir = None
+        self._dummy = 0
+
+    def _read_tid(self, file):
+        u""" 先頭行からtrip idを取得する. 先頭行が書き込み途中の場合はNone """
+        with open(file, "rb") as f:
+            line = f.readline()
+        if not line.endswith(b"\n"):
+            return None
+        line = line.decode("latin-1").split(",")
+        if len(line) >= 2 and "GTRIP" in line[0]:
+            return line[1].rstrip()
+        self._dummy += 1
+        return "dummy{}".format(self._dummy - 1)
+
+    @staticmethod
+    def _add(new, tid, file, epoch):
+        if epoch is None:
+            return
+        trip = new.setdefault(tid, {"fname": [], "gps": []})
+        if file not in trip["fname"]:
+            trip["fname"].append(file)
+        trip["gps"].append(epoch)
+
+    def _read(self, file, st, new):
+        try:
+            size = os.path.getsize(file)
+        except OSError:     # 削除された場合
+            return
+        if size < st["offset"]:     # 書き直された場合は先頭から読み直す
+            st.update(offset=0, tail=b"", builder=EpochBuilder(self._parser))
+        if size == st["offset"]:
+            return
+
+        with open(file, "rb") as f:
+            f.seek(st["offset"])
+            data = f.read(size - st["offset"])
+        st["offset"] += len(data)
+        data = st["tail"] + data
+        end = data.rfind(b"\n") + 1
+        st["tail"] = data[end:]
+
+        for epoch in st["builder"].feed_bytes(data, end):
+            self._add(new, st["tid"], file, epoch)
+
+    def _list(self):
+        u""" 監視対象のファイルパスのlist (NORMALディレクトリは初回のみ判定する) """
+        if self._dir is None:
+            path = self._path
+            if os.path.isdir(path) and "SYSTEM" in os.listdir(path):
+                path = os.path.join(path, "SYSTEM", "NMEA", "NORMAL")
+            self._dir = path
+        if not os.path.isdir(self._dir):
+            return [self._dir]
+        return [os.path.join(self._dir, f) for f in sorted(os.listdir(self._dir))]
+
+    def _start(self, file, new):
+        u""" 新しいファイルを判定し, 対象の場合は監視を開始する """
+        if file in self._pending:
+            size = os.path.getsize(file)
+            if size == self._pending[file]:
+                return
+            self._pending[file] = size
+        elif not os.path.isfile(file) or compression(file):
+            self._ignored.add(file)
+            return
+        tid = self._read_tid(file)
+        if tid is None:
+            self._pending.setdefault(file, os.path.getsize(file))
+            return
+        self._pending.pop(file, None)
+        for f, prev in list(self._files.items()):
+            if prev["tid"] == tid:
+                self._add(new, tid, f, prev["builder"].flush())
+                del self._files[f]
+        self._known.add(file)
+        self._files[file] = {"offset": 0, "tail": b"", "tid": tid, "builder": EpochBuilder(self._parser)}
+
+    def poll(self):
+        u""" 前回のpoll()以降に追記された分をパースする
+
+        Returns:
+            tripIDごとの新たに確定したエポックのdict (concat_trip+parseと同じ形式)
+                * key1: tripID, value: {"fname": 追記があったファイルのlist, "gps": parse結果のlist}
+        """
+        new = collections.OrderedDict()
+        # 新しいファイルで監視を終える前に, 以前のファイルの追記分を読み込む
+        for file, st in list(self._files.items()):
+            self._read(file, st, new)
+        for file in self._list():
+            if file in self._known or file in self._ignored:
+                continue
+            try:
+                self._start(file, new)
+            except OSError:
+                continue
+            if file in self._files:
+                self._read(file, self._files[file], new)
+        return new
+
+    def flush(self):
+        u""" 全ファイルの組み立て中のエポックを確定する (監視終了時に使用する)
+
+        Returns:
+            poll()と同じ形式のdict
+        """
+        new = collections.OrderedDict()
+        for file, st in self._files.items():
+            self._add(new, st["tid"], file, st["builder"].flush())
+        return new
+
+
 if __name__ == '__main__':
     print("WARN: this file is not entry point !!", file=sys.stderr)
     sleep(5)
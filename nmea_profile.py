@@ -0,0 +1,185 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import time
+import collections
+import contextlib
+import cProfile
+import threading
+import logging
+
+
+class Profiler(object):
+    u""" 処理段階ごとの処理時間と件数を集計するクラス
+
+    stage()で囲んだ処理の時間と, count(), update()で加算した件数(エポック数, 読み込みbyte数等)を保持し,
+    report()でloggingに出力する. 各段階の時間は終了時に "<name>.<段階名>" のloggerにDEBUGで出力する.
+    複数threadから使用してよい
+
+    Args:
+        name: logger名
+    """
+
+    def __init__(self, name=__name__):
+        self._name = name
+        self._log = logging.getLogger(name)
+        self._lock = threading.Lock()
+        self._timers = collections.OrderedDict()
+        self._counters = collections.Counter()
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        u""" withで囲んだ処理の時間を計測する """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, sec):
+        with self._lock:
+            t = self._timers.setdefault(name, [0, 0.0])
+            t[0] += 1
+            t[1] += sec
+        logging.getLogger("{}.{}".format(self._name, name)).debug("{:.3f} s".format(sec))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def update(self, counters):
+        u""" 件数のdict(Counter)を加算する """
+        with self._lock:
+            self._counters.update(counters)
+
+    def get(self, name):
+        u""" 段階の合計時間 (未計測は0) """
+        with self._lock:
+            return self._timers.get(name, [0, 0.0])[1]
+
+    def summary(self, names=None):
+        u""" 集計結果の文字列を作成する
+
+        Args:
+            names: 出力する段階名のlist (None: 全て). 指定時は件数を出力しない
+        """
+        with self._lock:
+            timers = [(k, v) for k, v in self._timers.items() if names is None or k in names]
+            counters = dict(self._counters) if names is None else {}
+
+        text = ", ".join("{} {:.3f}s{}".format(k, total, " x{}".format(n) if n > 1 else "")
+                         for k, (n, total) in timers)
+        if counters:
+            items = list()
+            for k, v in sorted(counters.items()):
+                items.append("{} {:.1f}MB".format(k, v/1024/1024) if k == "bytes" else "{} {}".format(k, v))
+            text += " | " + ", ".join(items)
+            parse = self._timers.get("parse")
+            if parse and parse[1] > 0 and counters.get("epochs"):
+                text += " | {:.0f} epochs/s".format(counters["epochs"] / parse[1])
+        return text
+
+    def report(self, names=None, level=logging.INFO):
+        u""" 集計結果をloggingに出力する """
+        self._log.log(level, "profile: " + self.summary(names))
+
+
+# アプリケーション全体で共有する集計
+PROFILE = Profiler()
+
+
+class SamplingProfiler(object):
+    u""" 指定threadのスタックを一定間隔で取得するサンプリングプロファイラ
+
+    cProfile.Profileと同じenable(), disable(), dump_stats()で使用する.
+    結果はflamegraph.pl, speedscope等で読み込めるcollapsed stack形式 ("関数;関数;... サンプル数") で出力する
+
+    Args:
+        ident: 対象threadのident (None: 呼び出し元thread)
+        interval: サンプリング間隔 (秒)
+    """
+
+    def __init__(self, ident=None, interval=0.005):
+        self._ident = ident if ident is not None else threading.get_ident()
+        self._interval = interval
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._ident)
+            stack = list()
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def dump_stats(self, path):
+        with open(path, "w") as f:
+            for stack, n in self._stacks.most_common():
+                f.write("{} {}\n".format(stack, n))
+
+
+MODES = ["cprofile", "sampling"]
+
+
+def default_path(mode, prefix="load"):
+    u""" プロファイル結果の保存先 (~/.gsvchecker/profile/<prefix>-<日時>.<prof|txt>) """
+    name = "{}-{}.{}".format(prefix, time.strftime("%Y%m%d-%H%M%S"), "prof" if mode == "cprofile" else "txt")
+    return os.path.join(os.path.expanduser("~"), ".gsvchecker", "profile", name)
+
+
+@contextlib.contextmanager
+def session(path, mode="cprofile"):
+    u""" withで囲んだ処理をプロファイルし, 終了時にpathへ保存する
+
+    呼び出し元threadのみ対象とする (プロセスプールでのパースは含まれない).
+    プロファイル中の処理段階ごとの時間(Profilerのログ)は, pathの拡張子を.logにしたファイルに保存する
+
+    Args:
+        path: 保存先ファイルパス (cprofile: pstats形式, sampling: collapsed stack形式)
+        mode: "cprofile" または "sampling"
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    log = logging.getLogger(__name__)
+    handler = logging.FileHandler(os.path.splitext(path)[0] + ".log", "w")
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s/%(levelname)s] %(message)s"))
+    log.addHandler(handler)
+
+    prof = SamplingProfiler() if mode == "sampling" else cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        log.info("profile saved: {}".format(path))
+        log.removeHandler(handler)
+        handler.close()
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import numpy as np
+
+
+class SVStats(object):
+    u""" GPSDataの衛星ごと, エポックごとの統計値 (compute()で作成する)
+
+    Attributes:
+        prn: 衛星番号のlist
+        count: 衛星ごとの存在するエポック数
+        mean, median: 衛星ごとのC/N平均値, 中央値 (存在するエポックなしはnan. 以下同様)
+        percentiles: {p: 衛星ごとのC/Nのpパーセンタイル}
+        above: 衛星ごとのC/N閾値以上のエポックの割合 (存在するエポック数に対する割合. 閾値なしはNone)
+        el, az: 衛星ごとの仰角, 方位角の平均 (0以下(未取得)を除く)
+        top: エポックごとのC/N上位topn衛星の平均 (topn衛星未満のエポックはnan)
+        topn: topの衛星数
+    """
+
+    def __init__(self, prn, count, mean, median, percentiles, above, el, az, top, topn):
+        self.prn = prn
+        self.count = count
+        self.mean = mean
+        self.median = median
+        self.percentiles = percentiles
+        self.above = above
+        self.el = el
+        self.az = az
+        self.top = top
+        self.topn = topn
+
+    def top_values(self):
+        u""" C/N平均値上位topn衛星のC/N平均値 (降順) """
+        return np.sort(self.mean[~np.isnan(self.mean)])[::-1][:self.topn]
+
+    def top_mean(self):
+        u""" C/N平均値上位topn衛星の平均 (topn衛星未満は0) """
+        top = self.top_values()
+        return np.average(top) if len(top) >= self.topn else 0
+
+    def top_epoch_mean(self):
+        u""" エポックごとのC/N上位topn衛星の平均の, 全エポックの平均 (該当エポックなしはnan) """
+        top = self.top[~np.isnan(self.top)]
+        return np.mean(top) if len(top) else np.nan
+
+
+def _masked_mean(v, mask):
+    cnt = mask.sum(axis=0)
+    total = np.where(mask, v, 0).sum(axis=0, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / cnt
+
+
+def _percentile(ordered, cnt, p):
+    u""" 列ごとに昇順に並べた配列(nanは末尾)から, 列ごとの有効数cntまでのpパーセンタイルを線形補間で求める """
+    pos = np.maximum(cnt - 1, 0) * (p / 100.0)
+    low = np.floor(pos).astype(np.intp)
+    high = np.ceil(pos).astype(np.intp)
+    cols = np.arange(ordered.shape[1])
+    v = ordered[low, cols] + (ordered[high, cols] - ordered[low, cols]) * (pos - low)
+    return np.where(cnt > 0, v, np.nan)
+
+
+def compute(gps, thr_sn=None, percentiles=(), topn=3):
+    u""" 衛星ごと, エポックごとの統計値をエポック×衛星の配列のまま一括で算出する
+
+    中央値とパーセンタイルは衛星ごとに1回並べ替えた配列から求める
+
+    Args:
+        gps: nmea_data.GPSData
+        thr_sn: 閾値以上の割合(above)を算出するC/N閾値 (None: 算出しない)
+        percentiles: 算出するパーセンタイル(0-100)のlist
+        topn: エポックごと, 全体の上位平均の衛星数
+
+    Returns:
+        SVStats
+    """
+    valid = gps.valid()
+    cnt = valid.sum(axis=0)
+    num = len(gps.prn)
+    mean = _masked_mean(gps.sn, valid)
+
+    if len(gps):
+        # nanは並べ替えで末尾になるため, 各列の先頭cnt個が有効値となる
+        ordered = np.sort(np.where(valid, gps.sn, np.nan), axis=0)
+        median = _percentile(ordered, cnt, 50)
+        pcts = {p: _percentile(ordered, cnt, p) for p in percentiles}
+    else:
+        median = np.full(num, np.nan)
+        pcts = {p: np.full(num, np.nan) for p in percentiles}
+
+    above = None
+    if thr_sn is not None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            above = (valid & (gps.sn >= thr_sn)).sum(axis=0) / cnt
+
+    # 0以下(未取得, 空欄)の仰角, 方位角を除いて平均する
+    el = _masked_mean(gps.el, valid & (gps.el > 0))
+    az = _masked_mean(gps.az, valid & (gps.az > 0))
+
+    if num >= topn > 0:
+        top = -np.sort(np.where(valid, -gps.sn.astype(np.float64), np.inf), axis=1)[:, :topn].mean(axis=1)
+        top[valid.sum(axis=1) < topn] = np.nan
+    else:
+        top = np.full(len(gps), np.nan)
+
+    return SVStats(list(gps.prn), cnt, mean, median, pcts, above, el, az, top, topn)
+
+
+def summarize(gps, thr_sn=None, percentiles=(), topn=3):
+    u""" GPSDataの統計値を算出する
+
+    Args:
+        thr_sn, percentiles: compute()と同じ
+        topn: 上位平均の衛星数 (戻り値のkeyは"top3"のまま)
+
+    Returns:
+        統計値dict
+            * "sv_num"    : 衛星数 (存在するエポックがない衛星は除く. 以下の衛星番号ごとのdictも同様)
+            * "cn"        : 衛星番号ごとのC/N平均値のdict
+            * "cn_median" : 衛星番号ごとのC/N中央値のdict
+            * "cn_pct"    : 衛星番号ごとの{パーセンタイル: C/N}のdict
+            * "cn_above"  : 衛星番号ごとのC/N閾値以上の割合のdict (thr_sn指定時のみ)
+            * "top3"      : C/N平均値上位3衛星の平均 (3衛星未満は0)
+            * "top3_epoch": エポックごとのC/N上位3衛星の平均の平均 (該当エポックなしはnan)
+            * "hdop_mean", "hdop_min", "hdop_max": hdop統計値 (GGAなし(99)は除く. データなしはnan)
+    """
+    stats = compute(gps, thr_sn, percentiles, topn)
+    hdop = gps.hdop[gps.hdop != 99]
+    seen = [i for i, cnt in enumerate(stats.count) if cnt > 0]
+    prn = [stats.prn[i] for i in seen]
+    return {
+        "sv_num": len(prn),
+        "cn": dict(zip(prn, stats.mean[seen])),
+        "cn_median": dict(zip(prn, stats.median[seen])),
+        "cn_pct": {stats.prn[i]: {p: stats.percentiles[p][i] for p in percentiles} for i in seen},
+        "cn_above": dict(zip(prn, stats.above[seen])) if stats.above is not None else {},
+        "top3": stats.top_mean(),
+        "top3_epoch": stats.top_epoch_mean(),
+        "hdop_mean": np.mean(hdop) if len(hdop) else np.nan,
+        "hdop_min": np.min(hdop) if len(hdop) else np.nan,
+        "hdop_max": np.max(hdop) if len(hdop) else np.nan,
+    }
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import math
+import random
+import datetime
+import functools
+import operator
+
+
+# 衛星系ごとの(GSVのtalker, 衛星番号のlist).
+# GSVは全衛星系をまとめて衛星番号で区別するため, 番号が重ならないようにする
+CONSTELLATION = {
+    "GPS": ("GP", list(range(1, 33))),
+    "QZSS": ("GP", list(range(193, 198))),
+    "GLONASS": ("GL", list(range(65, 97))),
+    "Galileo": ("GA", list(range(301, 337))),
+    "BeiDou": ("GB", list(range(401, 438))),
+}
+
+
+def _sentence(body, bad=False):
+    cs = functools.reduce(operator.xor, body.encode("latin-1"), 0)
+    return "${}*{:02X}\r\n".format(body, cs ^ 0xff if bad else cs)
+
+
+class _Satellite(object):
+    u""" 仰角, 方位角が時間とともに変化する衛星 """
+
+    def __init__(self, talker, no, rng):
+        self.talker = talker
+        self.no = no
+        self._rng = rng
+        self._el0 = rng.uniform(-30, 90)
+        self._az0 = rng.uniform(0, 360)
+        self._elrate = rng.uniform(-0.008, 0.008)    # deg/sec
+        self._azrate = rng.uniform(-0.01, 0.01)
+        self._cnoffset = rng.gauss(0, 3)
+
+    def position(self, t):
+        el = self._el0 + self._elrate * t
+        # 天頂を越えたら折り返す
+        if el > 90:
+            el = 180 - el
+        return el, (self._az0 + self._azrate * t) % 360
+
+    def cn(self, el):
+        u""" 仰角に応じたC/N. 低仰角では受信できないことがある (None) """
+        if el < 5 and self._rng.random() < 0.5:
+            return None
+        cn = 20 + 25 * math.sin(math.radians(max(el, 0))) + self._cnoffset + self._rng.gauss(0, 2)
+        return int(min(max(cn, 0), 50))
+
+
+class NMEASynth(object):
+    u""" 評価, ベンチマーク用の疑似NMEAデータを作成するクラス
+
+    同じseedからは同じデータを作成する.
+    1エポックはRMC, GGA, GSA(オプション), 衛星系ごとのGSVからなる
+
+    Args:
+        sats: 衛星系ごとの衛星数のdict (CONSTELLATIONのkey)
+        gsa: GSAを出力するか
+        badrate: チェックサムを誤らせるセンテンスの割合
+        seed: 乱数seed
+    """
+
+    def __init__(self, sats=None, gsa=True, badrate=0.0, seed=0):
+        self._rng = random.Random(seed)
+        sats = sats if sats is not None else {"GPS": 12, "QZSS": 2, "GLONASS": 8}
+        self._sats = list()
+        for name, num in sats.items():
+            talker, prns = CONSTELLATION[name]
+            for no in self._rng.sample(prns, min(num, len(prns))):
+                self._sats.append(_Satellite(talker, no, self._rng))
+        self._gsa = gsa
+        self._badrate = badrate
+
+    def _bad(self):
+        return self._badrate > 0 and self._rng.random() < self._badrate
+
+    def epoch(self, t, dt):
+        u""" 1エポック分のセンテンスを作成する
+
+        Args:
+            t: 開始からの経過秒数 (衛星位置の算出用)
+            dt: 時刻 (UTC datetime)
+
+        Returns:
+            センテンス文字列のlist
+        """
+        hms = dt.strftime("%H%M%S.00")
+        dmy = dt.strftime("%d%m%y")
+        visible = list()
+        for sv in self._sats:
+            el, az = sv.position(t)
+            if el >= 0:
+                visible.append((sv, int(el), int(az), sv.cn(el)))
+        used = sorted([v for v in visible if v[3] is not None and v[1] >= 10], key=lambda v: -v[3])[:12]
+        hdop = 99.99 if len(used) < 4 else round(0.6 + 8.0 / len(used) + self._rng.uniform(0, 0.3), 2)
+        fix = "A" if len(used) >= 4 else "V"
+
+        lines = [
+            _sentence("GPRMC,{},{},3540.40016,N,13921.78944,E,0.000,,{},,,A".format(hms, fix, dmy), self._bad()),
+            _sentence("GPGGA,{},3540.40016,N,13921.78944,E,{},{:02d},{},106.8,M,38.9,M,,".format(
+                hms, 1 if fix == "A" else 0, len(used), hdop), self._bad()),
+        ]
+        if self._gsa:
+            prns = ["{:02d}".format(v[0].no) for v in used] + [""] * (12 - len(used))
+            lines.append(_sentence("GPGSA,A,{},{},2.13,{},1.64".format(
+                3 if fix == "A" else 1, ",".join(prns), hdop), self._bad()))
+
+        for talker in sorted(set(sv.talker for sv in self._sats)):
+            svs = [v for v in visible if v[0].talker == talker]
+            total = max(1, (len(svs) + 3) // 4)
+            for i in range(total):
+                body = "{}GSV,{},{},{:02d}".format(talker, total, i+1, len(svs))
+                for sv, el, az, cn in svs[i*4:i*4+4]:
+                    body += ",{:02d},{:02d},{:03d},{}".format(sv.no, el, az, "" if cn is None else "{:02d}".format(cn))
+                lines.append(_sentence(body, self._bad()))
+        return lines
+
+    def write(self, path, tid, start, duration, offset=0):
+        u""" 1ファイル分のデータを書き込む
+
+        Args:
+            path: 出力ファイルパス
+            tid: trip id (先頭行のGTRIPに書き込む)
+            start: 先頭エポックの時刻 (UTC datetime)
+            duration: エポック数 (1秒1エポック)
+            offset: 衛星位置算出用のtrip開始からの経過秒数
+
+        Returns:
+            書き込んだbyte数
+        """
+        size = 0
+        with open(path, "w", encoding="latin-1", newline="") as f:
+            size += f.write("GTRIP,{}\r\n".format(tid))
+            for t in range(duration):
+                size += f.write("".join(self.epoch(offset + t, start + datetime.timedelta(seconds=t))))
+        return size
+
+
+def generate_sd(root, trips=2, files=2, duration=600, sats=None, gsa=True, badrate=0.0, seed=0,
+                start=datetime.datetime(2016, 12, 1, 5, 0, 0)):
+    u""" SDカードと同じディレクトリ構成(SYSTEM/NMEA/NORMAL)で疑似データを作成する
+
+    Args:
+        root: 出力先のsd root path
+        trips: trip数
+        files: 1tripあたりのファイル数
+        duration: 1ファイルあたりのエポック数
+        sats, gsa, badrate, seed: NMEASynthの引数 (seedはtripごとに+1する)
+        start: 最初のtripの開始時刻 (UTC). tripごとに1日ずつずらす
+
+    Returns:
+        (ファイルパスのlist, 総エポック数, 総byte数)
+    """
+    normal = os.path.join(root, "SYSTEM", "NMEA", "NORMAL")
+    os.makedirs(normal, exist_ok=True)
+
+    paths = list()
+    size = 0
+    for trip in range(trips):
+        synth = NMEASynth(sats, gsa, badrate, seed + trip)
+        tid = "{:04d}".format(1000 + trip)
+        begin = start + datetime.timedelta(days=trip)
+        for i in range(files):
+            path = os.path.join(normal, "{:04d}.NMEA".format(len(paths) + 1))
+            size += synth.write(path, tid, begin + datetime.timedelta(seconds=i*duration), duration, i*duration)
+            paths.append(path)
+
+    return paths, trips * files * duration, size
+
+
+if __name__ == '__main__':
+    print("WARN: this file is not entry point !!", file=sys.stderr)
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" NMEAログファイルを受信機の代わりにTCP/UDPで送信する (ネットワーク受信の動作確認用)
+
+usage: python replay.py [options] PATH [PATH ...]
+"""
+
+import sys
+import argparse
+import asyncio
+import logging
+import logging.config
+import nmea_net  # my module
+
+
+def create_argparser():
+    parser = argparse.ArgumentParser(description="replay NMEA log files over TCP/UDP")
+    parser.add_argument("path", nargs="+", help="NMEA file, SD card root directory or zip archive")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="listen address (TCP) or destination address (--connect, --udp) (default: 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, default=10110, help="port (default: 10110)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--connect", action="store_true",
+                      help="connect to HOST:PORT over TCP (e.g. network ingest tcp port) instead of serving TCP")
+    mode.add_argument("--udp", action="store_true", help="send to HOST:PORT over UDP instead of serving TCP")
+    parser.add_argument("-s", "--speed", type=float, default=1.0,
+                        help="playback speed (1: real time, 0: as fast as possible)")
+    parser.add_argument("-r", "--repeat", action="store_true", help="repeat from the beginning")
+    return parser
+
+
+def main(argv=None):
+    args = create_argparser().parse_args(argv)
+    try:
+        logging.config.fileConfig('./logging.cfg', disable_existing_loggers=False)
+    except Exception as e:
+        logging.error(e)
+
+    files = nmea_net.replay_files(args.path)
+    server = nmea_net.ReplayServer(files, args.speed, args.repeat)
+    if args.udp:
+        job = server.send_udp(args.host, args.port)
+    elif args.connect:
+        job = server.send_tcp(args.host, args.port)
+    else:
+        print("listen: {}:{}".format(args.host, args.port), file=sys.stderr)
+        job = server.serve_tcp(args.host, args.port)
+
+    try:
+        asyncio.run(job)
+    except KeyboardInterrupt:
+        pass
+    except ConnectionError as e:
+        print("error: {}".format(e), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" ParseCacheの保存, 無効化, 削除と, parse_filesでのキャッシュの使用を確認する """
+
+import os
+import shutil
+import tempfile
+import unittest
+import nmea_parse  # my module
+import nmea_cache  # my module
+import nmea_synth  # my module
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.root, "cache")
+        self.files = nmea_synth.generate_sd(os.path.join(self.root, "sd"), trips=1, files=3, duration=60)[0]
+        self.cache = nmea_cache.ParseCache(self.cachedir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_round_trip(self):
+        parsed = nmea_parse.NMEAParser().parse(self.files[0])
+        self.assertFalse(self.cache.contains(self.files[0]))
+        self.assertIsNone(self.cache.get(self.files[0]))
+        self.cache.put(self.files[0], parsed)
+        self.assertTrue(self.cache.contains(self.files[0]))
+        self.assertEqual(self.cache.get(self.files[0]), parsed)
+        self.assertIsNone(self.cache.get(self.files[0], "store"))
+        self.assertIsNone(self.cache.get(self.files[1]))
+
+    def test_invalidate(self):
+        file = self.files[0]
+        self.cache.put(file, [])
+        st = os.stat(file)
+        os.utime(file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # mtimeの変更
+        self.assertFalse(self.cache.contains(file))
+        self.cache.put(file, [])
+        with open(file, "ab") as f:     # サイズの変更
+            f.write(b"\r\n")
+        os.utime(file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertFalse(self.cache.contains(file))
+
+    def test_discard_clear(self):
+        for f in self.files:
+            self.cache.put(f, [])
+        self.cache.put(self.files[0], [], "store")
+        self.cache.discard(self.files[0])
+        self.assertFalse(self.cache.contains(self.files[0]))
+        self.assertFalse(self.cache.contains(self.files[0], "store"))
+        self.assertTrue(self.cache.contains(self.files[1]))
+        self.cache.clear()
+        self.assertFalse(any(self.cache.contains(f) for f in self.files))
+
+    def test_evict(self):
+        parsed = nmea_parse.NMEAParser().parse(self.files[0])
+        self.cache.put(self.files[0], parsed)
+        size = os.path.getsize(os.path.join(self.cachedir, os.listdir(self.cachedir)[0]))
+        cache = nmea_cache.ParseCache(self.cachedir, maxsize=size * 2.5)
+        for f in self.files:
+            cache.put(f, parsed)
+        # 最後に使用した日時が古いものから削除する
+        self.assertFalse(cache.contains(self.files[0]))
+        self.assertTrue(cache.contains(self.files[1]))
+        self.assertTrue(cache.contains(self.files[2]))
+
+    def test_parse_files(self):
+        first = nmea_parse.NMEAParser()
+        expected = list(first.parse_files(self.files, 1, cache=self.cache))
+        self.assertEqual(first.counters["cache_hit"], 0)
+
+        parser = nmea_parse.NMEAParser()
+        self.assertEqual(list(parser.parse_files(self.files, 1, cache=self.cache)), expected)
+        self.assertEqual(parser.counters["cache_hit"], len(self.files))
+        # キャッシュから読み込んだ場合もパースした場合と同じ件数を数える
+        for key in ["files", "bytes", "epochs"]:
+            self.assertEqual(parser.counters[key], first.counters[key], key)
+
+    def test_pynmea2_bypass(self):
+        parser = nmea_parse.NMEAParser(fastpath=False)
+        list(parser.parse_files(self.files, 1, cache=self.cache))
+        self.assertFalse(any(self.cache.contains(f) for f in self.files))
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_lru(self):
+        cache = nmea_cache.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        cache.discard("a")
+        self.assertEqual(cache.get("a", 0), 0)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
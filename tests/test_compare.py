@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" nmea_compare.merge_joinが一致するkeyの位置を全て求めるか, compareの対応付けを確認する """
+
+import unittest
+import numpy as np
+import nmea_data     # my module
+import nmea_compare  # my module
+
+F = nmea_data.FILL
+
+
+class MergeJoinTest(unittest.TestCase):
+
+    def _check(self, a, b):
+        ia, ib = nmea_compare.merge_join(a, b)
+        pos = {k: i for i, k in enumerate(b)}
+        expected = [(i, pos[k]) for i, k in enumerate(a) if k in pos]
+        self.assertEqual(list(zip(ia.tolist(), ib.tolist())), expected)
+
+    def test_random(self):
+        rng = np.random.RandomState(0)
+        for i in range(200):
+            a = np.unique(rng.randint(0, 300, rng.randint(0, 200)))
+            b = np.unique(rng.randint(0, 300, rng.randint(0, 200)))
+            self._check(a, b)
+
+    def test_edge(self):
+        empty = np.zeros(0, dtype=np.int64)
+        self._check(empty, empty)
+        self._check(np.arange(5), empty)
+        self._check(np.arange(5), np.arange(5))
+        self._check(np.arange(0, 10, 2), np.arange(1, 10, 2))
+        self._check(np.arange(10), np.arange(100, 110))
+
+
+def _gpsdata(time, prn, sn):
+    sn = np.asarray(sn, dtype=np.int16)
+    other = np.where(sn == F, F, 30).astype(np.int16)
+    return nmea_data.GPSData(np.asarray(time, dtype=np.float64), np.ones(len(time), dtype=np.float32),
+                             prn, sn, other, other)
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_compare(self):
+        # Bは0.2秒ずれ, 時刻なしのエポックと順序が前後したエポックを含む
+        gps_a = _gpsdata([0, 1, 2, 3, 4], ["1", "2", "3", "4"],
+                         [[40, 30, 20, 10], [41, 31, F, 11], [42, 32, 22, 12], [43, 33, 23, 13], [44, 34, 24, 14]])
+        gps_b = _gpsdata([1.2, np.nan, 3.2, 2.2, 9.2], ["2", "4", "1", "5"],
+                         [[30, 12, 40, 50], [0, 0, 0, 0], [30, F, 40, 50], [30, 10, 41, 50], [1, 1, 1, 1]])
+        cmp = nmea_compare.compare(gps_a, gps_b)
+        np.testing.assert_array_equal(cmp.time, [1, 2, 3])
+        self.assertEqual(cmp.prn, ["1", "2", "4"])
+        self.assertEqual((cmp.only_a, cmp.only_b), (2, 2))
+        np.testing.assert_array_equal(cmp.delta, [[1, 1, -1], [1, 2, 2], [3, 3, np.nan]])
+        np.testing.assert_array_equal(cmp.count(), [3, 3, 2])
+        np.testing.assert_array_equal(cmp.mean_delta(), [5 / 3, 2, 0.5])
+        # 上位平均は各受信機の全衛星から算出する
+        np.testing.assert_array_almost_equal(cmp.top_a, [(41 + 31 + 11) / 3, 32, 33])
+        np.testing.assert_array_almost_equal(cmp.top_b, [(50 + 40 + 30) / 3, (50 + 41 + 30) / 3, 40])
+        self.assertEqual(cmp.summary()["epochs"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" EpochStoreで作成したGPSDataと, check_thrの閾値, 時間幅での絞り込みを確認する """
+
+import datetime
+import unittest
+import numpy as np
+import nmea_data   # my module
+from nmea_parse import RMC
+
+
+START = datetime.datetime(2016, 12, 1, 5, 0, 0)
+
+
+def _epoch(sec, svs, used=None, hdop="1.2"):
+    u""" svs: (衛星番号, 仰角, 方位角, C/N)のlist. usedを指定した場合はGSAを追加する """
+    t = START + datetime.timedelta(seconds=sec)
+    gps = {
+        "RMC": RMC(t.time(), "A", t.date()),
+        "GGA": {"hdop": hdop},
+        "GSV": {"num_sv_in_view": str(len(svs)),
+                "sv": [{"no": no, "el": el, "az": az, "sn": sn} for no, el, az, sn in svs]},
+    }
+    if used is not None:
+        gps["GSA"] = {"mode": "A", "fixtype": "3", "pdop": "", "hdop": hdop, "vdop": "", "sv": used}
+    return gps
+
+
+EPOCHS = [
+    _epoch(0, [("10", "40", "100", "40"), ("2", "10", "200", "20")], ["10"]),
+    _epoch(1, [("10", "41", "101", "42"), ("2", "11", "201", ""), ("193", "80", "10", "35")], ["10", "193"]),
+    _epoch(2, [("10", "42", "102", "44")], hdop=""),
+    _epoch(3, [("2", "", "", "30"), ("193", "81", "11", "37")], ["193"]),
+]
+
+
+class EpochStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = nmea_data.EpochStore()
+        self.store.extend(EPOCHS)
+
+    def test_gsv(self):
+        gsv = self.store.gsv()
+        self.assertEqual(gsv.prn, ["2", "10", "193"])
+        np.testing.assert_array_equal(gsv.time - gsv.time[0], [0, 1, 2, 3])
+        np.testing.assert_array_equal(gsv.hdop, np.array([1.2, 1.2, 99, 1.2], dtype=np.float32))
+        F = nmea_data.FILL
+        np.testing.assert_array_equal(gsv.sn, [[20, 40, F], [0, 42, 35], [F, 44, F], [30, F, 37]])
+        np.testing.assert_array_equal(gsv.el[3], [-1, F, 81])
+        np.testing.assert_array_equal(gsv.mean("sn"), [50 / 3, 42, 36])
+
+    def test_gsa(self):
+        gsa = self.store.gsa()
+        self.assertEqual(gsa.prn, ["10", "193"])
+        self.assertEqual(len(gsa), 3)   # GSAのないエポックは除く
+        np.testing.assert_array_equal(gsa.time - gsa.time[0], [0, 1, 3])
+
+    def test_grow(self):
+        store = nmea_data.EpochStore()
+        svs = [(str(no), "30", "0", str(no)) for no in range(1, 41)]
+        store.extend(_epoch(sec, svs) for sec in range(100))
+        gsv = store.gsv()
+        self.assertEqual(gsv.sn.shape, (100, 40))
+        np.testing.assert_array_equal(gsv.mean("sn"), np.arange(1, 41))
+
+    def test_create_gpsdata(self):
+        gsv, gsa = nmea_data.create_gpsdata(EPOCHS)
+        np.testing.assert_array_equal(gsv.sn, self.store.gsv().sn)
+        self.assertEqual(gsa.prn, self.store.gsa().prn)
+
+
+class CheckThrTest(unittest.TestCase):
+
+    def setUp(self):
+        store = nmea_data.EpochStore()
+        store.extend(EPOCHS)
+        self.gsv = store.gsv()
+
+    def test_sn(self):
+        gps = nmea_data.check_thr(self.gsv, {"sn": 30, "el": 0}, {"gsamode": False}, (None, None), 0)
+        self.assertEqual(gps.prn, ["10", "193"])
+        self.assertEqual(len(gps), 4)
+        self.assertEqual(self.gsv.prn, ["2", "10", "193"])    # 元のGPSDataは変更しない
+
+    def test_el(self):
+        thr = {"sn": 0, "el": 45}
+        self.assertEqual(nmea_data.check_thr(self.gsv, thr, {"gsamode": True}, (None, None), 0).prn, ["193"])
+        # 仰角の閾値はgsamodeの場合のみ適用する
+        self.assertEqual(len(nmea_data.check_thr(self.gsv, thr, {"gsamode": False}, (None, None), 0).prn), 3)
+
+    def test_timewidth(self):
+        tdiff = 9 * 3600
+        local = START + datetime.timedelta(seconds=tdiff)
+        timewidth = (local + datetime.timedelta(seconds=1), local + datetime.timedelta(seconds=2))
+        gps = nmea_data.check_thr(self.gsv, {"sn": 0, "el": 0}, {"gsamode": False}, timewidth, tdiff)
+        np.testing.assert_array_equal(gps.time - self.gsv.time[0], [1, 2])
+        # 時間幅のみの場合は配列をコピーしない
+        self.assertTrue(np.shares_memory(gps.sn, self.gsv.sn))
+
+    def test_window(self):
+        t0 = self.gsv.time[0]
+        self.assertEqual(self.gsv.window(t0 + 0.5, t0 + 3), slice(1, 4))
+        self.assertEqual(self.gsv.window(t0 + 10), slice(4, 4))
+        self.assertEqual(self.gsv.window(), slice(0, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" export_tripsが画面に表示せずにtripごとのグラフをファイルに出力するかを確認する """
+
+import os
+import shutil
+import tempfile
+import unittest
+import nmea_parse   # my module
+import nmea_export  # my module
+import nmea_synth   # my module
+
+_MAGIC = {"png": b"\x89PNG", "svg": b"<?xml", "pdf": b"%PDF"}
+
+
+class ExportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        sd = os.path.join(cls.root, "sd")
+        nmea_synth.generate_sd(sd, trips=2, files=1, duration=60)
+        filetotal, tids = nmea_parse.NMEAParser().concat_trip(sd)
+        cls.trips = sorted(tids.items())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def _check(self, path, fmt):
+        self.assertTrue(os.path.getsize(path) > 0)
+        with open(path, "rb") as f:
+            self.assertTrue(f.read(5).startswith(_MAGIC[fmt]), path)
+
+    def test_formats(self):
+        for fmt in nmea_export.FORMATS:
+            outdir = os.path.join(self.root, fmt)
+            result = list(nmea_export.export_trips(self.trips, outdir, fmt, workers=2, figsize=(6, 4), dpi=50,
+                                                   cache=False))
+            self.assertEqual([tid for tid, path in result], ["1000", "1001"])
+            self.assertEqual(os.path.basename(result[0][1]), "1000_0001.{}".format(fmt))
+            for tid, path in result:
+                self._check(path, fmt)
+
+    def test_multipage(self):
+        out = os.path.join(self.root, "multi", "graphs.pdf")
+        result = list(nmea_export.export_trips(self.trips, out, multipage=True, workers=1, figsize=(6, 4),
+                                               cache=False))
+        self.assertEqual(result, [("1000", out), ("1001", out)])
+        self._check(out, "pdf")
+        with open(out, "rb") as f:
+            self.assertIn(b"/Count 2", f.read())   # 2ページ
+
+    def test_parsed(self):
+        u""" パース済みのデータ(GUIで表示中のtrip)も出力できる """
+        gps = nmea_parse.NMEAParser().parse(self.trips[0][1][0])
+        outdir = os.path.join(self.root, "parsed")
+        result = list(nmea_export.export_trips([("1000", gps)], outdir, "png", workers=1, figsize=(6, 4),
+                                               dpi=50))
+        self.assertEqual(result, [("1000", os.path.join(outdir, "1000.png"))])
+        self._check(result[0][1], "png")
+
+
+if __name__ == '__main__':
+    unittest.main()
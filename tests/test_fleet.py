@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" 複数SDカードの集計(nmea_fleet)が1枚ずつ集計した結果と一致するかを確認する """
+
+import io
+import os
+import csv
+import shutil
+import zipfile
+import tempfile
+import unittest
+import numpy as np
+import nmea_parse  # my module
+import nmea_data   # my module
+import nmea_stats  # my module
+import nmea_fleet  # my module
+import nmea_synth  # my module
+
+THR = {"sn": 20, "el": 0}
+SHOW = {"gsamode": True}
+
+
+class FleetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        for i, name in enumerate(["rx1", "rx2"]):
+            nmea_synth.generate_sd(os.path.join(cls.root, name), trips=2, files=1, duration=60, seed=i)
+        # SDカードをそのまま圧縮したzipファイル
+        src = os.path.join(cls.root, "rx1")
+        with zipfile.ZipFile(os.path.join(cls.root, "rx3.zip"), "w") as zf:
+            for d, dirs, files in os.walk(src):
+                for f in files:
+                    zf.write(os.path.join(d, f), os.path.relpath(os.path.join(d, f), src))
+        os.makedirs(os.path.join(cls.root, "other", "bad", "SYSTEM"))   # NORMALディレクトリがない
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def test_find_roots(self):
+        roots = nmea_fleet.find_roots(self.root)
+        self.assertEqual([os.path.basename(r) for r in roots], ["rx1", "rx2", "rx3.zip"])
+        other = os.path.join(self.root, "other")
+        self.assertEqual(nmea_fleet.find_roots(other), [os.path.join(other, "bad")])
+        rx1 = os.path.join(self.root, "rx1")
+        self.assertEqual(nmea_fleet.find_roots(rx1), [rx1])
+
+    def test_device_names(self):
+        self.assertEqual(nmea_fleet.device_names(["/a/rx1", "/b/rx1", "/c/rx2.zip", "/d/rx1/"]),
+                         ["rx1", "rx1#2", "rx2", "rx1#4"])
+
+    def test_analyze(self):
+        roots = nmea_fleet.find_roots(self.root) + nmea_fleet.find_roots(os.path.join(self.root, "other"))
+        results = list(nmea_fleet.analyze_fleet(roots, THR, SHOW, workers=2, cache=False))
+        self.assertEqual([r["device"] for r in results], ["rx1", "rx2", "rx3", "bad"])
+        self.assertEqual(sorted(results[3]), ["device", "error", "root"])
+
+        # 1枚ずつ集計した結果と一致する
+        nmea = nmea_parse.NMEAParser()
+        filetotal, tids = nmea.concat_trip(roots[1])
+        store = nmea_data.EpochStore()
+        store.extend(gps for tid, fs in sorted(tids.items(), key=lambda x: x[1][0])
+                     for f in fs for gps in nmea.parse(f))
+        gps = nmea_data.check_thr(store.gsa(), THR, SHOW, (None, None), 0)
+        expected = nmea_stats.summarize(gps, THR["sn"])
+        r = results[1]
+        self.assertEqual((r["trips"], r["files"], r["epochs"], r["gsamode"]), (2, 2, 120, True))
+        self.assertEqual(r["cn"], expected["cn"])
+        self.assertEqual(r["top3"], expected["top3"])
+        self.assertEqual(r["start"], gps.time[0])
+        self.assertEqual(r["counters"]["files"], 2)
+
+        # zipファイルは元のディレクトリと同じ結果となる
+        for k in ["epochs", "cn", "top3", "top3_epoch", "hdop_mean"]:
+            self.assertEqual(results[2][k], results[0][k], k)
+
+    def test_write_csv(self):
+        results = [
+            {"device": "a", "root": "/a", "trips": 1, "files": 2, "epochs": 3, "gsamode": True,
+             "start": 0.0, "end": np.nan, "sv_num": 2, "top3": 40.123, "top3_epoch": np.nan,
+             "hdop_mean": 1.0, "hdop_min": 1.0, "hdop_max": 1.0,
+             "cn": {"10": 40.0, "2": 35.25}, "cn_above": {"10": 1.0, "2": 0.5}},
+            {"device": "b", "root": "/b", "error": "not found"},
+        ]
+        out = io.StringIO()
+        nmea_fleet.write_csv(results, out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0][-5:], ["cn_2", "cn_10", "above_2", "above_10", "error"])
+        self.assertEqual(rows[1][6:10], ["1970-01-01 00:00:00", "", "2", "40.12"])
+        self.assertEqual(rows[1][-5:], ["35.25", "40.0", "0.5", "1.0", ""])
+        self.assertEqual(len(rows[2]), len(rows[0]))
+        self.assertEqual(rows[2][:2] + rows[2][-1:], ["b", "/b", "not found"])
+
+
+if __name__ == '__main__':
+    unittest.main()
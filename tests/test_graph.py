@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" minmax_decimateが区間ごとの最小値, 最大値を残すか, NMEAGraphのフォローモードでの追記を確認する """
+
+import datetime
+import unittest
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import nmea_graph  # my module
+import nmea_synth  # my module
+import nmea_parse  # my module
+from nmea_cache import LRUCache
+
+
+def _expected(y, width):
+    u""" 区間ごとに1つずつ最小値, 最大値(全てnanの区間はnan)を求める """
+    low, high = list(), list()
+    for i in range(0, len(y), width):
+        block = y[i:i+width]
+        valid = block[~np.isnan(block)]
+        low.append(valid.min() if len(valid) else np.nan)
+        high.append(valid.max() if len(valid) else np.nan)
+    return np.array(low), np.array(high)
+
+
+def _epochs(start, num):
+    synth = nmea_synth.NMEASynth(seed=3)
+    base = datetime.datetime(2016, 12, 1, 5, 0, 0)
+    data = "".join(line for t in range(start, start + num)
+                   for line in synth.epoch(t, base + datetime.timedelta(seconds=t)))
+    builder = nmea_parse.EpochBuilder(nmea_parse.NMEAParser())
+    data = data.encode("latin-1")
+    return builder.feed_bytes(data) + [builder.flush()]
+
+
+class MinMaxDecimateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.y = rng.randint(10, 50, size=(1000, 3)).astype(np.float64)
+        self.y[rng.rand(1000, 3) < 0.2] = np.nan
+        self.y[300:400, 1] = np.nan     # 衛星が存在しない期間
+
+    def test_not_decimated(self):
+        x, v = nmea_graph.minmax_decimate(self.y[:40], 20)
+        np.testing.assert_array_equal(x[:, 0], np.arange(40))
+        np.testing.assert_array_equal(v, self.y[:40])
+
+    def test_minmax(self):
+        bins = 50
+        x, v = nmea_graph.minmax_decimate(self.y, bins)
+        width = -(-len(self.y) // bins)
+        self.assertEqual(x.shape, (2 * bins, 3))
+        for col in range(3):
+            self.assertTrue((np.diff(x[:, col]) >= 0).all())
+            np.testing.assert_array_equal(v[:, col], self.y[x[:, col], col])
+            low, high = _expected(self.y[:, col], width)
+            pair = v[:, col].reshape(-1, 2)
+            np.testing.assert_array_equal(np.fmin(pair[:, 0], pair[:, 1]), low)
+            np.testing.assert_array_equal(np.fmax(pair[:, 0], pair[:, 1]), high)
+        self.assertTrue(np.isnan(v[(x[:, 1] >= 300) & (x[:, 1] < 400), 1]).all())
+
+    def test_range(self):
+        x, v = nmea_graph.minmax_decimate(self.y[:, 0], 10, 200, 500)
+        self.assertEqual(x.ndim, 1)
+        self.assertTrue(((x >= 200) & (x < 500)).all())
+        np.testing.assert_array_equal(v, self.y[x, 0])
+        low, high = _expected(self.y[200:500, 0], 30)
+        np.testing.assert_array_equal(np.fmin(v[0::2], v[1::2]), low)
+
+
+class DecimatedLinesTest(unittest.TestCase):
+
+    def test_update(self):
+        y = np.arange(10000, dtype=np.float64)[:, np.newaxis]
+        fig = Figure(figsize=(4, 3), dpi=50)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        lines = nmea_graph.DecimatedLines(ax, y, ["a"])
+        lines.connect()
+        self.assertLess(len(lines._lines[0].get_xdata()), 1000)
+        # 拡大すると範囲内のデータのみ元の解像度に近づけて間引き直す
+        ax.set_xlim(5000, 5100)
+        x = lines._lines[0].get_xdata()
+        np.testing.assert_array_equal(x, np.arange(5000, 5101))
+
+
+class NMEAGraphTest(unittest.TestCase):
+
+    THR = {"sn": 1, "el": 0}
+    SHOW = {"gsamode": True}
+
+    def test_append(self):
+        gpsinput = _epochs(0, 20)
+        graph = nmea_graph.NMEAGraph("1000", gpsinput, 0, LRUCache())
+        gps, gsamode = graph.prepare(self.THR, self.SHOW, (None, None))
+        self.assertEqual(len(gps), 20)
+
+        # 呼び出し元が共有するlistに追加してからappendする. appendは渡したlistを変更しない
+        new = _epochs(20, 10)
+        gpsinput += new
+        graph.append(new)
+        self.assertEqual(len(new), 10)
+        self.assertEqual(len(gpsinput), 30)
+        gps, gsamode = graph.prepare(self.THR, self.SHOW, (None, None))
+        self.assertEqual(len(gps), 30)
+
+        # 作成済みのデータがない場合も共有するlistから作成する
+        fresh = nmea_graph.NMEAGraph("1000", gpsinput, 0, LRUCache())
+        self.assertEqual(fresh.prepare(self.THR, self.SHOW, (None, None))[0].time.tolist(), gps.time.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
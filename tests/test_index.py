@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" TripIndexの差分更新と, indexを使ったconcat_tripの結果を確認する """
+
+import os
+import shutil
+import tempfile
+import zipfile
+import unittest
+import nmea_parse  # my module
+import nmea_index  # my module
+import nmea_synth  # my module
+
+
+class TripIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.sd = os.path.join(self.root, "sd")
+        self.files, epochs, size = nmea_synth.generate_sd(self.sd, trips=2, files=2, duration=60)
+        self.index = nmea_index.TripIndex(os.path.join(self.root, "index.sqlite3"))
+        self.nmea = nmea_parse.NMEAParser()
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.root)
+
+    def _scan(self):
+        root, files = self.nmea.list_files(self.sd)
+        return root, self.index.scan(files, root)
+
+    def test_concat_trip(self):
+        expected = self.nmea.concat_trip(self.sd)
+        self.assertEqual(self.nmea.concat_trip(self.sd, self.index), expected)
+        self.assertEqual(self.nmea.concat_trip(self.sd, self.index), expected)  # 2回目はindexのみ
+
+    def test_scan(self):
+        root, rows = self._scan()
+        self.assertEqual([r[0] for r in rows], self.files)
+        self.assertEqual([r[1] for r in rows], ["1000", "1000", "1001", "1001"])
+        first = [r[2] for r in rows]
+        self.assertTrue(all(t is not None for t in first))
+        self.assertEqual([r[4] for r in rows], [None] * 4)
+
+        # 変更のないファイルは開かない
+        self.index._peek = None
+        self.assertEqual(self._scan()[1], rows)
+
+    def test_update_parsed(self):
+        root, rows = self._scan()
+        parsed = [(f, self.nmea.parse(f)) for f in self.files]
+        self.index.update_parsed(parsed)
+        trips = self.index.trips(root)
+        self.assertEqual(sorted(trips), ["1000", "1001"])
+        self.assertEqual(trips["1000"][0], self.files[:2])
+        self.assertEqual(trips["1000"][3], 120)
+        self.assertEqual(trips["1001"][2] - trips["1001"][1], 119)
+
+        # 登録済みのファイルは更新しない
+        self.index.update_parsed([(self.files[0], parsed[0][1][:10])])
+        self.assertEqual(self.index.trips(root)["1000"][3], 120)
+
+        # 更新されたファイルはエポック数を登録し直す
+        with open(self.files[0], "ab") as f:
+            f.write(b"\r\n")
+        self._scan()
+        self.assertIsNone(self.index.trips(root)["1000"][3])
+        self.index.update_parsed([(self.files[0], parsed[0][1][:10])])
+        self.assertEqual(self.index.trips(root)["1000"][3], 70)
+
+    def test_time_range(self):
+        root, rows = self._scan()
+        first, last = rows[2][2], rows[3][3]
+        trips = self.index.trips(root, first, last)
+        self.assertEqual(list(trips), ["1001"])
+        total, tids = self.nmea.concat_trip(self.sd, self.index, first, last)
+        self.assertEqual((total, tids), (2, {"1001": self.files[2:]}))
+
+    def test_removed(self):
+        root, rows = self._scan()
+        os.remove(self.files[3])
+        self._scan()
+        self.assertEqual(self.index.trips(root)["1001"][0], self.files[2:3])
+
+    def test_zip(self):
+        archive = os.path.join(self.root, "card.zip")
+        with zipfile.ZipFile(archive, "w") as zf:
+            for f in self.files:
+                zf.write(f, os.path.relpath(f, self.sd))
+        root, entries = self.nmea.list_files(archive)
+        self.assertEqual(len(entries), 4)
+        total, tids = self.nmea.concat_trip(archive, self.index)
+        self.assertEqual(sorted(tids), ["1000", "1001"])
+        self.assertEqual(tids, self.nmea.concat_trip(archive)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
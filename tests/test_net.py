@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" NMEAIngestでTCP/UDPから受信したエポックが, ファイルをparse()した結果と一致するかを確認する """
+
+import asyncio
+import socket
+import shutil
+import tempfile
+import unittest
+import nmea_parse  # my module
+import nmea_net    # my module
+import nmea_synth  # my module
+
+HOST = "127.0.0.1"
+TIMEOUT = 10
+
+
+def _free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+async def _wait_epochs(ingest, result, num):
+    u""" num個のエポックを受信するまでpoll()する """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUT
+    while sum(len(t["gps"]) for t in result.values()) < num and loop.time() < deadline:
+        _collect(result, ingest.poll())
+        await asyncio.sleep(0.01)
+
+
+def _collect(result, new):
+    for rid, trip in new.items():
+        result.setdefault(rid, {"fname": trip["fname"], "gps": []})["gps"] += trip["gps"]
+
+
+class NMEAIngestTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.files = nmea_synth.generate_sd(cls.root, trips=1, files=1, duration=30)[0]
+        cls.expected = nmea_parse.NMEAParser().parse(cls.files[0])
+        with open(cls.files[0], "rb") as f:
+            cls.data = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def _run(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, TIMEOUT))
+
+    def test_listen_tcp(self):
+        port = _free_port()
+
+        async def run():
+            ingest = nmea_net.NMEAIngest()
+            await ingest.start(HOST, tcp=[port])
+            await nmea_net.ReplayServer(self.files, speed=0).send_tcp(HOST, port)
+            result = dict()
+            await _wait_epochs(ingest, result, len(self.expected))
+            await ingest.close()
+            _collect(result, ingest.flush())
+            return result
+
+        result = self._run(run())
+        self.assertEqual(len(result), 1)
+        trip = list(result.values())[0]
+        self.assertEqual(trip["fname"], ["tcp-{}".format(port)])
+        self.assertEqual(trip["gps"], self.expected)
+
+    def test_connect(self):
+        port = _free_port()
+
+        async def run():
+            server = asyncio.ensure_future(nmea_net.ReplayServer(self.files, speed=0).serve_tcp(HOST, port))
+            await asyncio.sleep(0.1)
+            ingest = nmea_net.NMEAIngest()
+            await ingest.connect(HOST, port)
+            result = dict()
+            await _wait_epochs(ingest, result, len(self.expected))
+            await ingest.close()
+            _collect(result, ingest.flush())
+            server.cancel()
+            return result
+
+        trip = list(self._run(run()).values())[0]
+        self.assertEqual(trip["gps"], self.expected)
+
+    def test_udp(self):
+        port = _free_port(socket.SOCK_DGRAM)
+
+        async def run():
+            ingest = nmea_net.NMEAIngest()
+            await ingest.start(HOST, udp=[port])
+            await nmea_net.ReplayServer(self.files, speed=0).send_udp(HOST, port)
+            result = dict()
+            await _wait_epochs(ingest, result, len(self.expected) - 1)
+            await ingest.close()
+            _collect(result, ingest.flush())
+            return result
+
+        trip = list(self._run(run()).values())[0]
+        self.assertEqual(trip["fname"], ["udp-{}".format(port)])
+        self.assertEqual(trip["gps"], self.expected)
+
+    def test_disconnect(self):
+        u""" 切断時は末尾の改行されていない行を破棄し, それまでのエポックを確定する """
+        port = _free_port()
+        end = self.data.rfind(b"$GPRMC")
+        cut = self.data.index(b"\n", self.data.index(b"$GPGSV", end)) - 10  # 最後のエポックのGSVの途中
+
+        async def run():
+            ingest = nmea_net.NMEAIngest()
+            await ingest.start(HOST, tcp=[port])
+            reader, writer = await asyncio.open_connection(HOST, port)
+            writer.write(self.data[:cut])
+            await writer.drain()
+            writer.close()
+            result = dict()
+            await _wait_epochs(ingest, result, len(self.expected))    # 最後のエポックは切断時に確定する
+            await ingest.close()
+            return result, ingest
+
+        result, ingest = self._run(run())
+        gps = list(result.values())[0]["gps"]
+        parser = nmea_parse.NMEAParser()
+        builder = nmea_parse.EpochBuilder(parser)
+        data = self.data[:cut]
+        expected = builder.feed_bytes(data, data.rfind(b"\n") + 1) + [builder.flush()]
+        self.assertEqual(gps, expected)
+        self.assertEqual(len(gps), len(self.expected))
+        self.assertEqual(ingest.flush(), {})
+
+    def test_parse_error(self):
+        port = _free_port()
+        # pynmea2でもパースできない行を2エポック目のRMCの前に挿入する
+        second = self.data.index(b"$GPRMC", self.data.index(b"$GPRMC") + 1)
+        data = self.data[:second] + b"$GPGGA,1,2*GG\r\n" + self.data[second:]
+
+        async def run():
+            ingest = nmea_net.NMEAIngest()
+            await ingest.start(HOST, tcp=[port])
+            reader, writer = await asyncio.open_connection(HOST, port)
+            writer.write(data)
+            await writer.drain()
+            writer.close()
+            result = dict()
+            await _wait_epochs(ingest, result, len(self.expected))
+            await ingest.close()
+            return result, ingest
+
+        result, ingest = self._run(run())
+        self.assertEqual(list(result.values())[0]["gps"], self.expected)
+        self.assertGreater(ingest._parser.counters["parse_error"], 0)
+
+    def test_close_with_client(self):
+        u""" 接続中のクライアントがあってもclose()が終了する """
+        port = _free_port()
+
+        async def run():
+            ingest = nmea_net.NMEAIngest()
+            await ingest.start(HOST, tcp=[port])
+            reader, writer = await asyncio.open_connection(HOST, port)
+            writer.write(self.data[:2000])
+            await writer.drain()
+            await asyncio.sleep(0.1)
+            await asyncio.wait_for(ingest.close(), 5)
+            closed = await reader.read()     # サーバー側から切断される
+            writer.close()
+            return closed, ingest
+
+        closed, ingest = self._run(run())
+        self.assertEqual(closed, b"")
+        self.assertEqual(ingest._transports, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" nmea_parseの高速パス(チェックサム, 独自tokenizer)がpynmea2と同じ結果になるかを確認する """
+
+import os
+import datetime
+import functools
+import gzip
+import operator
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import nmea_parse  # my module
+import nmea_synth  # my module
+import nmea_data   # my module
+import nmea_cache  # my module
+
+
+class ChecksumTest(unittest.TestCase):
+
+    def test_sample(self):
+        body = b"GPRMC,053439.00,A,3540.40016,N,13921.78944,E,0.000,,011216,,,A"
+        self.assertEqual(nmea_parse._checksum(body), 0x72)
+
+    def test_random(self):
+        rng = random.Random(0)
+        for n in list(range(0, 70)) + [rng.randrange(70, 300) for i in range(50)]:
+            data = bytes(rng.randrange(256) for i in range(n))
+            self.assertEqual(nmea_parse._checksum(data), functools.reduce(operator.xor, data, 0), n)
+
+
+class TokenizerTest(unittest.TestCase):
+
+    def _sentences(self):
+        synth = nmea_synth.NMEASynth(seed=1)
+        start = datetime.datetime(2016, 12, 1, 5, 0, 0)
+        for t in range(0, 3600, 60):
+            for line in synth.epoch(t, start + datetime.timedelta(seconds=t)):
+                yield line.rstrip("\r\n")
+        yield "$GPGSA,A,3,13,20,15,05,193,30,02,28,,,,,2.13,1.36,1.64*34"
+        yield "$GPGSV,3,3,12,28,11,080,24,29,08,247,,30,20,043,26,193,86,159,18*4F"
+
+    def test_same_as_pynmea2(self):
+        parser = nmea_parse.NMEAParser()
+        num = 0
+        for line in self._sentences():
+            toker = line[3:6]
+            fast = parser._tokenize(line, toker)
+            self.assertIsNotNone(fast, line)
+            self.assertEqual(fast, parser._parse_nmea(line), line)
+            num += 1
+        self.assertGreater(num, 100)
+
+    def test_invalid(self):
+        parser = nmea_parse.NMEAParser()
+        line = "$GPRMC,053439.00,A,3540.40016,N,13921.78944,E,0.000,,011216,,,A*72"
+        self.assertIsNotNone(parser._tokenize(line, "RMC"))
+        self.assertIsNone(parser._tokenize(line[:-1] + "3", "RMC"))     # チェックサム不一致
+        self.assertIsNone(parser._tokenize(line[:-3], "RMC"))           # チェックサムなし
+        self.assertIsNone(parser._tokenize(line[:-3][:30] + "*00", "RMC"))
+
+    def test_fallback_rmc(self):
+        u""" pynmea2で変換できない日時はNoneとする (高速パスではパースできない行) """
+        parser = nmea_parse.NMEAParser()
+        line = "$GPRMC,05x439.00,A,3540.40016,N,13921.78944,E,0.000,,011216,,,A*00"
+        self.assertIsNone(parser._tokenize(line, "RMC"))
+        rmc = parser._parse_sentence(line, "RMC")
+        self.assertEqual(rmc, nmea_parse.RMC(None, "A", datetime.date(2016, 12, 1)))
+        rmc = parser._parse_sentence(line.replace("011216", "011x16"), "RMC")
+        self.assertIsNone(rmc.datestamp)
+
+
+class RMCTest(unittest.TestCase):
+
+    LINE = b"$GPRMC,053439.00,A,3540.40016,N,13921.78944,E,0.000,,011216,,,A*72"
+
+    def test_tokenize_rmc(self):
+        rmc = nmea_parse.tokenize_rmc(self.LINE + b"\r\n")
+        self.assertEqual(rmc, (datetime.time(5, 34, 39), "A", datetime.date(2016, 12, 1)))
+        self.assertEqual(nmea_parse.tokenize_rmc(self.LINE.decode("ascii")), rmc)
+        self.assertIsNone(nmea_parse.tokenize_rmc(self.LINE[:-1] + b"0"))
+        self.assertIsNone(nmea_parse.tokenize_rmc(b"$GPGGA,053439.00,3540.40016,N,13921.78944,E,1,08,1.36,,,,,,*00"))
+
+    def test_iter_rmc(self):
+        synth = nmea_synth.NMEASynth(seed=2)
+        start = datetime.datetime(2016, 12, 1, 5, 0, 0)
+        data = "".join(line for t in range(5) for line in synth.epoch(t, start + datetime.timedelta(seconds=t)))
+        data = data.encode("latin-1")
+        times = [rmc.timestamp for rmc in nmea_parse.iter_rmc(data)]
+        self.assertEqual(times, [datetime.time(5, 0, t) for t in range(5)])
+        self.assertEqual([rmc.timestamp for rmc in nmea_parse.iter_rmc(data, reverse=True)], times[::-1])
+
+
+
+class ParseTest(unittest.TestCase):
+    u""" チェックサム不一致の行を含むファイルを, 高速パスとpynmea2のみでパースした結果を比較する """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.files = nmea_synth.generate_sd(cls.root, trips=1, files=1, duration=300, badrate=0.05)[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def test_fallback(self):
+        fast = nmea_parse.NMEAParser()
+        slow = nmea_parse.NMEAParser(fastpath=False)
+        parsed = fast.parse(self.files[0])
+        self.assertEqual(len(parsed), 300)
+        self.assertGreater(fast.counters["fallback"], 0)
+        self.assertEqual(fast.counters["fallback"], fast.counters["checksum_repair"])
+        self.assertEqual(parsed, slow.parse(self.files[0]))
+        # pynmea2でパースしたRMCも高速パスと同じ型とする
+        self.assertTrue(all(type(gps["RMC"]) is nmea_parse.RMC for gps in parsed))
+
+
+def _assert_store_equal(test, a, b):
+    test.assertEqual(len(a), len(b))
+    for x, y in zip((a.gsv(), a.gsa()), (b.gsv(), b.gsa())):
+        test.assertEqual(x.prn, y.prn)
+        np.testing.assert_array_equal(x.time, y.time)
+        np.testing.assert_array_equal(x.hdop, y.hdop)
+        for k in ["sn", "el", "az"]:
+            np.testing.assert_array_equal(getattr(x, k), getattr(y, k))
+
+
+class ParseFilesTest(unittest.TestCase):
+    u""" parse_filesの並列パース(EpochStoreで受け渡し)が, 逐次パースした結果と一致するか """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        cls.files = nmea_synth.generate_sd(cls.root, trips=2, files=3, duration=120)[0]
+        cls.ref = nmea_data.EpochStore()
+        cls.ref.extend(gps for f in cls.files for gps in nmea_parse.NMEAParser().parse(f))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root)
+
+    def _merged(self, parser, **kwargs):
+        store = nmea_data.EpochStore()
+        files = list()
+        for f, parsed in parser.parse_files(self.files, columnar=True, **kwargs):
+            self.assertIsInstance(parsed, nmea_data.EpochStore)
+            store.merge(parsed)
+            files.append(f)
+        self.assertEqual(files, self.files)
+        return store
+
+    def test_parallel(self):
+        parser = nmea_parse.NMEAParser()
+        _assert_store_equal(self, self._merged(parser, workers=2, minfiles=1), self.ref)
+        self.assertEqual(parser.counters["files"], len(self.files))
+        self.assertEqual(parser.counters["epochs"], len(self.ref))
+
+    def test_serial(self):
+        _assert_store_equal(self, self._merged(nmea_parse.NMEAParser(), workers=1), self.ref)
+
+    def test_dict(self):
+        parsed = [p for f, p in nmea_parse.NMEAParser().parse_files(self.files, workers=2, minfiles=1)]
+        self.assertEqual(parsed, [nmea_parse.NMEAParser().parse(f) for f in self.files])
+
+    def test_cache(self):
+        cachedir = tempfile.mkdtemp()
+        try:
+            cache = nmea_cache.ParseCache(cachedir)
+            self._merged(nmea_parse.NMEAParser(), workers=2, minfiles=1, cache=cache)
+            parser = nmea_parse.NMEAParser()
+            _assert_store_equal(self, self._merged(parser, workers=2, minfiles=1, cache=cache), self.ref)
+            self.assertEqual(parser.counters["cache_hit"], len(self.files))
+            self.assertFalse(cache.contains(self.files[0]))     # dictのlistのキャッシュとは別に保存する
+        finally:
+            shutil.rmtree(cachedir)
+
+    def test_pickle(self):
+        store = nmea_parse.NMEAParser().parse_store(self.files[0])
+        restored = pickle.loads(pickle.dumps(store))
+        _assert_store_equal(self, restored, store)
+        restored.merge(store)       # 確保領域を除いた状態からも追加できる
+        self.assertEqual(len(restored), len(store) * 2)
+
+
+class FollowerTest(unittest.TestCase):
+    u""" 追記途中のファイルを監視した結果が, 書き込み完了後のファイルをparse()した結果と一致するか """
+
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.dst = tempfile.mkdtemp()
+        self.files = nmea_synth.generate_sd(self.src, trips=2, files=2, duration=30, badrate=0.02)[0]
+        self.normal = os.path.join(self.dst, "SYSTEM", "NMEA", "NORMAL")
+        os.makedirs(self.normal)
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+        shutil.rmtree(self.dst)
+
+    def _collect(self, total, new):
+        for tid, trip in new.items():
+            t = total.setdefault(tid, {"fname": [], "gps": []})
+            t["fname"] += [f for f in trip["fname"] if f not in t["fname"]]
+            t["gps"] += trip["gps"]
+
+    def test_follow(self):
+        follower = nmea_parse.NMEAFollower(self.dst)
+        total = dict()
+        rng = random.Random(0)
+        for src in self.files:
+            dst = os.path.join(self.normal, os.path.basename(src))
+            with open(src, "rb") as f:
+                data = f.read()
+            pos = 0
+            # 行の途中で区切って追記する (先頭行の途中も含む)
+            while pos < len(data):
+                step = rng.randrange(1, 4000)
+                with open(dst, "ab") as f:
+                    f.write(data[pos:pos+step])
+                pos += step
+                self._collect(total, follower.poll())
+        self._collect(total, follower.flush())
+
+        parser = nmea_parse.NMEAParser()
+        self.assertEqual(sorted(total), ["1000", "1001"])
+        for tid, files in [("1000", self.files[:2]), ("1001", self.files[2:])]:
+            self.assertEqual([os.path.basename(f) for f in total[tid]["fname"]],
+                             [os.path.basename(f) for f in files])
+            self.assertEqual(total[tid]["gps"], [gps for f in files for gps in parser.parse(f)])
+
+    def test_next_file(self):
+        u""" 同じtripの新しいファイルが作成されたら, 以前のファイルの最後のエポックを確定する """
+        follower = nmea_parse.NMEAFollower(self.dst)
+        shutil.copy(self.files[0], self.normal)
+        first = follower.poll()["1000"]["gps"]
+        self.assertEqual(len(first), 29)
+        self.assertEqual(follower.poll(), {})
+        shutil.copy(self.files[1], self.normal)
+        new = follower.poll()["1000"]
+        self.assertEqual(len(new["gps"]), 30)
+        self.assertEqual(len(new["fname"]), 2)
+        self.assertEqual(len(follower.flush()["1000"]["gps"]), 1)
+
+    def test_ignored(self):
+        follower = nmea_parse.NMEAFollower(self.dst)
+        with open(self.files[0], "rb") as f, gzip.open(os.path.join(self.normal, "0001.NMEA.gz"), "wb") as g:
+            g.write(f.read())
+        self.assertEqual(follower.poll(), {})
+        self.assertEqual(follower.flush(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" GUIの起動時にnumpy等の重いモジュールをimportしていないか, 起動時間が予算内かを確認する
+
+予算は遅延importしているモジュールも起動時にimportした場合(遅延import前の起動)の時間に対する割合とする.
+import時間は新しいプロセスで計測するため, 画面やPyQt4がない環境でも確認できる
+"""
+
+import sys
+import os
+import ast
+import json
+import importlib.util
+import subprocess
+import unittest
+import bench  # my module
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "matplotlib", "seaborn", "asyncio")
+FRACTION = 0.25     # 遅延import前の起動時間に対する予算の割合
+REPEAT = 3
+
+
+def _main_imports():
+    u""" main.pyで起動時にimportするモジュールと, _LazyModuleで遅延importするモジュール """
+    with open(os.path.join(ROOT, "main.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    startup, lazy = list(), list()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            startup += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            startup.append(node.module)
+        elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and \
+                getattr(node.value.func, "id", None) == "_LazyModule":
+            lazy.append(ast.literal_eval(node.value.args[0]))
+    return startup, lazy
+
+
+_IMPORT_TIME = """
+import sys, time, json, importlib
+start = time.perf_counter()
+for name in {}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+heavy = [m for m in {} if m in sys.modules]
+sys.__stdout__.write(json.dumps({{"time": elapsed, "heavy": heavy}}) + "\\n")
+"""
+
+
+def _run(script):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    out = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT, env=env)
+    return json.loads(out.decode("utf-8").strip().splitlines()[-1])
+
+
+def _import_time(names):
+    u""" 新しいプロセスでnamesをimportする時間 (REPEAT回の最小値) と, importされた重いモジュール """
+    runs = [_run(_IMPORT_TIME.format(list(names), HEAVY)) for i in range(REPEAT)]
+    return min(r["time"] for r in runs), runs[0]["heavy"]
+
+
+_HAS_QT = importlib.util.find_spec("PyQt4") is not None
+_HAS_DISPLAY = not sys.platform.startswith("linux") or bool(os.environ.get("DISPLAY"))
+
+
+class StartupImportTest(unittest.TestCase):
+    u""" PyQt4を除いた起動時のimportを, 遅延import前と比較する """
+
+    @classmethod
+    def setUpClass(cls):
+        startup, lazy = _main_imports()
+        cls.startup = [name for name in startup if not name.startswith("PyQt4")]
+        cls.lazy = lazy
+
+    def test_lazy_modules_found(self):
+        self.assertIn("nmea_graph", self.lazy)
+        self.assertNotIn("nmea_graph", self.startup)
+
+    def test_startup_imports_are_light(self):
+        elapsed, heavy = _import_time(self.startup)
+        self.assertEqual(heavy, [])
+        baseline, heavy = _import_time(self.startup + self.lazy)
+        self.assertLessEqual(elapsed, baseline * FRACTION,
+                             "startup imports {:.3f} s, baseline {:.3f} s".format(elapsed, baseline))
+
+
+@unittest.skipUnless(_HAS_QT, "PyQt4 is not installed")
+class StartupTest(unittest.TestCase):
+    u""" PyQt4がある環境で, main自体のimportとメインウィンドウ表示までを確認する """
+
+    def test_import_main_is_light(self):
+        elapsed, heavy = _import_time(["main"])
+        self.assertEqual(heavy, [])
+
+    @unittest.skipUnless(_HAS_DISPLAY, "no display")
+    def test_startup_budget(self):
+        r = _run(bench._STARTUP)
+        self.assertEqual(r["heavy"], [])
+        # 遅延importしたモジュールを起動時にimportした場合の起動時間に対する割合で確認する
+        deferred = _import_time(_main_imports()[1])[0]
+        self.assertLessEqual(r["time"], (r["time"] + deferred) * FRACTION)
+
+
+if __name__ == '__main__':
+    unittest.main()
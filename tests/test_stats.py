@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+u""" nmea_statsの一括算出が衛星ごとに個別に求めた統計値と一致するかを確認する """
+
+import unittest
+import numpy as np
+import nmea_data   # my module
+import nmea_stats  # my module
+
+F = nmea_data.FILL
+
+
+def _gpsdata(sn, el=None, az=None, hdop=None):
+    sn = np.asarray(sn, dtype=np.int16)
+    el = np.asarray(el, dtype=np.int16) if el is not None else np.where(sn == F, F, 30).astype(np.int16)
+    az = np.asarray(az, dtype=np.int16) if az is not None else np.where(sn == F, F, 90).astype(np.int16)
+    n, m = sn.shape
+    hdop = np.asarray(hdop if hdop is not None else [1.0] * n, dtype=np.float32)
+    return nmea_data.GPSData(np.arange(n, dtype=np.float64), hdop, [str(i + 1) for i in range(m)], sn, el, az)
+
+
+class ComputeTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        sn = rng.randint(0, 50, size=(200, 6)).astype(np.int16)
+        sn[rng.rand(200, 6) < 0.3] = F
+        sn[:, 5] = F    # 時間幅内に存在しない衛星
+        self.gps = _gpsdata(sn)
+
+    def test_per_satellite(self):
+        stats = nmea_stats.compute(self.gps, 30, (10, 90))
+        for col in range(6):
+            v = self.gps.sn[:, col]
+            v = v[v != F].astype(np.float64)
+            self.assertEqual(stats.count[col], len(v))
+            if not len(v):
+                self.assertTrue(np.isnan(stats.mean[col]) and np.isnan(stats.median[col]))
+                self.assertTrue(np.isnan(stats.percentiles[10][col]))
+                continue
+            self.assertAlmostEqual(stats.mean[col], v.mean())
+            self.assertAlmostEqual(stats.median[col], np.median(v))
+            self.assertAlmostEqual(stats.percentiles[10][col], np.percentile(v, 10))
+            self.assertAlmostEqual(stats.percentiles[90][col], np.percentile(v, 90))
+            self.assertAlmostEqual(stats.above[col], (v >= 30).mean())
+
+    def test_top(self):
+        stats = nmea_stats.compute(self.gps)
+        for row in range(len(self.gps)):
+            v = self.gps.sn[row]
+            v = np.sort(v[v != F])[::-1]
+            if len(v) < 3:
+                self.assertTrue(np.isnan(stats.top[row]))
+            else:
+                self.assertAlmostEqual(stats.top[row], v[:3].mean())
+        mean = stats.mean[~np.isnan(stats.mean)]
+        np.testing.assert_array_equal(stats.top_values(), np.sort(mean)[::-1][:3])
+        self.assertAlmostEqual(stats.top_mean(), np.sort(mean)[::-1][:3].mean())
+
+    def test_el_az(self):
+        gps = _gpsdata([[30, 40], [35, F]], el=[[10, 0], [-1, F]], az=[[100, 200], [300, F]])
+        stats = nmea_stats.compute(gps)
+        np.testing.assert_array_equal(stats.el, [10, np.nan])   # 0以下は除く
+        np.testing.assert_array_equal(stats.az, [200, 200])
+
+    def test_empty(self):
+        gps = _gpsdata(np.zeros((0, 2), dtype=np.int16))
+        stats = nmea_stats.compute(gps, 30, (50,))
+        self.assertTrue(np.isnan(stats.median).all())
+        self.assertEqual(stats.top_mean(), 0)
+        self.assertTrue(np.isnan(stats.top_epoch_mean()))
+
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_summarize(self):
+        gps = _gpsdata([[40, 30, F, F], [42, 32, 20, F], [44, F, 22, F]], hdop=[1.0, 99, 2.0])
+        summary = nmea_stats.summarize(gps, 30, (50,))
+        # 存在するエポックがない衛星は除く
+        self.assertEqual(summary["sv_num"], 3)
+        self.assertEqual(sorted(summary["cn"]), ["1", "2", "3"])
+        self.assertEqual(summary["cn"]["1"], 42)
+        self.assertEqual(summary["cn_median"]["2"], 31)
+        self.assertEqual(summary["cn_pct"]["3"], {50: 21})
+        self.assertEqual(summary["cn_above"]["3"], 0)
+        self.assertAlmostEqual(summary["top3"], (42 + 31 + 21) / 3)
+        self.assertAlmostEqual(summary["top3_epoch"], (42 + 32 + 20) / 3)
+        # GGAなし(99)は除く
+        self.assertEqual((summary["hdop_mean"], summary["hdop_min"], summary["hdop_max"]), (1.5, 1.0, 2.0))
+
+    def test_no_threshold(self):
+        summary = nmea_stats.summarize(_gpsdata([[40, 30]]))
+        self.assertEqual(summary["cn_above"], {})
+        self.assertEqual(summary["top3"], 0)    # 3衛星未満
+
+
+if __name__ == '__main__':
+    unittest.main()